@@ -1,27 +1,38 @@
 import json
+from datetime import datetime, timezone
 from typing import TypedDict, Dict, Any, List
 from langgraph.graph import StateGraph, END
 from models.agent_models import AgentState
 from models.api_models import Recommendation, RecommendationAction
-from models.db_models import Anomaly
+from models.db_models import Anomaly, SeverityLevel
 from data_collection.poller import collector
 from data_collection.snapshot import snapshot_manager
 from anomaly_detection.detector import detector
+from metrics_engine.correlation import correlation_engine
 from llm.groq_client import groq_client
 from agent.persona import DBA_SYSTEM_PROMPT
-from agent.memory import anomaly_memory
+from agent.memory import alert_deduplicator, anomaly_set_signature
 from agent.recommendations import recommendation_manager
+from llm.token_budget import PromptSection, TokenBudget, fit_items
 from config.settings import settings
+from utils.concurrency import run_blocking
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
 # Node 1: Collect Metrics
-def collect_metrics_node(state: AgentState) -> AgentState:
+async def collect_metrics_node(state: AgentState) -> AgentState:
     logger.info("Executing Graph Node: collect_metrics")
-    # For manual trigger, we fetch fresh. 
+    # For manual trigger, reuse the poller's latest snapshot when it is recent;
+    # otherwise fetch fresh (pyodbc, so on the bounded worker pool).
     if not state.get("current_snapshot"):
-        state["current_snapshot"] = collector.collect_now()
+        latest = snapshot_manager.get_latest()
+        age = (datetime.now(timezone.utc) - latest.timestamp).total_seconds() if latest else None
+        if age is not None and age <= settings.ANALYSIS_SNAPSHOT_MAX_AGE_SECONDS:
+            logger.info(f"Reusing published snapshot from {age:.1f}s ago.")
+            state["current_snapshot"] = latest
+        else:
+            state["current_snapshot"] = await run_blocking(collector.collect_now)
     
     # Initialize necessary lists if absent
     if "errors" not in state:
@@ -31,21 +42,30 @@ def collect_metrics_node(state: AgentState) -> AgentState:
     return state
 
 # Node 2: Detect Anomalies
-def detect_anomalies_node(state: AgentState) -> AgentState:
+async def detect_anomalies_node(state: AgentState) -> AgentState:
     logger.info("Executing Graph Node: detect_anomalies_baseline")
     if not state.get("current_snapshot"):
         state["should_alert"] = False
         return state
 
-    history = snapshot_manager.get_history(settings.BASELINE_WINDOW_SIZE)
-    anomalies = detector.detect(state["current_snapshot"], history)
+    # A reused snapshot is already in history; it must not serve as its own baseline
+    current = state["current_snapshot"]
+    history = [
+        snap for snap in snapshot_manager.get_history(settings.BASELINE_WINDOW_SIZE + 1)
+        if snap is not current
+    ][-settings.BASELINE_WINDOW_SIZE:]
+    # Detection takes engine locks and may reload the rules file; keep it off the loop
+    anomalies = await run_blocking(detector.detect, state["current_snapshot"], history)
     
-    # Filter by memory to prevent spam
+    # De-duplicate by stable fingerprint to prevent spam
     new_anomalies = []
     for anomaly in anomalies:
-        if anomaly_memory.should_alert(anomaly.root_resource):
+        if alert_deduplicator.should_alert(anomaly):
             new_anomalies.append(anomaly)
-            
+
+    # Rank cross-domain contributors so the LLM doesn't have to guess the links
+    correlation_engine.attach_contributors(new_anomalies)
+
     state["detected_anomalies"] = new_anomalies
     state["should_alert"] = len(new_anomalies) > 0
     return state
@@ -53,36 +73,58 @@ def detect_anomalies_node(state: AgentState) -> AgentState:
 # Conditional Edge
 def check_anomalies(state: AgentState) -> str:
     if state.get("should_alert", False):
-        return "prepare_llm_prompt"
+        return "reuse_recommendation"
     return "finalize_response"
 
-# Node 3: Prepare LLM Prompt
-def prepare_llm_prompt_node(state: AgentState) -> AgentState:
-    logger.info("Executing Graph Node: prepare_enriched_llm_prompt")
-    
-    # Compress anomaly data to prevent token explosion
-    anomalies_data = []
-    for a in state["detected_anomalies"]:
-        dump = a.model_dump()
-        # Truncate overly long SQL text in the context wrapper just in case
-        if "sql_text" in dump.get("context_data", {}) and dump["context_data"]["sql_text"]:
-            dump["context_data"]["sql_text"] = dump["context_data"]["sql_text"][:1000] + "...(truncated)"
-        anomalies_data.append(dump)
-    
-    # Rich Top Waits Summary
-    waits_summary = [
-        f"{w.wait_type}: {w.wait_time_ms}ms" 
-        for w in state["current_snapshot"].top_wait_stats[:3]
-    ]
+def _waits_summary(snapshot) -> str:
+    return ", ".join(f"{w.wait_type}: {w.wait_time_ms}ms" for w in snapshot.top_wait_stats[:3])
+
+# Node 3: Reuse a recent recommendation for the same anomaly set
+def reuse_recommendation_node(state: AgentState) -> AgentState:
+    logger.info("Executing Graph Node: reuse_recommendation")
+    signature = anomaly_set_signature(state["detected_anomalies"])
+    state["anomaly_signature"] = signature
+    state["recommendation_reused"] = False
+    if settings.RECOMMENDATION_REUSE_SECONDS <= 0:
+        return state
+
+    previous = recommendation_manager.find_by_signature(signature, settings.RECOMMENDATION_REUSE_SECONDS)
+    if previous is None:
+        return state
+
+    snapshot = state["current_snapshot"]
+    rec = previous.model_copy(update={
+        "timestamp": datetime.now(timezone.utc),
+        "reused": True,
+        "first_seen": previous.first_seen or previous.timestamp,
+        "context_summary": (
+            f"Same anomaly set still active at {snapshot.timestamp.isoformat()}: "
+            f"{len(state['detected_anomalies'])} anomalies, {snapshot.active_sessions_count} active sessions, "
+            f"top waits {_waits_summary(snapshot)}."
+        ),
+    })
+    logger.info(f"Reusing recommendation for anomaly signature {signature}; skipping LLM call.")
+    state["current_recommendation"] = rec
+    state["recommendation_reused"] = True
+    recommendation_manager.add_recommendation(rec)
+    return state
+
+def check_reused(state: AgentState) -> str:
+    if state.get("recommendation_reused", False):
+        return "finalize_response"
+    return "prepare_llm_prompt"
+
+# Node 4: Prepare LLM Prompt
+_SEVERITY_ORDER = {SeverityLevel.INFO: 0, SeverityLevel.WARNING: 1, SeverityLevel.CRITICAL: 2}
 
-    prompt = f"""
+ANALYSIS_PROMPT = """
     The following ACTIVE anomalies were just detected on AdventureWorks2025:
-    {json.dumps(anomalies_data, default=str, indent=2)}
+    {anomalies_json}
     
     --- Database Context Snapshot ---
-    Timestamp: {state["current_snapshot"].timestamp.isoformat()}
-    Active Sessions: {state["current_snapshot"].active_sessions_count}
-    Top 3 Wait Stats (CUMULATIVE VALUES): {', '.join(waits_summary)}
+    Timestamp: {timestamp}
+    Active Sessions: {active_sessions}
+    Top 3 Wait Stats (CUMULATIVE VALUES): {waits_summary}
     
     IMPORTANT: The absolute Wait Time MS inside the context data often represents raw cumulative values.
     Any anomalies tagged as HIGH_WAITS containing `delta_ms` or `rate_ms_per_sec` fields represent the true
@@ -90,13 +132,42 @@ def prepare_llm_prompt_node(state: AgentState) -> AgentState:
     
     Please provide root cause analysis and recommendations respecting the strict JSON format.
     """
-    state["llm_prompt"] = prompt
+
+def prepare_llm_prompt_node(state: AgentState) -> AgentState:
+    logger.info("Executing Graph Node: prepare_enriched_llm_prompt")
+    
+    # Compress anomaly data to prevent token explosion; most severe first so the budget drops the least important
+    anomaly_texts = []
+    for a in sorted(state["detected_anomalies"], key=lambda a: _SEVERITY_ORDER.get(a.severity, 0), reverse=True):
+        dump = a.model_dump()
+        # Truncate overly long SQL text in the context wrapper just in case
+        if "sql_text" in dump.get("context_data", {}) and dump["context_data"]["sql_text"]:
+            dump["context_data"]["sql_text"] = dump["context_data"]["sql_text"][:1000] + "...(truncated)"
+        anomaly_texts.append(json.dumps(dump, default=str, indent=2))
+
+    def keep_whole_anomalies(text: str, max_tokens: int) -> str:
+        kept = fit_items(anomaly_texts, max_tokens - 20, separator=",\n")
+        omitted = len(anomaly_texts) - len(kept)
+        return "[\n" + ",\n".join(kept) + f"\n]\n({omitted} lower-severity anomalies omitted for length)"
+
+    budget = TokenBudget(reserved=DBA_SYSTEM_PROMPT + ANALYSIS_PROMPT)
+    fitted = budget.allocate([
+        PromptSection("anomalies", "[\n" + ",\n".join(anomaly_texts) + "\n]", compressor=keep_whole_anomalies),
+    ])
+    
+    state["llm_prompt"] = ANALYSIS_PROMPT.format(
+        anomalies_json=fitted["anomalies"],
+        timestamp=state["current_snapshot"].timestamp.isoformat(),
+        active_sessions=state["current_snapshot"].active_sessions_count,
+        # Rich Top Waits Summary
+        waits_summary=_waits_summary(state["current_snapshot"]),
+    )
     return state
 
-# Node 4: Call LLM
-def call_llm_node(state: AgentState) -> AgentState:
+# Node 5: Call LLM
+async def call_llm_node(state: AgentState) -> AgentState:
     logger.info("Executing Graph Node: call_llm")
-    response_text = groq_client.get_completion(
+    response_text = await groq_client.aget_completion(
         system_prompt=DBA_SYSTEM_PROMPT,
         user_prompt=state["llm_prompt"],
         response_format={"type": "json_object"}
@@ -104,7 +175,7 @@ def call_llm_node(state: AgentState) -> AgentState:
     state["llm_analysis"] = response_text or "{}"
     return state
 
-# Node 5: Store Recommendation
+# Node 6: Store Recommendation
 def store_recommendation_node(state: AgentState) -> AgentState:
     logger.info("Executing Graph Node: store_recommendation")
     try:
@@ -114,7 +185,8 @@ def store_recommendation_node(state: AgentState) -> AgentState:
             technical_diagnosis=raw_json.get("technical_diagnosis", "Failed to parse diagnosis"),
             recommended_actions=[RecommendationAction(**a) for a in raw_json.get("recommended_actions", [])],
             risk_level=raw_json.get("risk_level", "HIGH"),
-            confidence_score=float(raw_json.get("confidence_score", 0.0))
+            confidence_score=float(raw_json.get("confidence_score", 0.0)),
+            anomaly_signature=state.get("anomaly_signature") or None,
         )
         state["current_recommendation"] = rec
         recommendation_manager.add_recommendation(rec)
@@ -137,6 +209,7 @@ def build_graph() -> StateGraph:
     # Add nodes
     workflow.add_node("collect_metrics", collect_metrics_node)
     workflow.add_node("detect_anomalies", detect_anomalies_node)
+    workflow.add_node("reuse_recommendation", reuse_recommendation_node)
     workflow.add_node("prepare_llm_prompt", prepare_llm_prompt_node)
     workflow.add_node("call_llm", call_llm_node)
     workflow.add_node("store_recommendation", store_recommendation_node)
@@ -149,6 +222,14 @@ def build_graph() -> StateGraph:
     workflow.add_conditional_edges(
         "detect_anomalies",
         check_anomalies,
+        {
+            "reuse_recommendation": "reuse_recommendation",
+            "finalize_response": "finalize_response"
+        }
+    )
+    workflow.add_conditional_edges(
+        "reuse_recommendation",
+        check_reused,
         {
             "prepare_llm_prompt": "prepare_llm_prompt",
             "finalize_response": "finalize_response"
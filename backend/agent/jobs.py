@@ -0,0 +1,160 @@
+"""Background queue for on-demand DBA analyses.
+
+POST /trigger-analysis enqueues a job and returns its id instead of
+running the agent (metrics collection + LLM call) inside the request.
+An asyncio.Queue feeds ANALYSIS_JOB_WORKERS worker tasks. A submission
+that arrives while a job is still waiting to start is folded into it,
+since that job has not read any metrics yet. Once a job is running, the
+next submission queues a new one so its caller gets a result that
+started after the request. At most one job is therefore ever waiting.
+Finished jobs are kept for ANALYSIS_JOB_HISTORY lookups.
+
+Everything here runs on the event loop, so no locking is needed.
+"""
+import asyncio
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from models.api_models import AnalysisJob, TriggerAnalysisResponse
+from agent.graph import dba_agent
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+async def run_analysis() -> TriggerAnalysisResponse:
+    initial_state = {"current_snapshot": None}
+
+    # Nodes await the LLM and hand pyodbc work to the worker pool
+    final_state = await dba_agent.ainvoke(initial_state)
+
+    anomalies_detected = len(final_state.get("detected_anomalies", []))
+    recommendation = final_state.get("current_recommendation")
+    errors = final_state.get("errors", [])
+
+    if errors:
+        return TriggerAnalysisResponse(
+            status="error",
+            message="; ".join(errors),
+            anomalies_detected=anomalies_detected,
+            recommendations=recommendation
+        )
+
+    return TriggerAnalysisResponse(
+        status="success",
+        message=f"Analysis complete. {anomalies_detected} anomalies found." if anomalies_detected > 0 else "Analysis complete. Database operates normally.",
+        anomalies_detected=anomalies_detected,
+        recommendations=recommendation
+    )
+
+
+class AnalysisJobQueue:
+    def __init__(
+        self,
+        workers: int = settings.ANALYSIS_JOB_WORKERS,
+        history: int = settings.ANALYSIS_JOB_HISTORY,
+    ):
+        self.worker_count = workers
+        self.history = history
+        self._jobs: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+        self._finished: Dict[str, asyncio.Event] = {}
+        # The job waiting for a worker, if any; new submissions join it
+        self._queued_id: Optional[str] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Spawn the workers on the running loop (idempotent)."""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        logger.info(f"Analysis job queue started with {self.worker_count} worker(s).")
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def submit(self) -> AnalysisJob:
+        """Queue an analysis, or return the one that is queued but not started yet."""
+        self.start()
+        queued = self._jobs.get(self._queued_id) if self._queued_id else None
+        if queued is not None and queued.status == QUEUED:
+            queued.coalesced += 1
+            logger.info(f"Coalesced analysis request into job {queued.job_id}.")
+            return queued
+
+        job = AnalysisJob(job_id=uuid.uuid4().hex)
+        self._queue.put_nowait(job.job_id)
+        self._jobs[job.job_id] = job
+        self._finished[job.job_id] = asyncio.Event()
+        self._queued_id = job.job_id
+        while len(self._jobs) > self.history:
+            old_id, _ = self._jobs.popitem(last=False)
+            self._finished.pop(old_id, None)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, limit: int = 10) -> List[AnalysisJob]:
+        return list(reversed(self._jobs.values()))[:limit]
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[AnalysisJob]:
+        """The job once finished or after timeout seconds, whichever comes first."""
+        event = self._finished.get(job_id)
+        if event is not None and timeout > 0:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._jobs.get(job_id)
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            try:
+                if job is None:
+                    continue
+                job.status = RUNNING
+                job.started_at = datetime.now(timezone.utc)
+                if self._queued_id == job_id:
+                    # Later submissions must not join a job that is already reading metrics
+                    self._queued_id = None
+                try:
+                    job.result = await run_analysis()
+                    if job.result.status == "error":
+                        job.status = FAILED
+                        job.error = job.result.message
+                    else:
+                        job.status = SUCCEEDED
+                except asyncio.CancelledError:
+                    job.status = FAILED
+                    job.error = "Cancelled during shutdown."
+                    raise
+                except Exception as e:
+                    logger.error(f"Analysis job {job_id} failed: {e}")
+                    job.status = FAILED
+                    job.error = str(e)
+            finally:
+                if job is not None:
+                    job.finished_at = datetime.now(timezone.utc)
+                    event = self._finished.get(job_id)
+                    if event is not None:
+                        event.set()
+                self._queue.task_done()
+
+
+analysis_jobs = AnalysisJobQueue()
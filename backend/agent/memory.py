@@ -1,27 +1,175 @@
-from datetime import datetime, timedelta
-from typing import Dict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import deque
+import hashlib
+import heapq
 import threading
+import uuid
+from models.db_models import Anomaly, AnomalyType, Incident, SeverityLevel
+from config.settings import settings
+
+_SEVERITY_RANK = {SeverityLevel.INFO: 0, SeverityLevel.WARNING: 1, SeverityLevel.CRITICAL: 2}
+
+# Cap on fingerprints remembered per incident
+MAX_INCIDENT_FINGERPRINTS = 100
+
+
+def anomaly_identity(anomaly: Anomaly) -> str:
+    """Stable identity of the resource an anomaly is about.
+
+    Built from context fields rather than root_resource, which embeds
+    volatile numbers (variance ratios, plan counts).
+    """
+    ctx = anomaly.context_data
+    if ctx.get("rule_name"):
+        return f"rule:{ctx['rule_name']}"
+    if anomaly.type == AnomalyType.BLOCKING:
+        return f"{ctx.get('blocking_session_id')}>{ctx.get('session_id')}"
+    if anomaly.type == AnomalyType.HIGH_WAITS:
+        return str(ctx.get("wait_type") or ctx.get("resource"))
+    if anomaly.type in (AnomalyType.HIGH_CPU, AnomalyType.PREDICTED_REGRESSION):
+        if ctx.get("query_hash"):
+            return str(ctx["query_hash"])
+        if ctx.get("kind") == "query_duration":
+            return str(ctx.get("resource"))
+        return "server"
+    if anomaly.type == AnomalyType.PARAMETER_SNIFFING:
+        return str(ctx.get("query_id"))
+    if anomaly.type == AnomalyType.MISSING_INDEX:
+        return (
+            f"{ctx.get('database_name')}.{ctx.get('schema_name')}.{ctx.get('table_name')}"
+            f"|{ctx.get('equality_columns')}|{ctx.get('inequality_columns')}"
+        )
+    if anomaly.type == AnomalyType.INDEX_FRAGMENTATION:
+        return f"{ctx.get('database_name')}.{ctx.get('schema_name')}.{ctx.get('table_name')}.{ctx.get('index_name')}"
+    return anomaly.root_resource
+
+
+def anomaly_fingerprint(anomaly: Anomaly) -> str:
+    raw = f"{anomaly.type.value}|{anomaly_identity(anomaly)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def anomaly_set_signature(anomalies: Iterable[Anomaly]) -> str:
+    """Order-independent signature of an anomaly set: type, resource identity and severity of each.
+
+    Timestamps and measured values are left out, so the same underlying
+    problem maps to the same signature for as long as it lasts.
+    """
+    parts = sorted({f"{anomaly_fingerprint(a)}:{a.severity.value}" for a in anomalies})
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _parse_type_cooldowns(raw: str) -> Dict[str, int]:
+    cooldowns = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        name, minutes = item.split("=", 1)
+        cooldowns[name.strip().upper()] = int(minutes.strip())
+    return cooldowns
+
+
+class AlertDeduplicator:
+    """Fingerprint-based alert de-duplication with bounded memory.
+
+    Each fingerprint lives until its per-type cooldown expires; expiries
+    sit in a min-heap so eviction is O(log n) per entry. Alerts that keep
+    arriving without a quiet gap are grouped into the same incident.
+    """
 
-class AnomalyMemory:
     def __init__(self):
-        # Maps anomaly root_resource string to the timestamp it was last alerted
-        self._history: Dict[str, datetime] = {}
+        # fingerprint -> (expires_at, severity rank)
+        self._entries: Dict[str, Tuple[datetime, int]] = {}
+        self._expiry_heap: List[Tuple[datetime, str]] = []
+        self._incidents: deque = deque(maxlen=settings.ALERT_MAX_INCIDENTS)
         self._lock = threading.Lock()
-        self.cooldown_minutes = 15
+        self.default_cooldown_minutes = settings.ALERT_COOLDOWN_MINUTES
+        self.type_cooldowns = _parse_type_cooldowns(settings.ALERT_TYPE_COOLDOWNS)
+
+    def _cooldown(self, anomaly_type: AnomalyType) -> timedelta:
+        minutes = self.type_cooldowns.get(anomaly_type.value, self.default_cooldown_minutes)
+        return timedelta(minutes=minutes)
+
+    def _evict_expired(self, now: datetime) -> None:
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, fp = heapq.heappop(heap)
+            entry = self._entries.get(fp)
+            # Skip stale heap records left behind by escalations
+            if entry is not None and entry[0] == expires_at:
+                del self._entries[fp]
+
+        while len(self._entries) > settings.ALERT_DEDUP_MAX_ENTRIES and heap:
+            expires_at, fp = heapq.heappop(heap)
+            entry = self._entries.get(fp)
+            if entry is not None and entry[0] == expires_at:
+                del self._entries[fp]
+
+        # Compact when stale records dominate the heap
+        if len(heap) > 2 * len(self._entries) + 64:
+            self._expiry_heap = [(exp, fp) for fp, (exp, _) in self._entries.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def _track_incident(self, anomaly: Anomaly, fingerprint: str, alerted: bool, now: datetime) -> Incident:
+        incident: Optional[Incident] = self._incidents[-1] if self._incidents else None
+        gap = timedelta(minutes=settings.ALERT_INCIDENT_GAP_MINUTES)
+        if incident is None or now - incident.last_seen > gap:
+            incident = Incident(id=str(uuid.uuid4()), opened_at=now, last_seen=now)
+            self._incidents.append(incident)
+
+        incident.last_seen = now
+        if anomaly.type.value not in incident.anomaly_types:
+            incident.anomaly_types.append(anomaly.type.value)
+        if fingerprint not in incident.fingerprints and len(incident.fingerprints) < MAX_INCIDENT_FINGERPRINTS:
+            incident.fingerprints.append(fingerprint)
+        if alerted:
+            incident.alert_count += 1
+        else:
+            incident.suppressed_count += 1
+        return incident
+
+    def should_alert(self, anomaly: Anomaly) -> bool:
+        """True if the anomaly is new, past its cooldown, or has escalated in severity.
+
+        Tags the anomaly's context_data with its fingerprint and incident id.
+        """
+        fingerprint = anomaly_fingerprint(anomaly)
+        severity = _SEVERITY_RANK.get(anomaly.severity, 0)
+
+        with self._lock:
+            now = datetime.now(timezone.utc)
+            self._evict_expired(now)
+
+            entry = self._entries.get(fingerprint)
+            alert = entry is None or severity > entry[1]
+            if alert:
+                expires_at = now + self._cooldown(anomaly.type)
+                self._entries[fingerprint] = (expires_at, severity)
+                heapq.heappush(self._expiry_heap, (expires_at, fingerprint))
+
+            incident = self._track_incident(anomaly, fingerprint, alert, now)
+
+        anomaly.context_data["fingerprint"] = fingerprint
+        anomaly.context_data["incident_id"] = incident.id
+        return alert
+
+    def get_incidents(self, limit: int = 10) -> List[Incident]:
+        with self._lock:
+            return [i.model_copy(deep=True) for i in list(self._incidents)[-limit:][::-1]]
 
-    def should_alert(self, root_resource: str) -> bool:
+    def stats(self) -> Dict[str, int]:
         with self._lock:
-            now = datetime.utcnow()
-            if root_resource in self._history:
-                last_alert_time = self._history[root_resource]
-                if now - last_alert_time < timedelta(minutes=self.cooldown_minutes):
-                    return False
-            
-            self._history[root_resource] = now
-            return True
+            return {
+                "tracked_fingerprints": len(self._entries),
+                "heap_size": len(self._expiry_heap),
+                "incidents": len(self._incidents),
+            }
 
     def clear(self):
         with self._lock:
-            self._history.clear()
+            self._entries.clear()
+            self._expiry_heap.clear()
+            self._incidents.clear()
 
-anomaly_memory = AnomalyMemory()
+alert_deduplicator = AlertDeduplicator()
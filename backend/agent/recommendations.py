@@ -1,4 +1,5 @@
 from collections import deque
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 import threading
 from models.api_models import Recommendation
@@ -19,6 +20,16 @@ class RecommendationManager:
                 return None
             return self._recommendations[-1]
 
+    def find_by_signature(self, signature: str, max_age_seconds: int) -> Optional[Recommendation]:
+        """Newest recommendation for the anomaly signature whose original LLM answer is recent enough."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+        with self._lock:
+            for rec in reversed(self._recommendations):
+                if rec.anomaly_signature != signature:
+                    continue
+                return rec if (rec.first_seen or rec.timestamp) >= cutoff else None
+        return None
+
     def get_history(self, limit: int = 10) -> List[Recommendation]:
         with self._lock:
             # Return last N elements reversed (newest first is usually helpful)
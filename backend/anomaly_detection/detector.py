@@ -3,7 +3,12 @@ from typing import List, Dict
 import math
 from models.db_models import MetricSnapshot, Anomaly, AnomalyType, SeverityLevel, BlockingSession
 from anomaly_detection.rules import AnomalyRules
+from anomaly_detection.rule_engine import rule_engine
+from metrics_engine.baseline import baseline_engine
 from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
 
 class AnomalyDetector:
     def _calculate_severity(self, weights: int) -> SeverityLevel:
@@ -93,9 +98,28 @@ class AnomalyDetector:
                     severity_weight += 4
                     reason.append(f"Z-Score {z_score:.2f} (Spike x{regression_multiplier:.1f} vs baseline {mean:.0f})")
 
+            # Seasonal scoring: CPU rate vs the same hour-of-week in past weeks
+            seasonal = None
+            if history:
+                prev_q = next((p for p in history[-1].expensive_queries if p.query_hash == q.query_hash), None)
+                elapsed = (current_snapshot.timestamp - history[-1].timestamp).total_seconds()
+                if prev_q is not None and elapsed > 0 and q.total_worker_time >= prev_q.total_worker_time:
+                    worker_per_sec = (q.total_worker_time - prev_q.total_worker_time) / elapsed
+                    seasonal = baseline_engine.score(f"queries.{q.query_hash}", worker_per_sec, current_snapshot.timestamp)
+
+            if seasonal is not None:
+                if seasonal["zscore"] > settings.SEASONAL_ZSCORE_THRESHOLD:
+                    is_anomaly = True
+                    severity_weight += 3
+                    reason.append(f"Seasonal Z-Score {seasonal['zscore']:.2f} vs hour-of-week baseline {seasonal['expected_mean']:.0f} μs/sec")
+                elif severity_weight <= 2:
+                    # Only the cumulative threshold fired, and the load is normal for this hour
+                    is_anomaly = False
+
             if is_anomaly:
                 context = q.model_dump()
                 context["regression_reasons"] = reason
+                context["seasonal_baseline"] = seasonal
                 context["anomaly_score"] = severity_weight
                 anomalies.append(Anomaly(
                     id=str(uuid.uuid4()),
@@ -137,9 +161,19 @@ class AnomalyDetector:
                     severity_weight += 4
                     reason.append(f"Wait Rate {wait_rate_per_sec:.0f} ms/sec ({dominance_pct:.1f}% dominance)")
 
+                # Suppress spikes that are routine for this hour-of-week (e.g. nightly ETL)
+                seasonal = baseline_engine.score(f"waits.{w.wait_type}", wait_rate_per_sec, current_snapshot.timestamp)
+                if is_anomaly and seasonal is not None:
+                    if seasonal["zscore"] < settings.SEASONAL_ZSCORE_THRESHOLD:
+                        is_anomaly = False
+                    else:
+                        severity_weight += 2
+                        reason.append(f"Seasonal Z-Score {seasonal['zscore']:.2f} vs hour-of-week baseline {seasonal['expected_mean']:.0f} ms/sec")
+
                 if is_anomaly:
                     context = w.model_dump()
                     context["spike_reasons"] = reason
+                    context["seasonal_baseline"] = seasonal
                     context["delta_ms"] = delta_ms
                     context["rate_ms_per_sec"] = wait_rate_per_sec
                     context["dominance_pct"] = dominance_pct
@@ -213,11 +247,49 @@ class AnomalyDetector:
         except Exception as e:
             pass  # MetricsEngine may not be initialized yet
 
-        # 7. Predictive Query Degradation (trend slope on historical duration)
+        # 7a. Change Points (online CUSUM over query durations and wait rates)
+        change_point_queries = set()
+        try:
+            from metrics_engine.changepoint import changepoint_engine
+            flagged_waits = {a.context_data.get("wait_type") for a in anomalies if a.type == AnomalyType.HIGH_WAITS}
+
+            for event in changepoint_engine.get_events(settings.CHANGEPOINT_EVENT_WINDOW_SECONDS):
+                if event.direction != "up":
+                    continue
+                severity_weight = 6 if event.magnitude_sigmas >= 2 * settings.CHANGEPOINT_THRESHOLD_SIGMAS else 4
+                context = event.model_dump()
+                context["anomaly_score"] = severity_weight
+                context["detection_method"] = "cusum_change_point"
+
+                if event.kind == "query_duration":
+                    change_point_queries.add(event.resource)
+                    anomalies.append(Anomaly(
+                        id=str(uuid.uuid4()),
+                        type=AnomalyType.PREDICTED_REGRESSION,
+                        severity=self._calculate_severity(severity_weight),
+                        root_resource=f"Query {event.resource}",
+                        context_data=context
+                    ))
+                elif event.kind == "wait_rate" and event.resource not in flagged_waits:
+                    context["wait_type"] = event.resource
+                    anomalies.append(Anomaly(
+                        id=str(uuid.uuid4()),
+                        type=AnomalyType.HIGH_WAITS,
+                        severity=self._calculate_severity(severity_weight),
+                        root_resource=f"WaitType {event.resource}",
+                        context_data=context
+                    ))
+        except Exception as e:
+            pass  # MetricsEngine may not be initialized yet
+
+        # 7b. Predictive Query Degradation (long-run trend slope on historical duration)
         try:
             from metrics_engine.prediction import compute_trend_slope, compute_ewma
 
             for q in current_snapshot.expensive_queries:
+                if q.query_hash in change_point_queries:
+                    continue  # the change-point event is the sharper signal
+
                 hist_durations: list[float] = []
                 for snap in history:
                     for old_q in snap.expensive_queries:
@@ -230,13 +302,7 @@ class AnomalyDetector:
                     slope = compute_trend_slope(smoothed)
 
                     if slope > settings.PREDICTION_SLOPE_THRESHOLD:
-                        # Accelerating = slope of the second half > first half
-                        mid = len(smoothed) // 2
-                        slope_first = compute_trend_slope(smoothed[:mid]) if mid >= 3 else 0
-                        slope_second = compute_trend_slope(smoothed[mid:]) if len(smoothed) - mid >= 3 else slope
-                        is_accelerating = slope_second > slope_first * 1.2
-
-                        severity_weight = 6 if is_accelerating else 4
+                        severity_weight = 4
 
                         anomalies.append(Anomaly(
                             id=str(uuid.uuid4()),
@@ -244,19 +310,47 @@ class AnomalyDetector:
                             severity=self._calculate_severity(severity_weight),
                             root_resource=f"Query {q.query_hash}",
                             context_data={
+                                "query_hash": q.query_hash,
                                 "slope": round(slope, 2),
-                                "slope_first_half": round(slope_first, 2),
-                                "slope_second_half": round(slope_second, 2),
-                                "is_accelerating": is_accelerating,
                                 "history_points": len(hist_durations),
                                 "current_elapsed_time": q.total_elapsed_time,
                                 "sql_text": q.sql_text[:300],
                                 "anomaly_score": severity_weight,
+                                "detection_method": "trend_slope",
                             }
                         ))
         except Exception as e:
             pass  # prediction module may not be available
 
+        # 8. Server CPU vs Seasonal Baseline (from MetricsEngine fast tier)
+        try:
+            from metrics_engine.engine import metrics_engine
+            cpu = metrics_engine.get_current("cpu")
+            if cpu:
+                seasonal = baseline_engine.score("cpu.sql_cpu_percent", cpu.sql_cpu_percent, cpu.timestamp)
+                if seasonal is not None and seasonal["zscore"] > settings.SEASONAL_ZSCORE_THRESHOLD:
+                    severity_weight = 6 if seasonal["zscore"] > settings.SEASONAL_ZSCORE_THRESHOLD * 2 else 4
+                    context = cpu.model_dump()
+                    context["seasonal_baseline"] = seasonal
+                    context["anomaly_score"] = severity_weight
+                    context["detection_method"] = "seasonal_baseline"
+                    anomalies.append(Anomaly(
+                        id=str(uuid.uuid4()),
+                        type=AnomalyType.HIGH_CPU,
+                        severity=self._calculate_severity(severity_weight),
+                        root_resource="Server CPU",
+                        context_data=context
+                    ))
+        except Exception as e:
+            pass  # MetricsEngine may not be initialized yet
+
+        # 9. Declarative Rules (anomaly_detection/rules.yaml, hot-reloaded)
+        try:
+            from metrics_engine.engine import metrics_engine
+            anomalies.extend(rule_engine.evaluate(metrics_engine))
+        except Exception as e:
+            logger.error(f"Declarative rule evaluation failed: {e}")
+
         return anomalies
 
 detector = AnomalyDetector()
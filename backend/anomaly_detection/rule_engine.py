@@ -0,0 +1,271 @@
+"""Declarative anomaly rules over MetricsEngine domains.
+
+Rules live in a YAML file (settings.RULES_FILE_PATH) and are written as
+one-line expressions:
+
+    rate(waits.PAGEIOLATCH_SH) > 200 for 3 intervals
+    value(memory.memory_grants_pending) >= 5 for 2 intervals
+    count(blocking.chains) > 10
+
+Each expression compiles once into an extractor/comparator pair. At
+evaluation time every domain's history is fetched and indexed once and
+shared by all rules over that domain, so adding rules adds a few dict
+lookups each. The file is re-read when its mtime changes; a broken edit
+keeps the previously loaded rules active.
+"""
+import operator
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, get_origin
+
+import yaml
+
+from models.db_models import Anomaly, AnomalyType, SeverityLevel
+from models.metrics import BlockingSnapshot, CpuMetrics, IOSnapshot, MemoryMetrics, SessionSummary, WaitStatsSnapshot
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_EXPR_RE = re.compile(
+    r"^\s*(?P<func>\w+)\(\s*(?P<domain>\w+)\.(?P<key>[\w.]+)\s*\)\s*"
+    r"(?P<op>>=|<=|==|!=|>|<)\s*(?P<threshold>-?\d+(?:\.\d+)?)"
+    r"(?:\s+for\s+(?P<intervals>\d+)\s+intervals?)?\s*$",
+    re.IGNORECASE,
+)
+
+_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Keyed domains: the rule key selects an entry, the function selects its field
+_WAIT_FIELDS = {
+    "rate": "wait_rate_ms_per_sec",
+    "delta": "wait_time_delta_ms",
+    "dominance": "dominance_pct",
+    "tasks": "waiting_tasks_delta",
+}
+
+# Snapshot model per domain; value()/count() fields are checked against it at compile time
+_DOMAIN_MODELS = {
+    "cpu": CpuMetrics,
+    "memory": MemoryMetrics,
+    "sessions": SessionSummary,
+    "blocking": BlockingSnapshot,
+    "waits": WaitStatsSnapshot,
+    "io": IOSnapshot,
+}
+
+
+class RuleError(ValueError):
+    pass
+
+
+class CompiledRule:
+    __slots__ = (
+        "name", "expr", "domain", "extract", "compare", "threshold",
+        "intervals", "anomaly_type", "severity", "description",
+    )
+
+    def __init__(self, name, expr, domain, extract, compare, threshold, intervals,
+                 anomaly_type, severity, description):
+        self.name = name
+        self.expr = expr
+        self.domain = domain
+        self.extract: Callable[[Any], Optional[float]] = extract
+        self.compare = compare
+        self.threshold = threshold
+        self.intervals = intervals
+        self.anomaly_type = anomaly_type
+        self.severity = severity
+        self.description = description
+
+
+def _build_extractor(func: str, domain: str, key: str) -> Callable[[Any], Optional[float]]:
+    """Return a function mapping one indexed snapshot to a float (or None)."""
+    if domain == "waits":
+        field = _WAIT_FIELDS.get(func)
+        if field is None:
+            raise RuleError(f"waits supports {sorted(_WAIT_FIELDS)}, not '{func}'")
+        wait_type = key.upper()
+
+        def extract_wait(index: Dict[str, Any]) -> Optional[float]:
+            entry = index.get(wait_type)
+            # Waits with no delta this poll are filtered out by the collector
+            return float(getattr(entry, field)) if entry is not None else 0.0
+        return extract_wait
+
+    model = _DOMAIN_MODELS[domain]
+    field_info = model.model_fields.get(key)
+    if field_info is None and func in ("count", "value"):
+        raise RuleError(f"{domain} has no field '{key}' (fields: {sorted(model.model_fields)})")
+
+    if func == "count":
+        if get_origin(field_info.annotation) is not list:
+            raise RuleError(f"count() needs a list field; {domain}.{key} is not one")
+
+        def extract_count(snapshot: Any) -> Optional[float]:
+            items = getattr(snapshot, key, None)
+            return float(len(items)) if items is not None else None
+        return extract_count
+
+    if func == "value":
+        if field_info.annotation not in (int, float):
+            raise RuleError(f"value() needs a numeric field; {domain}.{key} is not one")
+
+        def extract_value(snapshot: Any) -> Optional[float]:
+            value = getattr(snapshot, key, None)
+            return float(value) if isinstance(value, (int, float)) else None
+        return extract_value
+
+    raise RuleError(f"Unsupported function '{func}' for domain '{domain}'")
+
+
+def compile_rule(spec: Dict[str, Any]) -> CompiledRule:
+    name = spec.get("name")
+    expr = spec.get("expr", "")
+    if not name:
+        raise RuleError("Rule is missing a name")
+
+    match = _EXPR_RE.match(expr)
+    if not match:
+        raise RuleError(f"Rule '{name}': cannot parse expression '{expr}'")
+
+    func = match.group("func").lower()
+    domain = match.group("domain").lower()
+    if domain not in _DOMAIN_MODELS:
+        raise RuleError(f"Rule '{name}': unknown domain '{domain}'")
+
+    try:
+        anomaly_type = AnomalyType(spec.get("type", "HIGH_WAITS" if domain == "waits" else "HIGH_CPU"))
+        severity = SeverityLevel(spec.get("severity", "WARNING"))
+    except ValueError as e:
+        raise RuleError(f"Rule '{name}': {e}")
+
+    try:
+        extract = _build_extractor(func, domain, match.group("key"))
+    except RuleError as e:
+        raise RuleError(f"Rule '{name}': {e}")
+
+    return CompiledRule(
+        name=name,
+        expr=expr,
+        domain=domain,
+        extract=extract,
+        compare=_OPERATORS[match.group("op")],
+        threshold=float(match.group("threshold")),
+        intervals=max(int(match.group("intervals") or 1), 1),
+        anomaly_type=anomaly_type,
+        severity=severity,
+        description=spec.get("description", ""),
+    )
+
+
+class RuleEngine:
+    """Loads, hot-reloads and evaluates declarative rules."""
+
+    def __init__(self, path: str = settings.RULES_FILE_PATH):
+        if not os.path.isabs(path):
+            # Relative paths resolve against the backend root, not the CWD
+            path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+        self._path = path
+        self._rules: Dict[str, List[CompiledRule]] = {}
+        self._mtime: Optional[float] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def load_rules(self, specs: List[Dict[str, Any]]) -> Dict[str, List[CompiledRule]]:
+        """Compile rule specs grouped by domain. Raises RuleError on bad input."""
+        grouped: Dict[str, List[CompiledRule]] = {}
+        for spec in specs:
+            if spec.get("enabled", True) is False:
+                continue
+            rule = compile_rule(spec)
+            grouped.setdefault(rule.domain, []).append(rule)
+        return grouped
+
+    def maybe_reload(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_check < settings.RULES_RELOAD_CHECK_SECONDS:
+            return
+        self._last_check = now
+
+        try:
+            mtime = os.path.getmtime(self._path)
+        except OSError:
+            if self._mtime is not None:
+                logger.warning(f"Rules file {self._path} disappeared; keeping loaded rules.")
+            return
+        if not force and mtime == self._mtime:
+            return
+
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                payload = yaml.safe_load(f) or {}
+            grouped = self.load_rules(payload.get("rules", []))
+        except (OSError, yaml.YAMLError, RuleError, AttributeError) as e:
+            logger.error(f"Failed to reload rules, keeping previous set: {e}")
+            self._mtime = mtime  # don't retry the same broken file every check
+            return
+
+        with self._lock:
+            self._rules = grouped
+            self._mtime = mtime
+        logger.info(f"Loaded {sum(len(r) for r in grouped.values())} declarative rules from {self._path}")
+
+    def get_rules(self) -> List[CompiledRule]:
+        with self._lock:
+            return [r for rules in self._rules.values() for r in rules]
+
+    def evaluate(self, metrics_engine) -> List[Anomaly]:
+        self.maybe_reload()
+        with self._lock:
+            rules_by_domain = dict(self._rules)
+
+        anomalies = []
+        for domain, rules in rules_by_domain.items():
+            depth = max(r.intervals for r in rules)
+            history = metrics_engine.get_history(domain, depth)
+            if not history:
+                continue
+
+            # Index each snapshot once; every rule on this domain reuses it
+            if domain == "waits":
+                indexed = [{w.wait_type: w for w in snap.waits} for snap in history]
+            else:
+                indexed = history
+
+            for rule in rules:
+                window = indexed[-rule.intervals:]
+                if len(window) < rule.intervals:
+                    continue
+                values = [rule.extract(snap) for snap in window]
+                if any(v is None for v in values):
+                    continue
+                if all(rule.compare(v, rule.threshold) for v in values):
+                    anomalies.append(Anomaly(
+                        id=str(uuid.uuid4()),
+                        type=rule.anomaly_type,
+                        severity=rule.severity,
+                        root_resource=f"Rule {rule.name}",
+                        context_data={
+                            "rule_name": rule.name,
+                            "rule_expr": rule.expr,
+                            "description": rule.description,
+                            "observed_values": [round(v, 2) for v in values],
+                            "threshold": rule.threshold,
+                            "detection_method": "declarative_rule",
+                        },
+                    ))
+        return anomalies
+
+
+rule_engine = RuleEngine()
@@ -1,53 +1,94 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+import uuid
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from models.api_models import ChatRequest, ChatResponse
 from models.chat_models import ChatAgentState
-from chat_agent.graph import chat_agent_graph
+from chat_agent.graph import chat_agent_graph, build_chat_response
 from chat_agent.memory import chat_memory
+from chat_agent.streaming import stream_chat_events
+from chat_agent.sql_memory import sql_memory
+from chat_agent.query_registry import query_registry
+from chat_agent.result_set import result_store
+from utils.concurrency import run_blocking
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 router = APIRouter()
 
+# How often a running /message request checks whether its client is still there
+DISCONNECT_POLL_SECONDS = 0.5
+
+async def _initial_state(request: ChatRequest) -> ChatAgentState:
+    # Load conversation memory (the sqlite backend may read it from disk)
+    history = await run_blocking(chat_memory.get_history, request.session_id)
+
+    return {
+        "session_id": request.session_id,
+        "request_id": request.request_id or str(uuid.uuid4()),
+        "user_message": request.user_message,
+        "chat_history": history,
+        "db_schema_context": "",
+        "generated_sql": "",
+        "original_sql": "",
+        "sql_from_memory": False,
+        "sql_confirmed": False,
+        "is_valid_sql": False,
+        "validation_error": "",
+        "confirmation_token": request.confirmation_token or "",
+        "requires_confirmation": False,
+        "issued_confirmation_token": "",
+        "cost_estimate": {},
+        "query_result": None,
+        "result_id": "",
+        "execution_time_ms": 0.0,
+        "execution_error": "",
+        "explanation": "",
+        "confidence": 0.0,
+        "suggested_chart_type": "none"
+    }
+
+async def _await_unless_disconnected(http_request: Request, task: asyncio.Task, request_id: str):
+    """Result of the graph task, or None if the client went away first (the query is cancelled)."""
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return task.result()
+        if await http_request.is_disconnected():
+            logger.info(f"Client disconnected; cancelling chat request {request_id}.")
+            query_registry.cancel(request_id)
+            task.cancel()
+            return None
+
 @router.post("/message", response_model=ChatResponse)
-async def process_chat_message(request: ChatRequest):
+async def process_chat_message(request: ChatRequest, http_request: Request):
     try:
-        # Load conversation memory
-        history = chat_memory.get_history(request.session_id)
-        
         # Initialize graph state
-        initial_state: ChatAgentState = {
-            "session_id": request.session_id,
-            "user_message": request.user_message,
-            "chat_history": history,
-            "db_schema_context": "",
-            "generated_sql": "",
-            "is_valid_sql": False,
-            "validation_error": "",
-            "query_results_preview": [],
-            "execution_time_ms": 0.0,
-            "execution_error": "",
-            "explanation": "",
-            "confidence": 0.0,
-            "suggested_chart_type": "none"
-        }
+        initial_state = await _initial_state(request)
+        request_id = initial_state["request_id"]
+        query_registry.start(request_id, request.session_id)
         
-        # Synchronously invoke graph
-        final_state = chat_agent_graph.invoke(initial_state)
+        # Nodes await the LLM and hand pyodbc work to the worker pool
+        try:
+            task = asyncio.create_task(chat_agent_graph.ainvoke(initial_state))
+            final_state = await _await_unless_disconnected(http_request, task, request_id)
+        finally:
+            query_registry.finish(request_id)
+
+        if final_state is None:
+            # Nobody is listening; nothing worth remembering either
+            return ChatResponse(
+                explanation="Request cancelled.",
+                error_message="Query cancelled.",
+                request_id=request_id
+            )
         
         # Save Q&A to Memory
-        chat_memory.add_message(request.session_id, "user", request.user_message)
-        chat_memory.add_message(request.session_id, "assistant", final_state.get("explanation", ""))
+        await run_blocking(chat_memory.add_exchange, request.session_id, request.user_message, final_state.get("explanation", ""))
         
         # Formulate Response
-        return ChatResponse(
-            generated_sql=final_state.get("generated_sql"),
-            explanation=final_state.get("explanation"),
-            confidence=final_state.get("confidence", 0.0),
-            execution_time_ms=final_state.get("execution_time_ms", 0.0),
-            query_results_preview=final_state.get("query_results_preview", []),
-            error_message=final_state.get("validation_error") or final_state.get("execution_error"),
-            suggested_chart_type=final_state.get("suggested_chart_type", "none")
-        )
+        return build_chat_response(final_state)
         
     except Exception as e:
         logger.error(f"Chat Graph failed: {e}")
@@ -57,11 +98,71 @@ async def process_chat_message(request: ChatRequest):
             confidence=0.0
         )
 
+class _ClosingStreamingResponse(StreamingResponse):
+    """Closes the body generator however the response ends.
+
+    Starlette abandons the iterator when the client disconnects; closing it
+    here runs its cleanup (statement cancel, LLM slot release) right away.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+@router.post("/message/stream")
+async def stream_chat_message(request: ChatRequest):
+    """SSE variant of /message: emits sql, rows, token and done events as they are ready."""
+    return _ClosingStreamingResponse(
+        stream_chat_events(await _initial_state(request)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/results/{result_id}")
+async def get_chat_result_page(result_id: str, offset: int = 0, limit: int = 500):
+    """Columnar page of a finished chat result: {"columns", "types", "data": [one list per column], ...}."""
+    result = result_store.get(result_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Result '{result_id}' not found or expired.")
+    offset = max(0, offset)
+    limit = max(1, min(limit, 5000))
+    # Serialized once straight from the column arrays; no per-row models
+    body = json.dumps(result.to_payload(offset, limit), default=str)
+    return Response(content=body, media_type="application/json")
+
+@router.delete("/query/{request_id}")
+async def cancel_chat_query(request_id: str):
+    """Cancel an in-flight chat request; a running statement is stopped on the server."""
+    if not query_registry.cancel(request_id):
+        raise HTTPException(status_code=404, detail=f"No running chat query '{request_id}'.")
+    return {"status": "cancelled", "request_id": request_id}
+
+@router.get("/queries")
+async def list_chat_queries():
+    return query_registry.list_active()
+
 @router.get("/history")
 async def get_chat_history(session_id: str = "default_session"):
-    return chat_memory.get_history(session_id)
+    return await run_blocking(chat_memory.get_history, session_id)
 
 @router.delete("/history")
 async def clear_chat_history(session_id: str = "default_session"):
-    chat_memory.clear_session(session_id)
+    await run_blocking(chat_memory.clear_session, session_id)
+    return {"status": "cleared"}
+
+@router.get("/sessions")
+async def chat_session_stats():
+    """Session store occupancy and eviction counters."""
+    return chat_memory.stats()
+
+@router.get("/sql-memory")
+async def sql_memory_stats():
+    """Hit/miss metrics for the NL→SQL memory."""
+    return sql_memory.stats()
+
+@router.delete("/sql-memory")
+async def clear_sql_memory():
+    sql_memory.clear()
     return {"status": "cleared"}
@@ -6,7 +6,14 @@ from api.routes import router as legacy_router
 from api import chat_routes
 from api.server_routes import router as observability_router
 from metrics_engine.engine import metrics_engine
+from metrics_engine.baseline import baseline_engine
+from chat_agent.sql_memory import sql_memory
+from chat_agent.memory import chat_memory
+from agent.jobs import analysis_jobs
+from chat_agent.connection_pool import sandbox_pool
 from data_collection.poller import collector
+from llm.groq_client import groq_client
+from utils.concurrency import shutdown_blocking_pool
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -15,13 +22,25 @@ logger = setup_logger(__name__)
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Enterprise SQL DBA Observability Platform...")
+    baseline_engine.load()  # Restore seasonal profiles before polling resumes
+    sql_memory.load()       # Previously answered NL→SQL templates
+    chat_memory.load()      # Chat sessions (json/sqlite backends)
     metrics_engine.start()  # New tiered polling engine
     collector.start()       # Keep legacy poller for backward compat (anomaly detection)
+    analysis_jobs.start()   # Workers for on-demand /trigger-analysis jobs
     yield
     # Shutdown
     logger.info("Shutting down platform...")
+    await analysis_jobs.stop()
     metrics_engine.stop()
     collector.stop()
+    baseline_engine.save()
+    sql_memory.save()
+    chat_memory.save()
+    chat_memory.close()
+    sandbox_pool.close_all()
+    await groq_client.aclose()
+    shutdown_blocking_pool()
 
 app = FastAPI(
     title="SQL Server DBA Observability Platform",
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from typing import List, Optional
-from models.db_models import MetricSnapshot, Anomaly
-from models.api_models import Recommendation, TriggerAnalysisResponse
+from models.db_models import MetricSnapshot, Anomaly, Incident
+from models.api_models import Recommendation, AnalysisJob
 from data_collection.snapshot import snapshot_manager
 from data_collection.poller import collector
-from agent.graph import dba_agent
-from agent.memory import anomaly_memory
+from agent.jobs import analysis_jobs
+from agent.memory import alert_deduplicator
 from agent.recommendations import recommendation_manager
+from utils.concurrency import run_blocking
 
 router = APIRouter()
 
@@ -29,7 +30,11 @@ async def get_active_anomalies():
     from anomaly_detection.detector import detector
     from config.settings import settings
     history = snapshot_manager.get_history(settings.BASELINE_WINDOW_SIZE)
-    return detector.detect(snapshot, history)
+    return await run_blocking(detector.detect, snapshot, history)
+
+@router.get("/incidents", response_model=List[Incident])
+async def get_incidents(limit: int = 10):
+    return alert_deduplicator.get_incidents(limit)
 
 @router.get("/recommendations", response_model=Optional[Recommendation])
 async def get_latest_recommendation():
@@ -39,32 +44,24 @@ async def get_latest_recommendation():
 async def get_recommendation_history(limit: int = 10):
     return recommendation_manager.get_history(limit)
 
-@router.post("/trigger-analysis", response_model=TriggerAnalysisResponse)
-async def trigger_analysis():
-    
-    initial_state = {"current_snapshot": None}
-    
-    # Run graph synchronously
-    final_state = dba_agent.invoke(initial_state)
-    
-    anomalies_detected = len(final_state.get("detected_anomalies", []))
-    recommendation = final_state.get("current_recommendation")
-    errors = final_state.get("errors", [])
-    
-    if errors:
-        return TriggerAnalysisResponse(
-            status="error",
-            message="; ".join(errors),
-            anomalies_detected=anomalies_detected,
-            recommendations=recommendation
-        )
-        
-    return TriggerAnalysisResponse(
-        status="success",
-        message=f"Analysis complete. {anomalies_detected} anomalies found." if anomalies_detected > 0 else "Analysis complete. Database operates normally.",
-        anomalies_detected=anomalies_detected,
-        recommendations=recommendation
-    )
+@router.post("/trigger-analysis", response_model=AnalysisJob, status_code=202)
+async def trigger_analysis(wait_seconds: float = 0.0):
+    """Queue an analysis (or join one not yet started); wait_seconds holds the request until it finishes."""
+    job = analysis_jobs.submit()
+    if wait_seconds > 0:
+        job = await analysis_jobs.wait(job.job_id, min(wait_seconds, 120.0))
+    return job
+
+@router.get("/analysis-jobs", response_model=List[AnalysisJob])
+async def list_analysis_jobs(limit: int = 10):
+    return analysis_jobs.list_jobs(limit)
+
+@router.get("/analysis-jobs/{job_id}", response_model=AnalysisJob)
+async def get_analysis_job(job_id: str):
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Analysis job '{job_id}' not found.")
+    return job
 
 @router.get("/health")
 async def health_check():
@@ -1,7 +1,14 @@
 """Enterprise observability API routes — domain-specific endpoints."""
 from fastapi import APIRouter
 from metrics_engine.engine import metrics_engine
+from metrics_engine.baseline import baseline_engine
+from metrics_engine.changepoint import changepoint_engine
+from llm.cache import llm_cache
+from chat_agent.connection_pool import sandbox_pool
+from chat_agent.cost_guard import cost_guard
+from chat_agent.result_cache import result_cache
 from utils.db import list_all_databases, get_active_database, set_active_database
+from utils.concurrency import run_blocking
 
 router = APIRouter()
 
@@ -49,6 +56,24 @@ async def server_waits():
     }
 
 
+@router.get("/server/baselines")
+async def server_baselines():
+    cpu = metrics_engine.get_current("cpu")
+    sessions = metrics_engine.get_current("sessions")
+    return {
+        "summary": baseline_engine.summary(),
+        "cpu": baseline_engine.score("cpu.sql_cpu_percent", cpu.sql_cpu_percent, cpu.timestamp) if cpu else None,
+        "sessions": baseline_engine.score("sessions.active_sessions", sessions.active_sessions, sessions.timestamp) if sessions else None,
+    }
+
+
+@router.get("/server/change-points")
+async def server_change_points():
+    return {
+        "events": [e.model_dump() for e in reversed(changepoint_engine.get_events())],
+    }
+
+
 @router.get("/workload/sessions")
 async def workload_sessions():
     current = metrics_engine.get_current("sessions")
@@ -132,7 +157,7 @@ async def get_active_db():
 async def list_databases():
     """List all user databases on this SQL Server instance."""
     return {
-        "databases": list_all_databases(),
+        "databases": await run_blocking(list_all_databases),
         "active": get_active_database(),
     }
 
@@ -144,13 +169,13 @@ async def switch_database(payload: dict):
     if not db_name:
         return {"error": "database name required"}, 400
 
-    available = list_all_databases()
+    available = await run_blocking(list_all_databases)
     if db_name not in available:
         return {"error": f"'{db_name}' not found on server", "available": available}
 
     set_active_database(db_name)
     metrics_engine.reset_history()
-    metrics_engine.force_refresh_all()
+    await run_blocking(metrics_engine.force_refresh_all)
     return {
         "success": True,
         "active": db_name,
@@ -158,10 +183,47 @@ async def switch_database(payload: dict):
     }
 
 
+@router.get("/admin/llm-cache")
+async def llm_cache_stats():
+    """Hit/miss metrics for the LLM response cache."""
+    return llm_cache.stats()
+
+
+@router.delete("/admin/llm-cache")
+async def clear_llm_cache():
+    """Drop all cached LLM responses (memory and disk tiers)."""
+    llm_cache.clear()
+    return {"success": True}
+
+
+@router.get("/admin/sandbox-pool")
+async def sandbox_pool_stats():
+    """Chat sandbox connection pool metrics."""
+    return sandbox_pool.stats()
+
+
+@router.get("/admin/cost-guard")
+async def cost_guard_stats():
+    """Plan-estimate cache metrics for the chat cost guard."""
+    return cost_guard.stats()
+
+
+@router.get("/admin/result-cache")
+async def result_cache_stats():
+    """Chat result cache metrics (hits, evictions, bytes held)."""
+    return result_cache.stats()
+
+
+@router.delete("/admin/result-cache")
+async def clear_result_cache():
+    result_cache.clear()
+    return {"status": "cleared"}
+
+
 @router.post("/admin/refresh-all")
 async def refresh_all():
     """Force-refresh all collectors immediately (bypasses polling timers)."""
-    metrics_engine.force_refresh_all()
+    await run_blocking(metrics_engine.force_refresh_all)
     return {
         "success": True,
         "database": get_active_database(),
@@ -0,0 +1,91 @@
+"""Micro-benchmark: keyword-scanner vs. full sqlparse validation of chat SQL.
+
+Run from backend/:  python bench_validator.py [iterations]
+Also checks that both paths agree on every sample the scanner decides, and that
+validate() agrees with the full parse on numeric-literal edge cases.
+"""
+import sys
+import os
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chat_agent.validator import SqlValidator
+
+SHORT = "SELECT TOP (10) name, create_date FROM sys.databases ORDER BY create_date DESC;"
+
+CTE = """
+-- Monthly revenue per region with running totals
+WITH monthly AS (
+    SELECT r.[Region Name] AS region, DATEFROMPARTS(YEAR(o.OrderDate), MONTH(o.OrderDate), 1) AS month,
+           SUM(ol.Quantity * ol.UnitPrice) AS revenue  /* gross, before returns */
+    FROM Sales.Orders o
+    JOIN Sales.OrderLines ol ON ol.OrderID = o.OrderID
+    JOIN Application.Regions r ON r.RegionID = o.RegionID
+    WHERE o.Comments NOT LIKE N'%update%' AND o.Status <> 'it''s deleted'
+    GROUP BY r.[Region Name], DATEFROMPARTS(YEAR(o.OrderDate), MONTH(o.OrderDate), 1)
+), ranked AS (
+    SELECT region, month, revenue,
+           SUM(revenue) OVER (PARTITION BY region ORDER BY month ROWS UNBOUNDED PRECEDING) AS running,
+           RANK() OVER (PARTITION BY month ORDER BY revenue DESC) AS rnk
+    FROM monthly
+)
+SELECT TOP (1000) region, month, revenue, running, rnk
+FROM ranked
+WHERE rnk <= 5
+ORDER BY month, rnk;
+"""
+
+LONG = CTE.replace("ORDER BY month, rnk;", "") + "\n".join(
+    f"UNION ALL SELECT TOP (1000) region, month, revenue, running, rnk FROM ranked WHERE rnk = {i}"
+    for i in range(40)
+)
+
+BLOCKED = "SELECT * FROM dbo.Orders; DROP TABLE dbo.Orders;"
+
+SAMPLES = {"short": SHORT, "cte": CTE, "long": LONG, "blocked": BLOCKED}
+
+# Lexer edge cases: only checked for agreement, not timed
+EDGE_CASES = [
+    "SELECT 1.5E2DELETE FROM t",
+    "SELECT 1.5E2 DELETE FROM t",
+    "SELECT 1DELETE FROM t",
+    "SELECT 0x1FDROP FROM t",
+    "SELECT 0xDELETE FROM t",
+    "SELECT 1e FROM t",
+    "SELECT 1.5e2, 1.e5, .5, 0x1F, 3. FROM t",
+    "SELECT .5UPDATE FROM t",
+    "SELECT 1$ FROM t",
+]
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    validator = SqlValidator()
+
+    mismatches = 0
+    for sql in EDGE_CASES:
+        verdict = validator.validate(sql)
+        parsed = validator._parse_validate(sql)
+        if verdict[0] != parsed[0]:
+            mismatches += 1
+            print(f"  MISMATCH on {sql!r}: validate={verdict} parse={parsed}")
+    print(f"{len(EDGE_CASES)} lexer edge cases checked, {mismatches} mismatches\n")
+
+    print(f"{'sample':<10}{'chars':>8}{'parse ms':>12}{'scan ms':>12}{'cached ms':>12}{'speedup':>10}")
+    for name, sql in SAMPLES.items():
+        scanned = validator._scan_validate(sql)
+        parsed = validator._parse_validate(sql)
+        if scanned is not None and scanned[0] != parsed[0]:
+            print(f"  MISMATCH on {name}: scan={scanned} parse={parsed}")
+
+        parse_ms = timeit.timeit(lambda: validator._parse_validate(sql), number=iterations) * 1000 / iterations
+        scan_ms = timeit.timeit(lambda: validator._scan_validate(sql), number=iterations) * 1000 / iterations
+        validator.validate(sql)
+        cached_ms = timeit.timeit(lambda: validator.validate(sql), number=iterations) * 1000 / iterations
+        print(f"{name:<10}{len(sql):>8}{parse_ms:>12.3f}{scan_ms:>12.3f}{cached_ms:>12.4f}{parse_ms / scan_ms:>9.0f}x")
+
+    print(f"\nvalidator stats: {validator.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Pooled read-only sandbox connections for chat queries.
+
+Each connection is opened once with ApplicationIntent=ReadOnly, autocommit
+and the sandbox session settings (lock timeout, isolation level) applied.
+Between uses it is reset (open transactions rolled back, settings
+re-applied); connections idle for a while are pinged before reuse, and
+anything that errors is discarded instead of being returned to the pool.
+Idle connections past CHAT_POOL_MAX_IDLE_SECONDS are closed on any
+database, including ones no longer active. Pings, connects and closes run
+outside the pool lock so one slow server can't stall the others.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pyodbc
+
+from utils.db import get_connection_string, get_active_database
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_ISOLATION_LEVELS = {"READ UNCOMMITTED", "READ COMMITTED", "REPEATABLE READ", "SNAPSHOT", "SERIALIZABLE"}
+
+
+class PoolExhaustedError(Exception):
+    """No sandbox connection became free within the acquire timeout."""
+
+
+def _session_settings_sql() -> str:
+    isolation = settings.CHAT_ISOLATION_LEVEL.strip().upper()
+    if isolation not in _ISOLATION_LEVELS:
+        logger.warning(f"Unknown CHAT_ISOLATION_LEVEL '{isolation}', using READ COMMITTED.")
+        isolation = "READ COMMITTED"
+    # A pessimistic lock timeout keeps the chatbot from waiting indefinitely on a
+    # locked table, protecting the main app.
+    return (
+        f"SET LOCK_TIMEOUT {int(settings.CHAT_LOCK_TIMEOUT_MS)}; "
+        f"SET TRANSACTION ISOLATION LEVEL {isolation};"
+    )
+
+
+_RESET_SQL = "IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION; "
+
+
+class SandboxConnectionPool:
+    def __init__(self, size: int = settings.CHAT_POOL_SIZE):
+        self.size = size
+        # database -> idle [(connection, last_used monotonic)], most recent last
+        self._idle: Dict[str, List[Tuple[pyodbc.Connection, float]]] = {}
+        self._in_use: Dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "discarded": 0,
+            "health_check_failures": 0,
+            "acquire_timeouts": 0,
+            "waits": 0,
+        }
+
+    def _connect(self, database: str) -> pyodbc.Connection:
+        conn_str = get_connection_string(database)
+        if settings.CHAT_READ_ONLY_INTENT:
+            conn_str += "ApplicationIntent=ReadOnly;"
+        logger.info("Connecting to sandbox execution environment...")
+        # Enforce read-only autocommit to prevent locking transactions from hanging
+        conn = pyodbc.connect(conn_str, autocommit=True, timeout=settings.QUERY_TIMEOUT_SECONDS)
+        conn.timeout = settings.QUERY_TIMEOUT_SECONDS
+        conn.execute(_session_settings_sql()).close()
+        return conn
+
+    @staticmethod
+    def _close(conn: pyodbc.Connection) -> None:
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug(f"Error closing sandbox connection: {e}")
+
+    def _is_healthy(self, conn: pyodbc.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+    def _reap_expired(self, now: float) -> List[pyodbc.Connection]:
+        """Remove idle connections past CHAT_POOL_MAX_IDLE_SECONDS on every database (caller holds the lock).
+
+        Returns them for the caller to close after releasing the lock.
+        """
+        expired = []
+        for database in list(self._idle):
+            idle = self._idle[database]
+            # Most recent last, so the stale ones are at the front
+            stale = 0
+            while stale < len(idle) and now - idle[stale][1] > settings.CHAT_POOL_MAX_IDLE_SECONDS:
+                stale += 1
+            if stale:
+                expired.extend(conn for conn, _ in idle[:stale])
+                del idle[:stale]
+                self._stats["discarded"] += stale
+            if not idle:
+                # Databases no longer in use don't keep an entry around
+                del self._idle[database]
+        return expired
+
+    def _reserve(self, database: str, deadline: float) -> Tuple[Optional[Tuple[pyodbc.Connection, float]], List[pyodbc.Connection]]:
+        """Take a slot for the database: (idle (connection, last_used) or None to connect fresh, expired connections to close)."""
+        with self._cond:
+            expired = self._reap_expired(time.monotonic())
+            waited = False
+            while True:
+                idle = self._idle.get(database)
+                if idle:
+                    self._in_use[database] = self._in_use.get(database, 0) + 1
+                    return idle.pop(), expired
+                if self._in_use.get(database, 0) < self.size:
+                    self._in_use[database] = self._in_use.get(database, 0) + 1
+                    return None, expired
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["acquire_timeouts"] += 1
+                    break
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+        for conn in expired:
+            self._close(conn)
+        raise PoolExhaustedError(f"All {self.size} sandbox connections for {database} are busy.")
+
+    def _acquire(self, database: str) -> pyodbc.Connection:
+        deadline = time.monotonic() + settings.CHAT_POOL_ACQUIRE_TIMEOUT_SECONDS
+        while True:
+            candidate, expired = self._reserve(database, deadline)
+            # Network I/O (close, health check, connect) happens outside the lock
+            for conn in expired:
+                self._close(conn)
+            if candidate is None:
+                break
+            conn, last_used = candidate
+            if time.monotonic() - last_used <= settings.CHAT_POOL_HEALTHCHECK_IDLE_SECONDS or self._is_healthy(conn):
+                with self._cond:
+                    self._stats["reused"] += 1
+                return conn
+            self._close(conn)
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+                self._stats["discarded"] += 1
+                # Give the slot back and try the next idle connection
+                self._in_use[database] -= 1
+                self._cond.notify()
+
+        try:
+            conn = self._connect(database)
+        except Exception:
+            with self._cond:
+                self._in_use[database] -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _release(self, database: str, conn: pyodbc.Connection, broken: bool) -> None:
+        if not broken:
+            try:
+                # Undo anything the query left behind before the next user gets it
+                conn.execute(_RESET_SQL + _session_settings_sql()).close()
+            except Exception as e:
+                logger.warning(f"Sandbox connection reset failed, discarding: {e}")
+                broken = True
+
+        with self._cond:
+            self._in_use[database] -= 1
+            if broken:
+                self._stats["discarded"] += 1
+            else:
+                self._idle.setdefault(database, []).append((conn, time.monotonic()))
+            self._cond.notify()
+        if broken:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self, database: Optional[str] = None) -> Iterator[pyodbc.Connection]:
+        """Borrow a sandbox connection for the database (active one by default)."""
+        database = database or get_active_database()
+        conn = self._acquire(database)
+        broken = False
+        try:
+            yield conn
+        except pyodbc.Error:
+            # Timeouts and lost links can leave the session unusable
+            broken = True
+            raise
+        finally:
+            self._release(database, conn, broken)
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                **self._stats,
+                "size": self.size,
+                "in_use": dict(self._in_use),
+                "idle": {db: len(conns) for db, conns in self._idle.items()},
+            }
+
+    def close_all(self) -> None:
+        with self._cond:
+            for conns in self._idle.values():
+                for conn, _ in conns:
+                    self._close(conn)
+            self._idle.clear()
+
+
+sandbox_pool = SandboxConnectionPool()
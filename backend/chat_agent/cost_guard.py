@@ -0,0 +1,230 @@
+"""Pre-execution cost guard for LLM-generated SQL.
+
+Fetches the estimated plan with SET SHOWPLAN_XML ON (nothing is executed),
+reads the estimated subtree cost and row counts, and decides whether the
+query may run, needs the user's confirmation, or is refused. Estimates are
+cached per database by normalized SQL.
+
+A CONFIRM verdict issues a single-use confirmation token. The statement
+and database it was issued for are kept server-side under the token, so
+the confirming request runs exactly that statement instead of asking the
+LLM again (a changed history would produce different SQL). The token
+skips the confirmation step only for the same statement and database
+with an estimate no higher than the confirmed one.
+
+`estimate_with_cursor` only needs execute/fetchall/nextset, so it can be
+driven by a fake cursor.
+"""
+import secrets
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.chat_models import PlanEstimate
+from chat_agent.connection_pool import sandbox_pool
+from chat_agent.sql_utils import normalize_sql
+from utils.db import get_active_database
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SHOWPLAN_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+
+# Plan warnings worth surfacing; NoJoinPredicate is the Cartesian-join tell
+_PLAN_WARNINGS = ("NoJoinPredicate", "SpillToTempDb", "UnmatchedIndexes")
+
+ALLOW = "allow"
+CONFIRM = "confirm"
+REJECT = "reject"
+
+
+def parse_showplan(xml_text: str, estimate: Optional[PlanEstimate] = None) -> PlanEstimate:
+    """Fold one ShowPlanXML document into the estimate."""
+    estimate = estimate or PlanEstimate()
+    root = ET.fromstring(xml_text)
+
+    for stmt in root.iter(f"{SHOWPLAN_NS}StmtSimple"):
+        if stmt.get("StatementSubTreeCost") is None:
+            continue
+        estimate.statement_count += 1
+        estimate.estimated_cost += float(stmt.get("StatementSubTreeCost", 0.0))
+        estimate.estimated_rows += float(stmt.get("StatementEstRows", 0.0))
+
+    for relop in root.iter(f"{SHOWPLAN_NS}RelOp"):
+        rows = float(relop.get("EstimateRows", 0.0))
+        if rows > estimate.max_operator_rows:
+            estimate.max_operator_rows = rows
+
+    for element in root.iter():
+        for name in _PLAN_WARNINGS:
+            flagged = element.get(name) in ("true", "1") or element.tag == f"{SHOWPLAN_NS}{name}"
+            if flagged and name not in estimate.warnings:
+                estimate.warnings.append(name)
+    return estimate
+
+
+def estimate_with_cursor(cursor: Any, sql: str) -> PlanEstimate:
+    """Compile (not run) the SQL on the cursor's session and parse the estimated plan."""
+    cursor.execute("SET SHOWPLAN_XML ON")
+    try:
+        cursor.execute(sql)
+        estimate = PlanEstimate()
+        while True:
+            for row in cursor.fetchall():
+                parse_showplan(row[0], estimate)
+            if not cursor.nextset():
+                break
+        return estimate
+    finally:
+        # The pool hands this session to the next query; showplan must not stay on
+        cursor.execute("SET SHOWPLAN_XML OFF")
+
+
+def decide(estimate: PlanEstimate, confirmed: bool = False) -> Tuple[str, str]:
+    """(verdict, reason) for an estimate against the configured thresholds."""
+    if estimate.estimated_cost >= settings.CHAT_COST_REJECT_THRESHOLD:
+        return REJECT, (
+            f"Query refused: estimated cost {estimate.estimated_cost:.1f} exceeds the limit of "
+            f"{settings.CHAT_COST_REJECT_THRESHOLD:.0f}. Try narrowing it with filters or aggregation."
+        )
+    if confirmed:
+        return ALLOW, ""
+
+    reasons = []
+    if estimate.estimated_cost >= settings.CHAT_COST_CONFIRM_THRESHOLD:
+        reasons.append(f"estimated cost {estimate.estimated_cost:.1f}")
+    if estimate.max_operator_rows >= settings.CHAT_ROWS_CONFIRM_THRESHOLD:
+        reasons.append(f"about {estimate.max_operator_rows:,.0f} intermediate rows")
+    if "NoJoinPredicate" in estimate.warnings:
+        reasons.append("a join without a predicate (Cartesian product)")
+    if reasons:
+        return CONFIRM, (
+            f"This query looks expensive ({', '.join(reasons)}). "
+            "Confirm to run it anyway."
+        )
+    return ALLOW, ""
+
+
+class CostGuard:
+    def __init__(
+        self,
+        max_entries: int = settings.CHAT_COST_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.CHAT_COST_CACHE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._cache: "OrderedDict[str, Tuple[float, PlanEstimate]]" = OrderedDict()
+        # token -> (expires_at, cache key, confirmed estimated cost, database, statement as generated)
+        self._confirmations: "OrderedDict[str, Tuple[float, str, float, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "failures": 0, "confirmed": 0}
+
+    @staticmethod
+    def _key(sql: str, database: str) -> str:
+        return f"{database.lower()}|{normalize_sql(sql)}"
+
+    def estimate(self, sql: str, database: Optional[str] = None) -> Optional[PlanEstimate]:
+        """Cached plan estimate, or None if the plan could not be obtained."""
+        database = database or get_active_database()
+        key = self._key(sql, database)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+
+        try:
+            with sandbox_pool.connection(database) as conn:
+                cursor = conn.cursor()
+                try:
+                    estimate = estimate_with_cursor(cursor, sql)
+                finally:
+                    cursor.close()
+        except Exception as e:
+            logger.warning(f"Plan estimate failed: {e}")
+            with self._lock:
+                self._stats["failures"] += 1
+            return None
+
+        with self._lock:
+            self._cache[key] = (now + self.ttl_seconds, estimate)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return estimate
+
+    def issue_confirmation(
+        self, sql: str, database: str, estimate: PlanEstimate, original_sql: Optional[str] = None
+    ) -> str:
+        """Token for running ``sql`` anyway; ``original_sql`` is the statement before row limiting."""
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._confirmations[token] = (
+                time.monotonic() + settings.CHAT_COST_CONFIRM_TTL_SECONDS,
+                self._key(sql, database),
+                estimate.estimated_cost,
+                database,
+                original_sql or sql,
+            )
+            while len(self._confirmations) > self.max_entries:
+                self._confirmations.popitem(last=False)
+        return token
+
+    def redeem_confirmation(self, token: Optional[str], sql: str, database: str, estimate: PlanEstimate) -> bool:
+        """True if the token was issued for this statement and estimate; a token is used up on success."""
+        if not token:
+            return False
+        with self._lock:
+            entry = self._confirmations.get(token)
+            if entry is None:
+                return False
+            expires_at, key, confirmed_cost = entry[:3]
+            if expires_at <= time.monotonic():
+                del self._confirmations[token]
+                return False
+            if key != self._key(sql, database) or estimate.estimated_cost > confirmed_cost:
+                return False
+            del self._confirmations[token]
+            self._stats["confirmed"] += 1
+        return True
+
+    def pending_statement(self, token: Optional[str], database: str) -> Optional[str]:
+        """The statement a live token was issued for on this database (not consumed), else None."""
+        if not token:
+            return None
+        with self._lock:
+            entry = self._confirmations.get(token)
+            if entry is None or entry[0] <= time.monotonic() or entry[3].lower() != database.lower():
+                return None
+            return entry[4]
+
+    def check(
+        self,
+        sql: str,
+        confirmation_token: Optional[str] = None,
+        database: Optional[str] = None,
+        original_sql: Optional[str] = None,
+    ) -> Tuple[str, str, Optional[PlanEstimate], str]:
+        """(verdict, reason, estimate, confirmation token to return with a CONFIRM verdict)."""
+        database = database or get_active_database()
+        estimate = self.estimate(sql, database)
+        if estimate is None:
+            # Fail open: SHOWPLAN needs the SHOWPLAN permission, which a sandbox login may lack
+            return ALLOW, "", None, ""
+        confirmed = self.redeem_confirmation(confirmation_token, sql, database, estimate)
+        verdict, reason = decide(estimate, confirmed)
+        token = self.issue_confirmation(sql, database, estimate, original_sql) if verdict == CONFIRM else ""
+        return verdict, reason, estimate, token
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._cache), "pending_confirmations": len(self._confirmations)}
+
+
+cost_guard = CostGuard()
@@ -1,6 +1,11 @@
 import pyodbc
-from typing import Dict, Any, List, Tuple
-from utils.db import get_connection_string
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+from chat_agent.connection_pool import sandbox_pool
+from chat_agent.query_registry import query_registry, QueryCancelledError
+from chat_agent.result_cache import result_cache
+from chat_agent.result_set import ColumnarResult
+from utils.db import get_active_database
 from config.settings import settings
 from utils.logger import setup_logger
 import time
@@ -8,52 +13,102 @@ import time
 logger = setup_logger(__name__)
 
 class QueryExecutor:
-    def execute(self, sql: str) -> Tuple[List[Dict[str, Any]], float, str]:
+    @contextmanager
+    def _sandbox_cursor(self, sql: str, database: str, request_id: Optional[str] = None) -> Iterator[pyodbc.Cursor]:
+        """Borrow a pooled read-only sandbox connection, run the SQL and yield the cursor."""
+        # Session settings (lock timeout, isolation) are preapplied by the pool
+        with sandbox_pool.connection(database) as conn:
+            cursor = conn.cursor()
+            try:
+                # Registered before execute so a cancel can interrupt the statement mid-flight
+                query_registry.attach(request_id, cursor, sql)
+
+                # The hard row limit is injected upstream (row_limiter); fetchmany below is the backstop
+                logger.debug(f"Executing Sandbox SQL => {sql[:100]}")
+                cursor.execute(sql)
+                # A cancel that landed between attach and execute had no statement to stop
+                if query_registry.is_cancelled(request_id):
+                    raise QueryCancelledError(f"Query {request_id} was cancelled.")
+                yield cursor
+            finally:
+                query_registry.detach(request_id)
+                cursor.close()
+
+    def execute(self, sql: str, request_id: Optional[str] = None) -> Tuple[Optional[ColumnarResult], float, str]:
         """
         Executes a SQL query in a safe, read-only isolated connection.
-        Returns: (results_list, execution_time_ms, error_string)
+        Returns: (columnar result or None, execution_time_ms, error_string)
         """
         start_time = time.time()
-        conn = None
+        database = get_active_database()
         try:
-            logger.info("Connecting to sandbox execution environment...")
-            # Enforce read-only autocommit to prevent locking transactions from hanging
-            conn = pyodbc.connect(get_connection_string(), autocommit=True, timeout=settings.QUERY_TIMEOUT_SECONDS)
-            cursor = conn.cursor()
+            if settings.CHAT_RESULT_CACHE_ENABLED:
+                cached = result_cache.get(sql, database)
+                if cached is not None:
+                    logger.debug(f"Result cache hit => {sql[:100]}")
+                    return cached, (time.time() - start_time) * 1000, ""
+
+            with self._sandbox_cursor(sql, database, request_id) as cursor:
+                # For queries like SELECT, fetch results.
+                # If the LLM generates a valid "PRINT" or something that doesn't return rows, skip.
+                if not cursor.description:
+                    exec_time_ms = (time.time() - start_time) * 1000
+                    return None, exec_time_ms, "Query executed successfully but returned no rows."
 
-            # Set a pessimistic lock timeout (e.g., 5000ms) so the chatbot won't wait 
-            # indefinitely if it queries a locked table, protecting the main app.
-            cursor.execute("SET LOCK_TIMEOUT 5000")
-            
-            # We enforce a hard row limit if the query missed a TOP/LIMIT clause
-            sql_restricted = sql
-            
-            logger.debug(f"Executing Sandbox SQL => {sql_restricted[:100]}")
-            cursor.execute(sql_restricted)
-            
-            # For queries like SELECT, fetch results. 
-            # If the LLM generates a valid "PRINT" or something that doesn't return rows, skip.
-            if cursor.description:
-                columns = [column[0] for column in cursor.description]
-                
                 # We enforce max rows at runtime to prevent RAM explosion
-                rows = cursor.fetchmany(settings.CHAT_MAX_RESULT_ROWS) 
-                
-                results = [dict(zip(columns, row)) for row in rows]
-                exec_time_ms = (time.time() - start_time) * 1000
-                return results, exec_time_ms, ""
-            else:
-                exec_time_ms = (time.time() - start_time) * 1000
-                return [], exec_time_ms, "Query executed successfully but returned no rows."
-                
+                result = ColumnarResult.from_cursor(cursor, settings.CHAT_MAX_RESULT_ROWS)
+
+            exec_time_ms = (time.time() - start_time) * 1000
+            # Cached after the connection is back in the pool; the watermark read may need one
+            if settings.CHAT_RESULT_CACHE_ENABLED:
+                result_cache.put(sql, result, database)
+            return result, exec_time_ms, ""
+
+        except QueryCancelledError:
+            return None, (time.time() - start_time) * 1000, "Query cancelled."
         except pyodbc.Error as e:
+            if query_registry.is_cancelled(request_id):
+                logger.info(f"Sandbox query {request_id} cancelled.")
+                return None, (time.time() - start_time) * 1000, "Query cancelled."
             logger.error(f"Sandbox query exception: {e}")
-            return [], (time.time() - start_time) * 1000, f"Database Execution Error: {str(e)}"
+            return None, (time.time() - start_time) * 1000, f"Database Execution Error: {str(e)}"
         except Exception as e:
             logger.error(f"Unexpected execution error: {e}")
-            return [], (time.time() - start_time) * 1000, f"Unexpected Error: {str(e)}"
-        finally:
-            if conn:
-                conn.close()
+            return None, (time.time() - start_time) * 1000, f"Unexpected Error: {str(e)}"
+
+    def iter_batches(self, sql: str, batch_size: int = 100, request_id: Optional[str] = None) -> Iterator[ColumnarResult]:
+        """
+        Executes a SQL query in the sandbox and yields columnar fetchmany batches,
+        up to CHAT_MAX_RESULT_ROWS in total. Raises on database errors and cancellation.
+        """
+        database = get_active_database()
+        if settings.CHAT_RESULT_CACHE_ENABLED:
+            cached = result_cache.get(sql, database)
+            if cached is not None:
+                for start in range(0, cached.row_count, batch_size):
+                    yield cached.slice(start, batch_size)
+                return
+
+        batches = []
+        with self._sandbox_cursor(sql, database, request_id) as cursor:
+            if not cursor.description:
+                return
+            columns = [column[0] for column in cursor.description]
+            types = ColumnarResult.describe_types(cursor)
+            remaining = settings.CHAT_MAX_RESULT_ROWS
+            while remaining > 0:
+                if query_registry.is_cancelled(request_id):
+                    raise QueryCancelledError(f"Query {request_id} was cancelled.")
+                rows = cursor.fetchmany(min(batch_size, remaining))
+                if not rows:
+                    break
+                remaining -= len(rows)
+                batch = ColumnarResult.from_rows(columns, rows, types)
+                batches.append(batch)
+                yield batch
+
+        if settings.CHAT_RESULT_CACHE_ENABLED:
+            result = ColumnarResult.concat(batches) or ColumnarResult(columns, types)
+            result_cache.put(sql, result, database)
 
 query_executor = QueryExecutor()
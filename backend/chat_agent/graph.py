@@ -2,24 +2,67 @@ from typing import Dict, List
 import json
 from langgraph.graph import StateGraph, END
 from models.chat_models import ChatAgentState
-from chat_agent.schema import schema_introspector
+from models.api_models import ChatResponse
+from chat_agent.schema_index import schema_index
 from chat_agent.sql_generator import sql_generator
 from chat_agent.validator import sql_validator
+from chat_agent.row_limiter import row_limiter
+from chat_agent.cost_guard import cost_guard, ALLOW, CONFIRM
 from chat_agent.executor import query_executor
+from chat_agent.result_set import result_store
 from chat_agent.synthesizer import result_synthesizer
+from chat_agent.sql_memory import sql_memory, is_self_contained
+from config.settings import settings
+from utils.db import get_active_database
+from utils.concurrency import run_blocking
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-def introspect_schema_node(state: ChatAgentState) -> ChatAgentState:
+def recall_sql_node(state: ChatAgentState) -> ChatAgentState:
+    logger.info("ChatNode: recall_sql")
+    state["sql_from_memory"] = False
+    state["sql_confirmed"] = False
+
+    # Confirming an expensive query runs the statement the user saw, not a regenerated one
+    pending = cost_guard.pending_statement(state.get("confirmation_token"), get_active_database())
+    if pending:
+        logger.info("Running the statement held for confirmation; skipping recall, schema and generation.")
+        state["generated_sql"] = pending
+        state["sql_confirmed"] = True
+        return state
+
+    if not settings.SQL_MEMORY_ENABLED:
+        return state
+    if not is_self_contained(state["user_message"], bool(state.get("chat_history"))):
+        return state
+
+    sql = sql_memory.recall(state["user_message"], get_active_database())
+    if sql:
+        logger.info("Reusing SQL from NL→SQL memory; skipping schema and generation.")
+        state["generated_sql"] = sql
+        state["sql_from_memory"] = True
+    return state
+
+def check_sql_recalled(state: ChatAgentState) -> str:
+    """Conditional Edge skipping introspection and the LLM when memory or a confirmation already has the SQL"""
+    if state.get("sql_from_memory", False) or state.get("sql_confirmed", False):
+        return "validate_sql"
+    return "introspect_schema"
+
+async def introspect_schema_node(state: ChatAgentState) -> ChatAgentState:
     logger.info("ChatNode: introspect_schema")
-    # Fetch compressed schema for the LLM context prompt
-    state["db_schema_context"] = schema_introspector.get_schema_summary()
+    # Recent user turns keep follow-ups ("now by month") anchored to the same tables
+    recent_user_turns = [m["content"] for m in state.get("chat_history", [])[-4:] if m.get("role") == "user"]
+    question = " ".join(recent_user_turns + [state["user_message"]])
+
+    # Fetch only the question-relevant schema for the LLM context prompt (pyodbc, so off the event loop)
+    state["db_schema_context"] = await run_blocking(schema_index.build_context, question)
     return state
 
-def generate_sql_node(state: ChatAgentState) -> ChatAgentState:
+async def generate_sql_node(state: ChatAgentState) -> ChatAgentState:
     logger.info("ChatNode: generate_sql")
-    state["generated_sql"] = sql_generator.generate(state)
+    state["generated_sql"] = await sql_generator.agenerate(state)
     return state
 
 def validate_sql_node(state: ChatAgentState) -> ChatAgentState:
@@ -35,49 +78,141 @@ def validate_sql_node(state: ChatAgentState) -> ChatAgentState:
     is_valid, error_msg = sql_validator.validate(sql)
     state["is_valid_sql"] = is_valid
     state["validation_error"] = error_msg
+    if not is_valid and state.get("sql_from_memory"):
+        sql_memory.forget(state["user_message"], get_active_database())
     return state
 
 def check_sql_validity(state: ChatAgentState) -> str:
     """Conditional Edge preventing Sandbox Execution if SQL AST parsed illegal DML"""
     if state.get("is_valid_sql", False):
-        return "execute_sql"
+        return "limit_rows"
     return "synthesize_results"
 
-def execute_sql_node(state: ChatAgentState) -> ChatAgentState:
+def limit_rows_node(state: ChatAgentState) -> ChatAgentState:
+    logger.info("ChatNode: limit_rows")
+    # Cap the row count in the SQL itself so the server stops producing rows, not just the client
+    # The unlimited statement is what NL→SQL memory keeps, so a changed cap applies on recall
+    state["original_sql"] = state.get("generated_sql", "")
+    sql, notes = row_limiter.limit(state["original_sql"])
+    if notes:
+        logger.info(f"Row limit applied: {'; '.join(notes)}")
+    state["generated_sql"] = sql
+    return state
+
+async def guard_cost_node(state: ChatAgentState) -> ChatAgentState:
+    logger.info("ChatNode: guard_cost")
+    state["requires_confirmation"] = False
+    state["issued_confirmation_token"] = ""
+    if not settings.CHAT_COST_GUARD_ENABLED:
+        return state
+
+    # SHOWPLAN compiles the query without running it; still a round-trip, so off the loop
+    verdict, reason, estimate, token = await run_blocking(
+        cost_guard.check,
+        state["generated_sql"],
+        state.get("confirmation_token") or None,
+        None,
+        state.get("original_sql") or None,
+    )
+    if estimate is not None:
+        state["cost_estimate"] = estimate.model_dump()
+    if verdict != ALLOW:
+        logger.info(f"Cost guard blocked query ({verdict}): {reason}")
+        state["execution_error"] = reason
+        state["requires_confirmation"] = verdict == CONFIRM
+        state["issued_confirmation_token"] = token
+    return state
+
+def check_cost_verdict(state: ChatAgentState) -> str:
+    """Conditional Edge holding back queries the cost guard refused or wants confirmed"""
+    if state.get("execution_error"):
+        return "synthesize_results"
+    return "execute_sql"
+
+async def execute_sql_node(state: ChatAgentState) -> ChatAgentState:
     logger.info("ChatNode: execute_sql")
     sql = state.get("generated_sql", "")
     
-    # Fire it to the explicit read-only pyodbc connection
-    results, exec_time, error = query_executor.execute(sql)
+    # Fire it to the explicit read-only pyodbc connection on the bounded worker pool
+    result, exec_time, error = await run_blocking(query_executor.execute, sql, state.get("request_id"))
     
-    state["query_results_preview"] = results
+    state["query_result"] = result
+    state["result_id"] = result_store.put(result) if result is not None else ""
     state["execution_time_ms"] = exec_time
     state["execution_error"] = error
+    await record_sql_outcome(state)
     return state
 
-def synthesize_results_node(state: ChatAgentState) -> ChatAgentState:
+async def record_sql_outcome(state: ChatAgentState) -> None:
+    if not settings.SQL_MEMORY_ENABLED:
+        return
+    database = get_active_database()
+    if state.get("execution_error"):
+        # A recalled template that no longer runs (schema drift) must not be served again
+        if state.get("sql_from_memory"):
+            sql_memory.forget(state["user_message"], database)
+    elif not state.get("sql_from_memory") and is_self_contained(state["user_message"], bool(state.get("chat_history"))):
+        # remember() may write the JSON store
+        await run_blocking(
+            sql_memory.remember, state["user_message"], state.get("original_sql") or state["generated_sql"], database
+        )
+
+async def synthesize_results_node(state: ChatAgentState) -> ChatAgentState:
     logger.info("ChatNode: synthesize_results")
     
     # Convert output grid back into an english explanation and chart mapping
-    summary_pack = result_synthesizer.synthesize(state)
+    summary_pack = await result_synthesizer.asynthesize(state)
     
     state["explanation"] = summary_pack.get("explanation", "")
     state["suggested_chart_type"] = summary_pack.get("suggested_chart_type", "none")
     state["confidence"] = summary_pack.get("confidence", 0.0)
     return state
 
+def build_chat_response(state: ChatAgentState) -> ChatResponse:
+    """Shape a finished graph state into the API response."""
+    # validation_error holds the validator's "Valid" on success, so only surface it on failure
+    error_message = state.get("execution_error") if state.get("is_valid_sql") else state.get("validation_error")
+    result = state.get("query_result")
+    return ChatResponse(
+        generated_sql=state.get("generated_sql"),
+        explanation=state.get("explanation"),
+        confidence=state.get("confidence", 0.0),
+        execution_time_ms=state.get("execution_time_ms", 0.0),
+        query_results_preview=result.rows(0, settings.CHAT_RESULT_PREVIEW_ROWS) if result else [],
+        result_id=state.get("result_id") or None,
+        columns=result.columns if result else [],
+        row_count=result.row_count if result else 0,
+        error_message=error_message or None,
+        suggested_chart_type=state.get("suggested_chart_type", "none"),
+        requires_confirmation=state.get("requires_confirmation", False),
+        estimated_cost=(state.get("cost_estimate") or {}).get("estimated_cost"),
+        confirmation_token=state.get("issued_confirmation_token") or None,
+        request_id=state.get("request_id"),
+    )
+
 def build_chat_graph() -> StateGraph:
     workflow = StateGraph(ChatAgentState)
     
     # 1. Add all functional nodes
+    workflow.add_node("recall_sql", recall_sql_node)
     workflow.add_node("introspect_schema", introspect_schema_node)
     workflow.add_node("generate_sql", generate_sql_node)
     workflow.add_node("validate_sql", validate_sql_node)
+    workflow.add_node("limit_rows", limit_rows_node)
+    workflow.add_node("guard_cost", guard_cost_node)
     workflow.add_node("execute_sql", execute_sql_node)
     workflow.add_node("synthesize_results", synthesize_results_node)
     
     # 2. Add linear Edges
-    workflow.set_entry_point("introspect_schema")
+    workflow.set_entry_point("recall_sql")
+    workflow.add_conditional_edges(
+        "recall_sql",
+        check_sql_recalled,
+        {
+            "validate_sql": "validate_sql",
+            "introspect_schema": "introspect_schema"
+        }
+    )
     workflow.add_edge("introspect_schema", "generate_sql")
     workflow.add_edge("generate_sql", "validate_sql")
     
@@ -85,6 +220,15 @@ def build_chat_graph() -> StateGraph:
     workflow.add_conditional_edges(
         "validate_sql",
         check_sql_validity,
+        {
+            "limit_rows": "limit_rows",
+            "synthesize_results": "synthesize_results"
+        }
+    )
+    workflow.add_edge("limit_rows", "guard_cost")
+    workflow.add_conditional_edges(
+        "guard_cost",
+        check_cost_verdict,
         {
             "execute_sql": "execute_sql",
             "synthesize_results": "synthesize_results"
@@ -1,38 +1,290 @@
-from typing import Dict, List
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
 from threading import Lock
 from models.chat_models import ChatAgentState
+from llm.token_budget import count_tokens
 from config.settings import settings
+from utils.logger import setup_logger
 import time
 
+logger = setup_logger(__name__)
+
+_BACKENDS = ("memory", "json", "sqlite")
+_BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _SqliteSessionStore:
+    """Write-through session rows; sessions evicted from RAM are reloaded from here on demand."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Callers serialize access with the manager's lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            " session_id TEXT PRIMARY KEY, last_active REAL NOT NULL, messages TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def upsert(self, session_id: str, last_active: float, messages: List[Dict[str, Any]]) -> None:
+        self._conn.execute(
+            "INSERT INTO chat_sessions (session_id, last_active, messages) VALUES (?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET last_active = excluded.last_active, messages = excluded.messages",
+            (session_id, last_active, json.dumps(messages, separators=(",", ":"))),
+        )
+        self._conn.commit()
+
+    def fetch(self, session_id: str, not_before: float) -> Optional[List[Dict[str, Any]]]:
+        row = self._conn.execute(
+            "SELECT messages FROM chat_sessions WHERE session_id = ? AND last_active >= ?",
+            (session_id, not_before),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, session_id: str) -> None:
+        self._conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+        self._conn.commit()
+
+    def purge_idle(self, not_before: float) -> int:
+        deleted = self._conn.execute("DELETE FROM chat_sessions WHERE last_active < ?", (not_before,)).rowcount
+        self._conn.commit()
+        return deleted
+
+    def close(self) -> None:
+        self._conn.close()
+
+
 class ChatMemoryManager:
-    """Manages short-term conversation context for SQL Chat Agent."""
-    def __init__(self):
-        self._memory_store: Dict[str, List[Dict[str, str]]] = {}
+    """Manages short-term conversation context for SQL Chat Agent.
+
+    Sessions live in an LRU bounded by CHAT_MAX_SESSIONS and expire after
+    CHAT_SESSION_IDLE_SECONDS without activity. Each session keeps its most
+    recent messages within CHAT_MEMORY_MAX_TOKENS (and at most
+    CHAT_MEMORY_WINDOW messages). CHAT_MEMORY_BACKEND "json" snapshots the
+    store to CHAT_MEMORY_JSON_PATH; "sqlite" writes every exchange through
+    to CHAT_MEMORY_SQLITE_PATH and reloads evicted sessions on demand.
+
+    Methods may touch disk, so async callers go through run_blocking.
+    """
+    def __init__(
+        self,
+        max_sessions: int = settings.CHAT_MAX_SESSIONS,
+        backend: str = settings.CHAT_MEMORY_BACKEND,
+        store_path: Optional[str] = None,
+    ):
+        self.max_sessions = max_sessions
+        # session_id -> {"messages", "token_counts", "tokens", "last_active"}, least recently used first
+        self._memory_store: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
         self._lock = Lock()
-        
+        if backend not in _BACKENDS:
+            logger.warning(f"Unknown CHAT_MEMORY_BACKEND '{backend}', keeping sessions in memory only.")
+            backend = "memory"
+        self.backend = backend
+        store_path = store_path or (
+            settings.CHAT_MEMORY_SQLITE_PATH if backend == "sqlite" else settings.CHAT_MEMORY_JSON_PATH
+        )
+        if not os.path.isabs(store_path):
+            # Relative paths resolve against the backend root, not the CWD
+            store_path = os.path.join(_BACKEND_ROOT, store_path)
+        self._store_path = store_path
+        self._sqlite: Optional[_SqliteSessionStore] = None
+        self._dirty = False
+        self._last_persist = time.monotonic()
+        self._stats = {"evicted_lru": 0, "expired_idle": 0, "trimmed_messages": 0, "reloaded": 0}
+
+    # ── Internals (caller holds the lock) ──────────────────────
+    def _new_session(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        token_counts = [count_tokens(msg["content"]) for msg in messages]
+        return {
+            "messages": messages,
+            "token_counts": token_counts,
+            "tokens": sum(token_counts),
+            "last_active": messages[-1]["timestamp"] if messages else time.time(),
+        }
+
+    def _trim(self, session: Dict[str, Any]) -> None:
+        # Drop the oldest turns until the history fits; the newest message always stays
+        messages, counts = session["messages"], session["token_counts"]
+        drop = 0
+        tokens = session["tokens"]
+        while len(messages) - drop > 1 and (
+            tokens > settings.CHAT_MEMORY_MAX_TOKENS or len(messages) - drop > settings.CHAT_MEMORY_WINDOW
+        ):
+            tokens -= counts[drop]
+            drop += 1
+        if drop:
+            del messages[:drop]
+            del counts[:drop]
+            session["tokens"] = tokens
+            self._stats["trimmed_messages"] += drop
+
+    def _expire_idle(self, now: float) -> None:
+        cutoff = now - settings.CHAT_SESSION_IDLE_SECONDS
+        # LRU order is activity order, so idle sessions are at the front
+        while self._memory_store:
+            session_id, session = next(iter(self._memory_store.items()))
+            if session["last_active"] >= cutoff:
+                break
+            del self._memory_store[session_id]
+            self._stats["expired_idle"] += 1
+
+    def _enforce_cap(self) -> None:
+        while len(self._memory_store) > self.max_sessions:
+            # With sqlite the evicted session stays on disk and comes back on its next request
+            self._memory_store.popitem(last=False)
+            self._stats["evicted_lru"] += 1
+
+    def _lookup(self, session_id: str, now: float) -> Optional[Dict[str, Any]]:
+        session = self._memory_store.get(session_id)
+        if session is not None:
+            if session["last_active"] < now - settings.CHAT_SESSION_IDLE_SECONDS:
+                del self._memory_store[session_id]
+                self._stats["expired_idle"] += 1
+                return None
+            self._memory_store.move_to_end(session_id)
+            return session
+        if self._sqlite is not None:
+            messages = self._sqlite.fetch(session_id, now - settings.CHAT_SESSION_IDLE_SECONDS)
+            if messages is not None:
+                session = self._new_session(messages)
+                self._memory_store[session_id] = session
+                self._stats["reloaded"] += 1
+                self._enforce_cap()
+                return session
+        return None
+
+    # ── Public API ──────────────────────────────────────────────
     def add_message(self, session_id: str, role: str, content: str):
+        self.add_messages(session_id, [(role, content)])
+
+    def add_exchange(self, session_id: str, user_message: str, assistant_message: str):
+        """Record a question and its answer with a single write-through."""
+        self.add_messages(session_id, [("user", user_message), ("assistant", assistant_message)])
+
+    def add_messages(self, session_id: str, messages: List[tuple]):
+        now = time.time()
         with self._lock:
-            if session_id not in self._memory_store:
-                self._memory_store[session_id] = []
-                
-            self._memory_store[session_id].append({
-                "role": role,
-                "content": content,
-                "timestamp": time.time()
-            })
-            
+            self._expire_idle(now)
+            session = self._lookup(session_id, now)
+            if session is None:
+                session = self._new_session([])
+                self._memory_store[session_id] = session
+
+            for role, content in messages:
+                tokens = count_tokens(content)
+                session["messages"].append({
+                    "role": role,
+                    "content": content,
+                    "timestamp": now
+                })
+                session["token_counts"].append(tokens)
+                session["tokens"] += tokens
+            session["last_active"] = now
+
             # Slide window to prevent context limits blowing up
-            if len(self._memory_store[session_id]) > settings.CHAT_MEMORY_WINDOW:
-                # Keep last N messages
-                self._memory_store[session_id] = self._memory_store[session_id][-settings.CHAT_MEMORY_WINDOW:]
+            self._trim(session)
+            self._enforce_cap()
+
+            if self._sqlite is not None:
+                self._sqlite.upsert(session_id, now, session["messages"])
+            self._dirty = True
+        self.maybe_persist()
 
     def get_history(self, session_id: str) -> List[Dict[str, str]]:
         with self._lock:
-            return self._memory_store.get(session_id, [])
-            
+            session = self._lookup(session_id, time.time())
+            return list(session["messages"]) if session else []
+
     def clear_session(self, session_id: str):
         with self._lock:
             if session_id in self._memory_store:
                 del self._memory_store[session_id]
+                self._dirty = True
+            if self._sqlite is not None:
+                self._sqlite.delete(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "sessions": len(self._memory_store),
+                "max_sessions": self.max_sessions,
+                "messages": sum(len(s["messages"]) for s in self._memory_store.values()),
+                "tokens": sum(s["tokens"] for s in self._memory_store.values()),
+                "backend": self.backend,
+            }
+
+    # ── Persistence ─────────────────────────────────────────────
+    def maybe_persist(self) -> None:
+        if time.monotonic() - self._last_persist >= settings.CHAT_MEMORY_PERSIST_SECONDS:
+            self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            self._last_persist = time.monotonic()
+            if self._sqlite is not None:
+                # Rows are already written through; only idle ones need sweeping
+                purged = self._sqlite.purge_idle(time.time() - settings.CHAT_SESSION_IDLE_SECONDS)
+                if purged:
+                    logger.debug(f"Purged {purged} idle chat sessions from SQLite.")
+                return
+            if self.backend != "json" or not self._dirty:
+                return
+            payload = {
+                "version": 1,
+                "sessions": [(sid, s["messages"]) for sid, s in self._memory_store.items()],
+            }
+            self._dirty = False
+
+        try:
+            directory = os.path.dirname(self._store_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self._store_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, separators=(",", ":"))
+            os.replace(tmp_path, self._store_path)
+            logger.debug(f"Persisted {len(payload['sessions'])} chat sessions.")
+        except OSError as e:
+            logger.error(f"Failed to persist chat sessions: {e}")
+
+    def load(self) -> None:
+        if self.backend == "sqlite":
+            try:
+                with self._lock:
+                    self._sqlite = _SqliteSessionStore(self._store_path)
+                logger.info(f"Chat sessions persisted to SQLite at {self._store_path}.")
+            except sqlite3.Error as e:
+                logger.error(f"Failed to open chat session store, keeping sessions in memory: {e}")
+            return
+        if self.backend != "json" or not os.path.exists(self._store_path):
+            return
+        try:
+            with open(self._store_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            cutoff = time.time() - settings.CHAT_SESSION_IDLE_SECONDS
+            sessions = OrderedDict()
+            for session_id, messages in payload.get("sessions", [])[-self.max_sessions:]:
+                session = self._new_session(messages)
+                if messages and session["last_active"] >= cutoff:
+                    sessions[session_id] = session
+            with self._lock:
+                self._memory_store = sessions
+            logger.info(f"Loaded {len(sessions)} chat sessions.")
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.error(f"Failed to load chat sessions, starting fresh: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sqlite is not None:
+                self._sqlite.close()
+                self._sqlite = None
 
 chat_memory = ChatMemoryManager()
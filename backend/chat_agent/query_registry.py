@@ -0,0 +1,103 @@
+"""In-flight chat query tracking so running SQL can be cancelled.
+
+A request is registered when it starts; the executor attaches its cursor
+once the sandbox connection is borrowed. Cancelling calls cursor.cancel()
+(SQLCancel), which stops the statement on the server immediately. A
+cancel that arrives before the cursor exists is remembered and applied on
+attach. A request that has already finished (its caller gave up while a
+worker thread was still waiting for a connection) counts as cancelled, so
+the abandoned SQL never starts.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class QueryCancelledError(Exception):
+    """The chat request was cancelled before or while its SQL ran."""
+
+
+class QueryRegistry:
+    def __init__(self):
+        # request_id -> {"session_id", "started_at", "cursor", "sql", "cancelled"}
+        self._queries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def start(self, request_id: str, session_id: str = "") -> None:
+        with self._lock:
+            self._queries[request_id] = {
+                "session_id": session_id,
+                "started_at": time.time(),
+                "cursor": None,
+                "sql": "",
+                "cancelled": False,
+            }
+
+    def attach(self, request_id: Optional[str], cursor: Any, sql: str) -> None:
+        """Bind the executing cursor; raises if the request was already cancelled or finished."""
+        if not request_id:
+            return
+        with self._lock:
+            entry = self._queries.get(request_id)
+            if entry is None or entry["cancelled"]:
+                raise QueryCancelledError(f"Query {request_id} was cancelled.")
+            entry["cursor"] = cursor
+            entry["sql"] = sql
+
+    def detach(self, request_id: Optional[str]) -> None:
+        if not request_id:
+            return
+        with self._lock:
+            entry = self._queries.get(request_id)
+            if entry is not None:
+                entry["cursor"] = None
+
+    def finish(self, request_id: str) -> None:
+        with self._lock:
+            self._queries.pop(request_id, None)
+
+    def is_cancelled(self, request_id: Optional[str]) -> bool:
+        if not request_id:
+            return False
+        with self._lock:
+            entry = self._queries.get(request_id)
+            return entry is None or entry["cancelled"]
+
+    def cancel(self, request_id: str) -> bool:
+        """Cancel a tracked request; False if it is unknown (already finished)."""
+        with self._lock:
+            entry = self._queries.get(request_id)
+            if entry is None:
+                return False
+            entry["cancelled"] = True
+            cursor = entry["cursor"]
+
+        if cursor is not None:
+            try:
+                cursor.cancel()
+                logger.info(f"Cancelled running chat query {request_id}.")
+            except Exception as e:
+                logger.warning(f"cursor.cancel() failed for {request_id}: {e}")
+        return True
+
+    def list_active(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "request_id": request_id,
+                    "session_id": entry["session_id"],
+                    "running_seconds": round(now - entry["started_at"], 2),
+                    "executing": entry["cursor"] is not None,
+                    "cancelled": entry["cancelled"],
+                    "sql": entry["sql"][:200],
+                }
+                for request_id, entry in self._queries.items()
+            ]
+
+
+query_registry = QueryRegistry()
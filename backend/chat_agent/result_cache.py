@@ -0,0 +1,161 @@
+"""Result cache for chat SQL.
+
+Repeated (database, normalized SQL) pairs are answered from memory without
+touching SQL Server. Entries are the ColumnarResult objects the executor
+already builds (never mutated, so hits share them), accounted by their
+approximate byte size; entries expire after CHAT_RESULT_CACHE_TTL_SECONDS
+and the least recently used are evicted past CHAT_RESULT_CACHE_MAX_BYTES.
+
+With CHAT_RESULT_CACHE_WATERMARKS on, a hit is also checked against the last
+write time (sys.dm_db_index_usage_stats) of every table the SQL references,
+which costs one small DMV lookup instead of the query itself.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from chat_agent.connection_pool import sandbox_pool
+from chat_agent.result_set import ColumnarResult
+from chat_agent.schema import schema_introspector
+from chat_agent.sql_utils import normalize_sql
+from utils.db import get_active_database
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+USAGE_WATERMARK_QUERY = """
+    SELECT object_id, MAX(last_user_update) AS last_user_update
+    FROM sys.dm_db_index_usage_stats
+    WHERE database_id = DB_ID() AND object_id IN ({placeholders})
+    GROUP BY object_id;
+"""
+
+_IDENTIFIER = re.compile(r"\w+")
+
+
+class ResultCache:
+    def __init__(
+        self,
+        ttl_seconds: int = settings.CHAT_RESULT_CACHE_TTL_SECONDS,
+        max_bytes: int = settings.CHAT_RESULT_CACHE_MAX_BYTES,
+        max_entry_bytes: int = settings.CHAT_RESULT_CACHE_MAX_ENTRY_BYTES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        # "database|normalized sql" -> {"result", "size", "expires_at", "watermarks"}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0, "evicted": 0, "oversize": 0}
+
+    @staticmethod
+    def _key(database: str, sql: str) -> str:
+        return f"{database.lower()}|{normalize_sql(sql)}"
+
+    def _drop(self, key: str) -> None:
+        """Remove an entry (caller holds the lock)."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry["size"]
+
+    # ── Watermarks ──────────────────────────────────────────────
+    @staticmethod
+    def _referenced_tables(sql: str, database: str) -> List[int]:
+        """object_ids of cached-schema tables whose name appears in the SQL (over-matching is harmless)."""
+        schema = schema_introspector.get_schema(database)
+        if schema is None:
+            return []
+        words = {w.lower() for w in _IDENTIFIER.findall(sql)}
+        return sorted(oid for oid, table in schema.tables.items() if table.table_name.lower() in words)
+
+    @staticmethod
+    def _read_watermarks(database: str, object_ids: List[int]) -> Optional[Dict[int, Any]]:
+        """Last user write per table, or None if the DMV could not be read."""
+        try:
+            with sandbox_pool.connection(database) as conn:
+                cursor = conn.cursor()
+                try:
+                    placeholders = ",".join("?" * len(object_ids))
+                    cursor.execute(USAGE_WATERMARK_QUERY.format(placeholders=placeholders), object_ids)
+                    seen = {row.object_id: row.last_user_update for row in cursor.fetchall()}
+                finally:
+                    cursor.close()
+        except Exception as e:
+            logger.warning(f"Result cache watermark read failed: {e}")
+            return None
+        # Tables never written since the last restart have no row; that state is a watermark too
+        return {oid: seen.get(oid) for oid in object_ids}
+
+    # ── Public API ──────────────────────────────────────────────
+    def get(self, sql: str, database: Optional[str] = None) -> Optional[ColumnarResult]:
+        """Cached result for the SQL, or None on a miss."""
+        database = database or get_active_database()
+        key = self._key(database, sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] <= time.monotonic():
+                self._drop(key)
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+        watermarks = entry["watermarks"]
+        if watermarks is not None and self._read_watermarks(database, list(watermarks)) != watermarks:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._drop(key)
+                self._stats["invalidated"] += 1
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        return entry["result"]
+
+    def put(self, sql: str, result: ColumnarResult, database: Optional[str] = None) -> None:
+        database = database or get_active_database()
+        size = result.nbytes + len(sql)
+        if size > self.max_entry_bytes:
+            with self._lock:
+                self._stats["oversize"] += 1
+            return
+
+        watermarks = None
+        if settings.CHAT_RESULT_CACHE_WATERMARKS:
+            object_ids = self._referenced_tables(sql, database)
+            # Read after the query ran, so a write racing the query itself is only bounded by the TTL
+            watermarks = self._read_watermarks(database, object_ids) if object_ids else None
+
+        key = self._key(database, sql)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = {
+                "result": result,
+                "size": size,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+                "watermarks": watermarks,
+            }
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self._stats["evicted"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+result_cache = ResultCache()
@@ -0,0 +1,141 @@
+"""Local statistical profile of a chat result for the synthesizer prompt.
+
+Instead of the first 50 raw rows, the LLM gets per-column statistics
+computed over the whole ColumnarResult (count, nulls, min/max, quartiles,
+mean, top categories, monotonic trend in row order) plus a handful of
+representative rows. Work is done a column at a time with builtins
+(sorted, min/max, Counter) over the column arrays, so profiling
+CHAT_MAX_RESULT_ROWS rows costs milliseconds.
+"""
+import datetime as dt
+import json
+import math
+from collections import Counter
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+from chat_agent.result_set import ColumnarResult
+from config.settings import settings
+
+_MAX_LABEL_CHARS = 40
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+
+def format_value(value: Any) -> str:
+    if isinstance(value, (float, Decimal)):
+        return format(value, ".6g")
+    if isinstance(value, (dt.date, dt.time)):
+        return value.isoformat()
+    text = str(value)
+    return text if len(text) <= _MAX_LABEL_CHARS else text[:_MAX_LABEL_CHARS - 3] + "..."
+
+
+def _quantile(ordered: Sequence[Any], q: float) -> Any:
+    """Nearest-rank quantile of already sorted values."""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _trend(values: Sequence[Any], ordered: List[Any]) -> Optional[str]:
+    if len(values) < 3 or ordered[0] == ordered[-1]:
+        return None
+    values = list(values)
+    if values == ordered:
+        return "increasing"
+    if values == ordered[::-1]:
+        return "decreasing"
+    return None
+
+
+def profile_column(name: str, type_name: str, values: Sequence[Any], top_k: int = settings.CHAT_PROFILE_TOP_K) -> Dict[str, Any]:
+    present = [v for v in values if v is not None]
+    profile: Dict[str, Any] = {
+        "name": name,
+        "type": type_name,
+        "count": len(present),
+        "nulls": len(values) - len(present),
+    }
+    if not present:
+        return profile
+
+    if all(is_number(v) for v in present) or all(isinstance(v, (dt.date, dt.time)) for v in present):
+        ordered = sorted(present)
+        profile.update({
+            "min": ordered[0],
+            "p25": _quantile(ordered, 0.25),
+            "median": _quantile(ordered, 0.5),
+            "p75": _quantile(ordered, 0.75),
+            "max": ordered[-1],
+        })
+        if is_number(ordered[0]):
+            profile["mean"] = math.fsum(map(float, present)) / len(present)
+        trend = _trend(present, ordered)
+        if trend:
+            profile["trend"] = trend
+        return profile
+
+    try:
+        counts = Counter(present)
+    except TypeError:
+        # Unhashable driver types (bytearray): counts only
+        return profile
+    profile["distinct"] = len(counts)
+    profile["top"] = counts.most_common(top_k)
+    return profile
+
+
+def profile_result(result: ColumnarResult, top_k: int = settings.CHAT_PROFILE_TOP_K) -> Dict[str, Any]:
+    return {
+        "row_count": result.row_count,
+        "columns": [
+            profile_column(name, type_name, column, top_k)
+            for name, type_name, column in zip(result.columns, result.types, result.data)
+        ],
+    }
+
+
+def representative_rows(result: ColumnarResult, limit: int = settings.CHAT_PROFILE_SAMPLE_ROWS) -> List[int]:
+    """Row indexes worth showing: the first rows, the extremes of the first numeric column, the last row."""
+    if result.row_count <= limit:
+        return list(range(result.row_count))
+
+    picked = list(range(max(1, limit - 3)))
+    for column in result.data:
+        indexed = [(v, i) for i, v in enumerate(column) if v is not None]
+        if indexed and all(is_number(v) for v, _ in indexed):
+            picked.append(min(indexed)[1])
+            picked.append(max(indexed)[1])
+            break
+    picked.append(result.row_count - 1)
+    return sorted(set(picked))[:limit]
+
+
+def render_profile(profile: Dict[str, Any]) -> List[str]:
+    """One compact line per column."""
+    lines = []
+    for col in profile["columns"]:
+        parts = [f"{col['count']} values", f"{col['nulls']} nulls"]
+        if "min" in col:
+            parts.append(
+                f"min {format_value(col['min'])}, p25 {format_value(col['p25'])}, median {format_value(col['median'])}, "
+                f"p75 {format_value(col['p75'])}, max {format_value(col['max'])}"
+            )
+            if "mean" in col:
+                parts.append(f"mean {format_value(col['mean'])}")
+            if "trend" in col:
+                parts.append(f"{col['trend']} in row order")
+        elif "top" in col:
+            top = ", ".join(f"{format_value(value)} ({count})" for value, count in col["top"])
+            parts.append(f"{col['distinct']} distinct; top: {top}")
+        lines.append(f"- {col['name']} ({col['type']}): " + "; ".join(parts))
+    return lines
+
+
+def render_rows(result: ColumnarResult, indexes: List[int]) -> List[str]:
+    """Each picked row as a JSON array, prefixed with its row number."""
+    return [
+        f"#{i + 1} " + json.dumps(list(result.row_tuples(i, 1)[0]), default=str)
+        for i in indexes
+    ]
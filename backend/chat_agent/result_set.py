@@ -0,0 +1,147 @@
+"""Columnar, typed result sets for chat queries.
+
+A ColumnarResult holds column names, the driver's Python type per column
+and one array per column (array('q') / array('d') for all-int / all-float
+columns, tuples otherwise). Rows are fetched with fetchmany and appended
+column-wise, so a 1,000-row result is one set of column arrays rather than
+a dict per row; row dicts are only built for the small previews that need
+them. Finished results are kept in a bounded ResultStore under a
+result_id so the API can page through them with offset/limit.
+"""
+import sys
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _pack_column(values: Sequence[Any]):
+    if values and all(type(v) is int for v in values):
+        try:
+            return array("q", values)
+        except OverflowError:
+            return tuple(values)
+    if values and all(type(v) is float for v in values):
+        return array("d", values)
+    return tuple(values)
+
+
+def _column_bytes(column) -> int:
+    if isinstance(column, array):
+        return sys.getsizeof(column)
+    return sys.getsizeof(column) + sum(sys.getsizeof(v) for v in column if v is not None)
+
+
+class ColumnarResult:
+    def __init__(self, columns: List[str], types: Optional[List[str]] = None, data: Optional[List[Sequence[Any]]] = None):
+        self.columns = list(columns)
+        self.types = list(types) if types else ["" for _ in columns]
+        self.data = data if data is not None else [() for _ in columns]
+        self.row_count = len(self.data[0]) if self.data else 0
+
+    @classmethod
+    def from_rows(cls, columns: List[str], rows: Sequence[Sequence[Any]], types: Optional[List[str]] = None) -> "ColumnarResult":
+        data = [_pack_column(values) for values in zip(*rows)] if rows else None
+        return cls(columns, types, data)
+
+    @classmethod
+    def from_cursor(cls, cursor, max_rows: int, batch_size: int = 500) -> "ColumnarResult":
+        """Drain up to max_rows from an executed cursor in fetchmany batches."""
+        columns = [column[0] for column in cursor.description]
+        staged: List[List[Any]] = [[] for _ in columns]
+        remaining = max_rows
+        while remaining > 0:
+            rows = cursor.fetchmany(min(batch_size, remaining))
+            if not rows:
+                break
+            remaining -= len(rows)
+            for values, column in zip(zip(*rows), staged):
+                column.extend(values)
+        return cls(columns, cls.describe_types(cursor), [_pack_column(values) for values in staged])
+
+    @classmethod
+    def concat(cls, parts: Iterable["ColumnarResult"]) -> Optional["ColumnarResult"]:
+        parts = list(parts)
+        if not parts:
+            return None
+        staged: List[List[Any]] = [[] for _ in parts[0].columns]
+        for part in parts:
+            for column, values in zip(staged, part.data):
+                column.extend(values)
+        return cls(parts[0].columns, parts[0].types, [_pack_column(values) for values in staged])
+
+    @staticmethod
+    def describe_types(cursor) -> List[str]:
+        # pyodbc reports the Python type each column converts to
+        return [getattr(column[1], "__name__", str(column[1])) for column in cursor.description]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(_column_bytes(column) for column in self.data)
+
+    def slice(self, offset: int = 0, limit: Optional[int] = None) -> "ColumnarResult":
+        end = self.row_count if limit is None else min(self.row_count, offset + limit)
+        return ColumnarResult(self.columns, self.types, [column[offset:end] for column in self.data])
+
+    def row_tuples(self, offset: int = 0, limit: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        end = self.row_count if limit is None else min(self.row_count, offset + limit)
+        return list(zip(*(column[offset:end] for column in self.data))) if self.data else []
+
+    def rows(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Row dicts for a window of the result; keep the window small."""
+        return [dict(zip(self.columns, row)) for row in self.row_tuples(offset, limit)]
+
+    def to_payload(self, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """JSON-ready columnar page: one list per column."""
+        end = self.row_count if limit is None else min(self.row_count, offset + limit)
+        return {
+            "columns": self.columns,
+            "types": self.types,
+            "data": [list(column[offset:end]) for column in self.data],
+            "offset": offset,
+            "row_count": max(0, end - offset),
+            "total_rows": self.row_count,
+        }
+
+
+class ResultStore:
+    """Bounded, expiring handles to finished results for paging."""
+
+    def __init__(
+        self,
+        max_entries: int = settings.CHAT_RESULT_STORE_MAX_ENTRIES,
+        ttl_seconds: int = settings.CHAT_RESULT_STORE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._results: "OrderedDict[str, Tuple[float, ColumnarResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result: ColumnarResult) -> str:
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._results[result_id] = (time.monotonic() + self.ttl_seconds, result)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result_id
+
+    def get(self, result_id: str) -> Optional[ColumnarResult]:
+        with self._lock:
+            entry = self._results.get(result_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._results[result_id]
+                return None
+            self._results.move_to_end(result_id)
+            return entry[1]
+
+
+result_store = ResultStore()
@@ -0,0 +1,149 @@
+"""Server-side row limiting for sandbox queries.
+
+Runs after SqlValidator and rewrites each statement so SQL Server itself
+stops producing rows past CHAT_MAX_RESULT_ROWS, instead of planning and
+streaming a huge result that the client then truncates with fetchmany.
+
+- Outermost SELECT (also after a WITH ... CTE list): TOP (n) is injected,
+  or an existing literal TOP larger than n is lowered.
+- UNION / EXCEPT / INTERSECT (branches parenthesised or not): the branches
+  are left alone and the whole result is capped instead, with
+  OFFSET 0 ROWS FETCH NEXT n ROWS ONLY after a trailing ORDER BY, or after
+  an added ORDER BY (SELECT NULL). Capping each branch would return
+  arbitrary rows per branch and up to n rows per branch; wrapping the
+  query in a derived table fails on unnamed or duplicate columns.
+- ORDER BY ... OFFSET: TOP is illegal there, so FETCH NEXT is capped or added.
+- Trailing OPTION (...) / FOR XML|JSON clauses stay last.
+- TOP (@var) and TOP ... PERCENT can't be compared statically and are kept.
+
+Subqueries and CTE bodies are untouched; sqlparse groups them inside
+parentheses, so only top-level tokens are considered.
+"""
+import re
+from typing import List, Tuple
+
+import sqlparse
+from sqlparse import tokens as T
+
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# What may follow SELECT before the column list
+_SELECT_HEAD = re.compile(
+    r"(?P<prefix>\s+(?:DISTINCT|ALL)\b)?"
+    r"(?P<top>\s+TOP\s*(?:\(\s*(?P<paren>[^)]*?)\s*\)|(?P<bare>\d+))(?P<percent>\s+PERCENT\b)?)?",
+    re.IGNORECASE,
+)
+_FETCH_COUNT = re.compile(r"(?P<head>\bFETCH\s+(?:NEXT|FIRST)\s+)(?P<count>\d+)", re.IGNORECASE)
+
+_SET_OPERATORS = frozenset(["UNION", "UNION ALL", "EXCEPT", "INTERSECT"])
+# Clauses that must stay after ORDER BY / OFFSET ... FETCH and outside a wrapping SELECT
+_TRAILING_CLAUSES = frozenset(["OPTION", "FOR"])
+
+
+def _top_level_tokens(statement) -> List[Tuple[int, object]]:
+    """(offset within statement, token) for the statement's top-level tokens."""
+    out = []
+    offset = 0
+    for token in statement.tokens:
+        out.append((offset, token))
+        offset += len(str(token))
+    return out
+
+
+def _split_tail(text: str, tokens: List[Tuple[int, object]], after: int) -> Tuple[str, str]:
+    """Split off the trailing semicolon/whitespace and any OPTION/FOR clause starting after ``after``."""
+    end = next(
+        (offset for offset, tok in tokens if offset >= after and tok.is_keyword and tok.normalized in _TRAILING_CLAUSES),
+        len(text),
+    )
+    if end == len(text):
+        # No clause: keep just the statement terminator and whitespace
+        body = text.rstrip().rstrip(";").rstrip()
+        return body, text[len(body):]
+    return text[:end].rstrip(), " " + text[end:]
+
+
+def _limit_statement(text: str, max_rows: int) -> Tuple[str, List[str]]:
+    statement = sqlparse.parse(text)[0]
+    tokens = _top_level_tokens(statement)
+
+    select_ends = [
+        offset + len(tok.value)
+        for offset, tok in tokens
+        if tok.ttype in T.DML and tok.normalized == "SELECT"
+    ]
+    # Parenthesised branches ((SELECT ...) UNION (SELECT ...)) leave no top-level SELECT
+    set_ops = [offset for offset, tok in tokens if tok.is_keyword and tok.normalized in _SET_OPERATORS]
+    if not select_ends and not set_ops:
+        return text, []
+
+    offsets = [offset for offset, tok in tokens if tok.is_keyword and tok.normalized == "OFFSET"]
+    notes = []
+
+    if offsets:
+        match = _FETCH_COUNT.search(text, offsets[-1])
+        if match:
+            if int(match.group("count")) > max_rows:
+                text = text[:match.start("count")] + str(max_rows) + text[match.end("count"):]
+                notes.append(f"FETCH NEXT lowered to {max_rows}")
+        else:
+            body, tail = _split_tail(text, tokens, offsets[-1])
+            text = f"{body} FETCH NEXT {max_rows} ROWS ONLY{tail}"
+            notes.append(f"FETCH NEXT {max_rows} ROWS ONLY added")
+        return text, notes
+
+    if set_ops:
+        order_by = [offset for offset, tok in tokens if tok.is_keyword and tok.normalized == "ORDER BY" and offset > set_ops[-1]]
+        if order_by:
+            body, tail = _split_tail(text, tokens, order_by[-1])
+            text = f"{body} OFFSET 0 ROWS FETCH NEXT {max_rows} ROWS ONLY{tail}"
+            notes.append(f"OFFSET 0 ROWS FETCH NEXT {max_rows} ROWS ONLY added")
+        else:
+            # Not wrapped in a derived table: that needs every column named and unique
+            body, tail = _split_tail(text, tokens, set_ops[-1])
+            text = f"{body} ORDER BY (SELECT NULL) OFFSET 0 ROWS FETCH NEXT {max_rows} ROWS ONLY{tail}"
+            notes.append(f"ORDER BY (SELECT NULL) OFFSET 0 ROWS FETCH NEXT {max_rows} ROWS ONLY added")
+        return text, notes
+
+    # Edit right to left so earlier offsets stay valid
+    for end in reversed(select_ends):
+        head = _SELECT_HEAD.match(text, end)
+        insert_at = head.end("prefix") if head.group("prefix") else end
+        if head.group("top"):
+            literal = head.group("bare") or head.group("paren")
+            if head.group("percent") or not literal.isdigit():
+                continue
+            if int(literal) > max_rows:
+                text = text[:head.start("top")] + f" TOP ({max_rows})" + text[head.end("top"):]
+                notes.append(f"TOP {literal} lowered to {max_rows}")
+            continue
+        text = text[:insert_at] + f" TOP ({max_rows})" + text[insert_at:]
+        notes.append(f"TOP ({max_rows}) added")
+    return text, notes
+
+
+class RowLimiter:
+    def __init__(self, max_rows: int = settings.CHAT_MAX_RESULT_ROWS):
+        self.max_rows = max_rows
+
+    def limit(self, sql: str) -> Tuple[str, List[str]]:
+        """Return (rewritten SQL, notes describing each change)."""
+        out = []
+        notes: List[str] = []
+        for statement in sqlparse.parse(sql):
+            text = str(statement)
+            if statement.get_type() in ("SELECT", "UNKNOWN") and text.strip():
+                try:
+                    text, changed = _limit_statement(text, self.max_rows)
+                    notes.extend(changed)
+                except Exception as e:
+                    # Leave the statement as-is; fetchmany still caps the client side
+                    logger.warning(f"Row limit rewrite skipped: {e}")
+            out.append(text)
+        return "".join(out), notes
+
+
+row_limiter = RowLimiter()
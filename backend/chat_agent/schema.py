@@ -1,88 +1,219 @@
-from typing import Dict, Any, List
-import pyodbc
-from utils.db import get_db_connection
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from models.chat_models import ColumnMetadata, DatabaseSchema, ForeignKeyMetadata, TableMetadata
+from utils.db import get_db_connection, get_active_database
+from config.settings import settings
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# SQL Server caps a statement at 2100 parameters
+_MAX_IN_PARAMS = 1000
+
+WATERMARK_QUERY = """
+    SELECT t.object_id, s.name AS schema_name, t.name AS table_name, t.modify_date
+    FROM sys.tables t
+    INNER JOIN sys.schemas s ON t.schema_id = s.schema_id
+    WHERE s.name != 'sys' AND s.name != 'INFORMATION_SCHEMA';
+"""
+
+COLUMNS_QUERY = """
+    SELECT
+        c.object_id,
+        c.name AS column_name,
+        tp.name AS data_type,
+        c.is_nullable
+    FROM sys.columns c
+    INNER JOIN sys.types tp ON c.user_type_id = tp.user_type_id
+    WHERE c.object_id IN ({placeholders})
+    ORDER BY c.object_id, c.column_id;
+"""
+
+FOREIGN_KEYS_QUERY = """
+    SELECT
+        fkc.parent_object_id AS object_id,
+        c1.name AS column_name,
+        s2.name AS ref_schema_name,
+        t2.name AS ref_table_name,
+        c2.name AS ref_column_name
+    FROM sys.foreign_key_columns fkc
+    INNER JOIN sys.columns c1 ON fkc.parent_object_id = c1.object_id AND fkc.parent_column_id = c1.column_id
+    INNER JOIN sys.tables t2 ON fkc.referenced_object_id = t2.object_id
+    INNER JOIN sys.schemas s2 ON t2.schema_id = s2.schema_id
+    INNER JOIN sys.columns c2 ON fkc.referenced_object_id = c2.object_id AND fkc.referenced_column_id = c2.column_id
+    WHERE fkc.parent_object_id IN ({placeholders});
+"""
+
+
 class SchemaIntrospector:
+    """Per-database cache of table/column/FK metadata.
+
+    A full build runs once per database. After that, each revalidation
+    (at most every SCHEMA_REVALIDATE_SECONDS) reads only sys.tables
+    modify_date watermarks and re-introspects the tables that changed.
+    Round trips run outside the cache lock, one at a time per database;
+    while one is in flight other requests get the current copy. A failed
+    check also waits SCHEMA_REVALIDATE_SECONDS before the next attempt.
+    """
+
     def __init__(self):
-        self._schema_cache = None
+        self._schemas: Dict[str, DatabaseSchema] = {}
+        # database -> (schema version, rendered text)
+        self._rendered: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        # database -> lock held by the request currently revalidating it
+        self._refresh_locks: Dict[str, threading.Lock] = {}
+
+    def _load_tables(self, cursor, tables: Dict[int, TableMetadata]) -> None:
+        """Fill columns and foreign keys for the given tables in place."""
+        object_ids = list(tables)
+        for start in range(0, len(object_ids), _MAX_IN_PARAMS):
+            chunk = object_ids[start:start + _MAX_IN_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+
+            cursor.execute(COLUMNS_QUERY.format(placeholders=placeholders), chunk)
+            for row in cursor.fetchall():
+                tables[row.object_id].columns.append(ColumnMetadata(
+                    name=row.column_name,
+                    data_type=row.data_type,
+                    is_nullable=bool(row.is_nullable),
+                ))
+
+            cursor.execute(FOREIGN_KEYS_QUERY.format(placeholders=placeholders), chunk)
+            for fk in cursor.fetchall():
+                tables[fk.object_id].foreign_keys.append(ForeignKeyMetadata(
+                    column=fk.column_name,
+                    ref_table=f"{fk.ref_schema_name}.{fk.ref_table_name}",
+                    ref_column=fk.ref_column_name,
+                ))
+
+    def _revalidate(self, database: str, schema: DatabaseSchema) -> DatabaseSchema:
+        """Return an updated copy; the cached object is never mutated, so readers need no lock."""
+        with get_db_connection(database) as conn:
+            cursor = conn.cursor()
+            cursor.execute(WATERMARK_QUERY)
+            watermarks = cursor.fetchall()
 
-    def get_schema_summary(self) -> str:
-        if self._schema_cache:
-            return self._schema_cache
+            tables: Dict[int, TableMetadata] = {}
+            changed: Dict[int, TableMetadata] = {}
+            for row in watermarks:
+                cached = schema.tables.get(row.object_id)
+                if (
+                    cached is not None
+                    and cached.modify_date == row.modify_date
+                    and cached.table_name == row.table_name
+                    and cached.schema_name == row.schema_name
+                ):
+                    tables[row.object_id] = cached
+                else:
+                    changed[row.object_id] = TableMetadata(
+                        object_id=row.object_id,
+                        schema_name=row.schema_name,
+                        table_name=row.table_name,
+                        modify_date=row.modify_date,
+                    )
 
-        logger.info("Introspecting SQL Server Schema for AI Chat Context...")
-        schema_text = []
+            if changed:
+                logger.info(f"Introspecting {len(changed)} changed table(s) in {database}...")
+                self._load_tables(cursor, changed)
+
+        tables.update(changed)
+        dropped = len(schema.tables) + len(changed) - len(tables)
+        return DatabaseSchema(
+            database=database,
+            tables=tables,
+            checked_at=time.monotonic(),
+            version=schema.version + 1 if changed or dropped else schema.version,
+            loaded=True,
+        )
+
+    @staticmethod
+    def _is_fresh(schema: Optional[DatabaseSchema]) -> bool:
+        return schema is not None and time.monotonic() - schema.checked_at < settings.SCHEMA_REVALIDATE_SECONDS
+
+    def get_schema(self, database: Optional[str] = None) -> Optional[DatabaseSchema]:
+        """Cached metadata for the database (active one by default), revalidated if stale."""
+        database = database or get_active_database()
+        with self._lock:
+            schema = self._schemas.get(database)
+            refresh_lock = self._refresh_locks.setdefault(database, threading.Lock())
+        if self._is_fresh(schema):
+            return schema if schema.loaded else None
+
+        if schema is not None and schema.loaded:
+            # Someone is already revalidating: the current copy beats queueing behind them
+            if not refresh_lock.acquire(blocking=False):
+                return schema
+        else:
+            refresh_lock.acquire()
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Fetch Tables and Columns
-                cursor.execute("""
-                    SELECT 
-                        s.name AS schema_name,
-                        t.name AS table_name,
-                        c.name AS column_name,
-                        tp.name AS data_type,
-                        c.max_length,
-                        c.is_nullable
-                    FROM sys.tables t
-                    INNER JOIN sys.schemas s ON t.schema_id = s.schema_id
-                    INNER JOIN sys.columns c ON t.object_id = c.object_id
-                    INNER JOIN sys.types tp ON c.user_type_id = tp.user_type_id
-                    WHERE s.name != 'sys' AND s.name != 'INFORMATION_SCHEMA'
-                    ORDER BY s.name, t.name, c.column_id;
-                """)
-                
-                current_table = None
-                for row in cursor.fetchall():
-                    table_full_name = f"{row.schema_name}.{row.table_name}"
-                    if table_full_name != current_table:
-                        if current_table is not None:
-                            schema_text.append(")")
-                        schema_text.append(f"Table {table_full_name} (")
-                        current_table = table_full_name
-                    
-                    null_str = "NULL" if row.is_nullable else "NOT NULL"
-                    schema_text.append(f"  {row.column_name} {row.data_type} {null_str},")
-                
-                if current_table is not None:
-                    schema_text.append(")")
-                
-                # Fetch Primary and Foreign Keys
-                cursor.execute("""
-                    SELECT 
-                        fk.name AS fk_name,
-                        s1.name AS schema_name,
-                        t1.name AS table_name,
-                        c1.name AS column_name,
-                        s2.name AS ref_schema_name,
-                        t2.name AS ref_table_name,
-                        c2.name AS ref_column_name
-                    FROM sys.foreign_keys fk
-                    INNER JOIN sys.foreign_key_columns fkc ON fk.object_id = fkc.constraint_object_id
-                    INNER JOIN sys.tables t1 ON fkc.parent_object_id = t1.object_id
-                    INNER JOIN sys.schemas s1 ON t1.schema_id = s1.schema_id
-                    INNER JOIN sys.columns c1 ON fkc.parent_object_id = c1.object_id AND fkc.parent_column_id = c1.column_id
-                    INNER JOIN sys.tables t2 ON fkc.referenced_object_id = t2.object_id
-                    INNER JOIN sys.schemas s2 ON t2.schema_id = s2.schema_id
-                    INNER JOIN sys.columns c2 ON fkc.referenced_object_id = c2.object_id AND fkc.referenced_column_id = c2.column_id;
-                """)
-                
-                schema_text.append("\nForeign Keys:")
-                for fk in cursor.fetchall():
-                    schema_text.append(f"  {fk.schema_name}.{fk.table_name}({fk.column_name}) REFERENCES {fk.ref_schema_name}.{fk.ref_table_name}({fk.ref_column_name})")
-
-        except Exception as e:
-            logger.error(f"Failed to introspect schema: {e}")
+            # The request we waited on may have just refreshed it
+            with self._lock:
+                schema = self._schemas.get(database)
+            if self._is_fresh(schema):
+                return schema if schema.loaded else None
+            if schema is None:
+                logger.info(f"Introspecting SQL Server Schema for AI Chat Context ({database})...")
+                schema = DatabaseSchema(database=database)
+
+            try:
+                schema = self._revalidate(database, schema)
+            except Exception as e:
+                logger.error(f"Failed to introspect schema: {e}")
+                # Keep serving the last good copy (if any) and don't retry on every request
+                schema = schema.model_copy(update={"checked_at": time.monotonic()})
+
+            with self._lock:
+                self._schemas[database] = schema
+            return schema if schema.loaded else None
+        finally:
+            refresh_lock.release()
+
+    @staticmethod
+    def render(tables: Iterable[TableMetadata]) -> str:
+        """Render tables in the prompt layout the SQL generator expects."""
+        ordered = sorted(tables, key=lambda t: (t.schema_name, t.table_name))
+        schema_text: List[str] = []
+        for table in ordered:
+            schema_text.append(f"Table {table.full_name} (")
+            for col in table.columns:
+                null_str = "NULL" if col.is_nullable else "NOT NULL"
+                schema_text.append(f"  {col.name} {col.data_type} {null_str},")
+            schema_text.append(")")
+
+        # Only joins the model can actually use: both ends must be in the rendered set
+        names = {table.full_name for table in ordered}
+        schema_text.append("\nForeign Keys:")
+        for table in ordered:
+            for fk in table.foreign_keys:
+                if fk.ref_table not in names:
+                    continue
+                schema_text.append(f"  {table.full_name}({fk.column}) REFERENCES {fk.ref_table}({fk.ref_column})")
+        return "\n".join(schema_text)
+
+    def get_schema_summary(self, database: Optional[str] = None) -> str:
+        database = database or get_active_database()
+        schema = self.get_schema(database)
+        if schema is None:
             return "Error introspecting schema."
-            
-        self._schema_cache = "\n".join(schema_text)
-        return self._schema_cache
 
-    def refresh_cache(self):
-        self._schema_cache = None
+        with self._lock:
+            rendered = self._rendered.get(database)
+            if rendered and rendered[0] == schema.version:
+                return rendered[1]
+            text = self.render(schema.tables.values())
+            self._rendered[database] = (schema.version, text)
+            return text
+
+    def refresh_cache(self, database: Optional[str] = None):
+        """Drop cached metadata for one database, or all when none is given."""
+        with self._lock:
+            if database is None:
+                self._schemas.clear()
+                self._rendered.clear()
+            else:
+                self._schemas.pop(database, None)
+                self._rendered.pop(database, None)
 
 schema_introspector = SchemaIntrospector()
@@ -0,0 +1,164 @@
+"""Question-aware schema pruning for the SQL generator prompt.
+
+A BM25 index over each table's schema/table names, column names, column
+types and FK targets picks the tables a question is about. Their FK
+neighbours are added so joins stay possible, and the result is rendered
+within CHAT_SCHEMA_TOKEN_BUDGET. Everything is local; the index is rebuilt
+only when the cached schema version changes.
+"""
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from models.chat_models import DatabaseSchema, TableMetadata
+from chat_agent.schema import schema_introspector
+from llm.token_budget import count_tokens
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Table names describe the entity far better than column names do
+TABLE_NAME_WEIGHT = 3
+
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at by for from get give how i in is it list me of on or per "
+    "show that the their there these this to was were what when where which who "
+    "with all each many much top most".split()
+)
+
+
+def _stem(token: str) -> str:
+    # Just enough to match "orders" with Order and "categories" with Category
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("ses", "xes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Split identifiers and prose alike: SalesOrderHeader -> sales, order, header."""
+    tokens = []
+    for word in re.split(r"[^A-Za-z0-9]+", text):
+        for part in _CAMEL.findall(word):
+            token = part.lower()
+            if token in _STOPWORDS:
+                continue
+            tokens.append(_stem(token))
+    return tokens
+
+
+class _Bm25Index:
+    def __init__(self, schema: DatabaseSchema):
+        self.version = schema.version
+        self.tables: Dict[str, TableMetadata] = {}
+        self.neighbours: Dict[str, set] = {}
+        self._docs: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        doc_freq: Counter = Counter()
+
+        for table in schema.tables.values():
+            name = table.full_name
+            self.tables[name] = table
+            terms = tokenize(table.table_name) * TABLE_NAME_WEIGHT + tokenize(table.schema_name)
+            for col in table.columns:
+                terms += tokenize(col.name)
+                terms.append(col.data_type.lower())
+            for fk in table.foreign_keys:
+                terms += tokenize(fk.ref_table.split(".", 1)[-1])
+                self.neighbours.setdefault(name, set()).add(fk.ref_table)
+                self.neighbours.setdefault(fk.ref_table, set()).add(name)
+
+            counts = Counter(terms)
+            self._docs[name] = counts
+            self._lengths[name] = len(terms)
+            doc_freq.update(counts.keys())
+
+        n_docs = len(self._docs) or 1
+        self._avg_length = sum(self._lengths.values()) / n_docs if self._lengths else 1.0
+        self._idf = {
+            term: math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for term, df in doc_freq.items()
+        }
+
+    def score(self, query: str) -> List[Tuple[str, float]]:
+        terms = set(tokenize(query))
+        scored = []
+        for name, counts in self._docs.items():
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[name] / self._avg_length)
+            total = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    total += self._idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            if total > 0:
+                scored.append((name, total))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored
+
+
+class SchemaIndex:
+    def __init__(self):
+        self._indexes: Dict[str, _Bm25Index] = {}
+        self._lock = threading.Lock()
+
+    def _get_index(self, schema: DatabaseSchema) -> _Bm25Index:
+        with self._lock:
+            index = self._indexes.get(schema.database)
+            if index is None or index.version != schema.version:
+                index = _Bm25Index(schema)
+                self._indexes[schema.database] = index
+            return index
+
+    def select_tables(self, schema: DatabaseSchema, question: str) -> List[TableMetadata]:
+        """Best-matching tables first, then their FK neighbours, cut to the token budget."""
+        index = self._get_index(schema)
+        seeds = [name for name, _ in index.score(question)[:settings.CHAT_SCHEMA_TOP_TABLES]]
+        if not seeds:
+            return []
+
+        ordered = list(seeds)
+        for name in seeds:
+            for neighbour in sorted(index.neighbours.get(name, ())):
+                if neighbour not in ordered and neighbour in index.tables:
+                    ordered.append(neighbour)
+
+        selected: List[TableMetadata] = []
+        budget = settings.CHAT_SCHEMA_TOKEN_BUDGET
+        for name in ordered:
+            table = index.tables[name]
+            cost = count_tokens(schema_introspector.render([table]))
+            if selected and cost > budget:
+                continue
+            selected.append(table)
+            budget -= cost
+        return selected
+
+    def build_context(self, question: str, database: Optional[str] = None) -> str:
+        """Schema text for the prompt: the relevant subset, or the full schema when nothing matches."""
+        if not settings.CHAT_SCHEMA_PRUNING_ENABLED:
+            return schema_introspector.get_schema_summary(database)
+
+        schema = schema_introspector.get_schema(database)
+        if schema is None:
+            return "Error introspecting schema."
+
+        tables = self.select_tables(schema, question)
+        if not tables:
+            return schema_introspector.get_schema_summary(database)
+
+        logger.info(f"Schema pruned to {len(tables)}/{len(schema.tables)} tables for the prompt.")
+        return schema_introspector.render(tables)
+
+
+schema_index = SchemaIndex()
@@ -1,6 +1,7 @@
 import json
 from models.chat_models import ChatAgentState
 from llm.groq_client import groq_client
+from llm.token_budget import PromptSection, TokenBudget, count_tokens, fit_items
 from config.settings import settings
 from utils.logger import setup_logger
 
@@ -26,31 +27,44 @@ Return ONLY a JSON object containing the raw query:
 }}
 """
 
+def _keep_leading_lines(text: str, max_tokens: int) -> str:
+    # Cut at line boundaries so no column definition is left half-written
+    return "\n".join(fit_items(text.split("\n"), max_tokens))
+
+def _keep_trailing_lines(text: str, max_tokens: int) -> str:
+    # The most recent messages matter most for follow-up questions
+    return "\n".join(reversed(fit_items(text.split("\n")[::-1], max_tokens)))
+
 class SqlGenerator:
-    def generate(self, state: ChatAgentState) -> str:
-        logger.info("Generating SQL from User Intent...")
-        
+    def _build_prompts(self, state: ChatAgentState) -> tuple[str, str]:
+        # Build context from previous conversation optionally
+        history_lines = [
+            f"{msg['role'].upper()}: {msg['content']}"
+            for msg in state.get("chat_history", [])[-3:]
+        ]
+
+        # Fit schema and history around the request; the request itself is never cut
+        budget = TokenBudget(reserved=SQL_GENERATOR_PROMPT + "--- PREVIOUS MESSAGES ---\nUSER REQUEST: ")
+        fitted = budget.allocate([
+            PromptSection("request", state["user_message"], priority=3, min_tokens=count_tokens(state["user_message"])),
+            PromptSection("schema", state["db_schema_context"], priority=2, min_tokens=500, compressor=_keep_leading_lines),
+            PromptSection("history", "\n".join(history_lines), priority=1, compressor=_keep_trailing_lines),
+        ])
+
         system_prompt = SQL_GENERATOR_PROMPT.format(
-            schema_text=state["db_schema_context"],
+            schema_text=fitted["schema"],
             allowed_ops=settings.CHAT_ALLOWED_OPERATIONS
         )
-        
-        # Build context from previous conversation optionally
+
         history_context = ""
-        if state.get("chat_history"):
-            history_context = "--- PREVIOUS MESSAGES ---\n"
-            for msg in state["chat_history"][-3:]:
-                history_context += f"{msg['role'].upper()}: {msg['content']}\n"
-            history_context += "\n"
+        if fitted["history"]:
+            history_context = f"--- PREVIOUS MESSAGES ---\n{fitted['history']}\n\n"
+
+        user_prompt = f"{history_context}USER REQUEST: {fitted['request']}"
+        return system_prompt, user_prompt
 
-        user_prompt = f"{history_context}USER REQUEST: {state['user_message']}"
-        
+    def _parse_sql(self, response_text: str | None) -> str:
         try:
-            response_text = groq_client.get_completion(
-                system_prompt=system_prompt,
-                user_prompt=user_prompt,
-                response_format={"type": "json_object"}
-            )
             raw_json = json.loads(response_text)
             sql = raw_json.get("generated_sql", "").strip()
             
@@ -65,4 +79,14 @@ class SqlGenerator:
             logger.error(f"Failed to generate SQL: {e}")
             return ""
 
+    async def agenerate(self, state: ChatAgentState) -> str:
+        logger.info("Generating SQL from User Intent...")
+        system_prompt, user_prompt = self._build_prompts(state)
+        response_text = await groq_client.aget_completion(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            response_format={"type": "json_object"}
+        )
+        return self._parse_sql(response_text)
+
 sql_generator = SqlGenerator()
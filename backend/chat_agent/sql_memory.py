@@ -0,0 +1,227 @@
+"""NL→SQL memory: reuse validated SQL for repeat questions.
+
+Questions are normalized and their literals (quoted names, dates, numbers)
+replaced by typed slots, so "top 10 customers by sales in 2024" and
+"top 5 customers by sales in 2023" share one entry. The SQL is stored as a
+template with the matching literals parameterized; a recall substitutes
+the new values and the result still goes through the validator.
+
+Entries are keyed by database, bounded (LRU) and persisted as JSON.
+remember() may write that file, so async callers go through run_blocking.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Order matters: quoted strings first, then dates, then bare numbers
+_LITERAL_PATTERNS = [
+    ("str", re.compile(r"'([^']+)'|\"([^\"]+)\"")),
+    ("date", re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")),
+    ("num", re.compile(r"(?<![\w.])(\d+(?:\.\d+)?)(?![\w.])")),
+]
+
+_PUNCTUATION = re.compile(r"[^\w<>\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Words that make a question depend on the previous turn ("show those by month")
+_FOLLOW_UP_WORDS = frozenset("it its that those these them they same instead also again previous above".split())
+
+
+def extract_literals(question: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Return (question with typed <slot> markers, [(type, value), ...] in order)."""
+    spans = []
+    for kind, pattern in _LITERAL_PATTERNS:
+        for match in pattern.finditer(question):
+            if any(match.start() < end and start < match.end() for start, end, _, _ in spans):
+                continue
+            value = next(g for g in match.groups() if g is not None)
+            spans.append((match.start(), match.end(), kind, value))
+    spans.sort()
+
+    parts = []
+    literals = []
+    cursor = 0
+    for start, end, kind, value in spans:
+        parts.append(question[cursor:start])
+        parts.append(f" <{kind}> ")
+        literals.append((kind, value))
+        cursor = end
+    parts.append(question[cursor:])
+    return "".join(parts), literals
+
+
+def normalize_question(text: str) -> str:
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def is_self_contained(question: str, has_history: bool) -> bool:
+    """False for follow-ups whose SQL depended on earlier turns; those are neither stored nor recalled."""
+    if not has_history:
+        return True
+    return not (_FOLLOW_UP_WORDS & set(normalize_question(question).split()))
+
+
+def _sql_pattern(kind: str, value: str) -> re.Pattern:
+    if kind == "num":
+        return re.compile(r"(?<![\w.])%s(?![\w.])" % re.escape(value))
+    # Strings and dates must sit inside a SQL string literal
+    return re.compile(r"(?<=['%%])%s(?=['%%])" % re.escape(value.replace("'", "''")), re.IGNORECASE)
+
+
+def build_template(sql: str, literals: List[Tuple[str, str]]) -> Optional[str]:
+    """Replace each question literal in the SQL with a {n} slot.
+
+    Returns None when a literal is missing from the SQL or appears more than
+    once, since substituting it would then be a guess.
+    """
+    template = sql.replace("{", "{{").replace("}", "}}")
+    for i, (kind, value) in enumerate(literals):
+        pattern = _sql_pattern(kind, value)
+        if len(pattern.findall(template)) != 1:
+            return None
+        template = pattern.sub("{%d}" % i, template)
+    return template
+
+
+def _render_value(kind: str, value: str) -> str:
+    return value.replace("'", "''") if kind != "num" else value
+
+
+class SqlMemory:
+    def __init__(
+        self,
+        store_path: str = settings.SQL_MEMORY_PATH,
+        max_entries: int = settings.SQL_MEMORY_MAX_ENTRIES,
+    ):
+        if not os.path.isabs(store_path):
+            # Relative paths resolve against the backend root, not the CWD
+            store_path = os.path.join(_BACKEND_ROOT, store_path)
+        self._store_path = store_path
+        self.max_entries = max_entries
+        # "database|normalized question" -> {"template", "slots", "question", "hits"}
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_persist = time.monotonic()
+        self._stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _key(database: str, normalized: str) -> str:
+        return f"{database.lower()}|{normalized}"
+
+    def recall(self, question: str, database: str) -> Optional[str]:
+        """SQL for a previously answered question with these literals substituted, if any."""
+        templated, literals = extract_literals(question)
+        keys = [
+            (self._key(database, normalize_question(templated)), literals),
+            # Entries stored verbatim (literals not locatable in their SQL)
+            (self._key(database, normalize_question(question)), []),
+        ]
+        with self._lock:
+            for key, values in keys:
+                entry = self._entries.get(key)
+                if entry is None or entry["slots"] != [kind for kind, _ in values]:
+                    continue
+                self._entries.move_to_end(key)
+                entry["hits"] += 1
+                self._stats["hits"] += 1
+                self._dirty = True
+                rendered = [_render_value(kind, value) for kind, value in values]
+                return entry["template"].format(*rendered)
+            self._stats["misses"] += 1
+        return None
+
+    def remember(self, question: str, sql: str, database: str) -> None:
+        templated, literals = extract_literals(question)
+        template = build_template(sql, literals) if literals else None
+        if template is not None:
+            key = self._key(database, normalize_question(templated))
+            slots = [kind for kind, _ in literals]
+        else:
+            key = self._key(database, normalize_question(question))
+            template = sql.replace("{", "{{").replace("}", "}}")
+            slots = []
+
+        with self._lock:
+            previous = self._entries.get(key)
+            self._entries[key] = {
+                "template": template,
+                "slots": slots,
+                "question": question,
+                "hits": previous["hits"] if previous else 0,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        self.maybe_persist()
+
+    def forget(self, question: str, database: str) -> None:
+        """Drop the entry a question resolves to (e.g. its SQL stopped working)."""
+        templated, _ = extract_literals(question)
+        with self._lock:
+            for normalized in (normalize_question(templated), normalize_question(question)):
+                if self._entries.pop(self._key(database, normalized), None) is not None:
+                    self._dirty = True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "max_entries": self.max_entries}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    # ── Persistence ─────────────────────────────────────────────
+    def maybe_persist(self) -> None:
+        if time.monotonic() - self._last_persist >= settings.SQL_MEMORY_PERSIST_SECONDS:
+            self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            self._last_persist = time.monotonic()
+            if not self._dirty:
+                return
+            payload = {"version": 1, "entries": list(self._entries.items())}
+            self._dirty = False
+
+        try:
+            directory = os.path.dirname(self._store_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self._store_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, separators=(",", ":"))
+            os.replace(tmp_path, self._store_path)
+            logger.debug(f"Persisted {len(payload['entries'])} SQL memory entries.")
+        except OSError as e:
+            logger.error(f"Failed to persist SQL memory: {e}")
+
+    def load(self) -> None:
+        if not os.path.exists(self._store_path):
+            return
+        try:
+            with open(self._store_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            entries = OrderedDict((k, v) for k, v in payload.get("entries", [])[-self.max_entries:])
+            with self._lock:
+                self._entries = entries
+            logger.info(f"Loaded {len(entries)} SQL memory entries.")
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Failed to load SQL memory, starting fresh: {e}")
+
+
+sql_memory = SqlMemory()
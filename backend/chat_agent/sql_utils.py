@@ -0,0 +1,100 @@
+"""Shared helpers for handling generated SQL text."""
+import re
+from typing import List, Optional, Tuple
+
+import sqlparse
+
+
+def normalize_sql(sql: str) -> str:
+    """Canonical form for cache keys: comments stripped, keywords upper-cased, whitespace collapsed.
+
+    Only whitespace between tokens is collapsed; string literals and delimited
+    identifiers keep theirs, so 'x  y' and 'x y' stay distinct keys.
+    """
+    formatted = sqlparse.format(sql, strip_comments=True, keyword_case="upper")
+    parts = [" " if match.lastgroup == "ws" else match.group() for match in _TSQL_TOKEN.finditer(formatted)]
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+# T-SQL lexical scanner. Only words matter to the validator, so strings,
+# bracketed/quoted identifiers, comments, numbers and operators are skipped
+# rather than tokenized.
+_TSQL_TOKEN = re.compile(
+    r"""
+      (?P<ws>\s+)
+    | (?P<line_comment>--[^\n]*)
+    | (?P<block_comment>/\*)
+    | (?P<string>N?'(?:[^']|'')*')
+    | (?P<bracket>\[(?:[^\]]|\]\])*\])
+    | (?P<quoted>"(?:[^"]|"")*")
+    | (?P<word>[@#]*[A-Za-z_][\w$#@]*)
+    | (?P<number>0[xX][0-9A-Fa-f]*|(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<open>\()
+    | (?P<close>\))
+    | (?P<semi>;)
+    | (?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_COMMENT_EDGE = re.compile(r"/\*|\*/")
+# A letter glued onto a numeric literal (1.5E2DELETE, 0x1FG) is lexed differently by
+# different engines; leave such input to the full parse
+_WORD_START = re.compile(r"[A-Za-z_@#$]")
+
+
+def _skip_block_comment(sql: str, pos: int) -> int:
+    """Index just past the comment opened at pos (T-SQL block comments nest); -1 if unterminated."""
+    depth = 1
+    for match in _COMMENT_EDGE.finditer(sql, pos + 2):
+        depth += 1 if match.group() == "/*" else -1
+        if depth == 0:
+            return match.end()
+    return -1
+
+
+def scan_tsql(sql: str) -> Optional[List[List[Tuple[str, int]]]]:
+    """Split SQL into statements of (UPPER-CASED word, parenthesis depth) pairs.
+
+    Variables and temp tables keep their @/# prefix so they never look like
+    keywords. Returns None when the text can't be scanned with certainty
+    (unterminated string, identifier or comment, unbalanced parentheses, a
+    word glued onto a number); callers should fall back to a full parse.
+    """
+    statements: List[List[Tuple[str, int]]] = []
+    words: List[Tuple[str, int]] = []
+    depth = 0
+    pos = 0
+    length = len(sql)
+    while pos < length:
+        match = _TSQL_TOKEN.match(sql, pos)
+        kind = match.lastgroup
+        pos = match.end()
+        if kind == "word":
+            words.append((match.group().upper(), depth))
+        elif kind == "number":
+            if _WORD_START.match(sql, pos):
+                return None
+        elif kind == "open":
+            depth += 1
+        elif kind == "close":
+            depth -= 1
+            if depth < 0:
+                return None
+        elif kind == "semi":
+            if depth:
+                return None
+            if words:
+                statements.append(words)
+                words = []
+        elif kind == "block_comment":
+            pos = _skip_block_comment(sql, match.start())
+            if pos < 0:
+                return None
+        elif kind == "other" and match.group() in "'\"[":
+            # An opening quote or bracket the patterns above couldn't close
+            return None
+    if depth:
+        return None
+    if words:
+        statements.append(words)
+    return statements
@@ -0,0 +1,161 @@
+"""Server-Sent Events variant of the chat pipeline.
+
+Runs the same stages as chat_agent.graph but emits progress as soon as
+each piece exists: the SQL once validated, result rows per fetch batch
+(columnar, like GET /chat/results/{id}), then the synthesizer explanation
+token by token.
+
+Events: ``start`` (carries the request_id for DELETE /chat/query/{id}),
+``sql``, ``rows``, ``token``, ``done`` (the full ChatResponse) and ``error``.
+If the client disconnects mid-stream the route closes this generator, which
+cancels the running statement and releases the LLM slot of the synthesis.
+"""
+import asyncio
+import json
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict
+
+import pyodbc
+
+from models.chat_models import ChatAgentState
+from chat_agent.graph import (
+    recall_sql_node,
+    introspect_schema_node,
+    generate_sql_node,
+    validate_sql_node,
+    limit_rows_node,
+    guard_cost_node,
+    record_sql_outcome,
+    build_chat_response,
+)
+from chat_agent.executor import query_executor
+from chat_agent.result_set import ColumnarResult, result_store
+from chat_agent.synthesizer import result_synthesizer
+from chat_agent.memory import chat_memory
+from chat_agent.query_registry import query_registry, QueryCancelledError
+from utils.concurrency import get_executor, run_blocking
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Rows per fetchmany batch pushed to the client
+STREAM_BATCH_SIZE = 100
+
+_DONE = object()
+
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _stream_rows(sql: str, request_id: str) -> AsyncIterator[Any]:
+    """Run the blocking fetch loop in a worker thread and relay batches as they land."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def produce():
+        try:
+            for batch in query_executor.iter_batches(sql, STREAM_BATCH_SIZE, request_id):
+                loop.call_soon_threadsafe(queue.put_nowait, batch)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+
+    producer = loop.run_in_executor(get_executor(), produce)
+    finished = False
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                finished = True
+                break
+            yield item
+    finally:
+        if not finished:
+            # The consumer went away (client disconnect): stop the statement on the server
+            query_registry.cancel(request_id)
+        await producer
+
+
+async def stream_chat_events(state: ChatAgentState) -> AsyncIterator[str]:
+    request_id = state["request_id"]
+    query_registry.start(request_id, state["session_id"])
+    try:
+        yield format_sse("start", {"request_id": request_id})
+
+        state = recall_sql_node(state)
+        if not state.get("sql_from_memory") and not state.get("sql_confirmed"):
+            state = await introspect_schema_node(state)
+            state = await generate_sql_node(state)
+        state = validate_sql_node(state)
+        if state.get("is_valid_sql"):
+            state = limit_rows_node(state)
+            state = await guard_cost_node(state)
+
+        yield format_sse("sql", {
+            "generated_sql": state.get("generated_sql"),
+            "is_valid_sql": state.get("is_valid_sql", False),
+            "validation_error": "" if state.get("is_valid_sql") else state.get("validation_error", ""),
+            "requires_confirmation": state.get("requires_confirmation", False),
+            "confirmation_token": state.get("issued_confirmation_token", ""),
+            "cost_estimate": state.get("cost_estimate", {}),
+        })
+
+        if state.get("is_valid_sql") and not state.get("execution_error"):
+            start_time = time.time()
+            batches = []
+            total_rows = 0
+            try:
+                async with aclosing(_stream_rows(state["generated_sql"], request_id)) as rows:
+                    async for item in rows:
+                        if isinstance(item, Exception):
+                            raise item
+                        batches.append(item)
+                        payload = item.to_payload()
+                        payload["offset"] = total_rows
+                        total_rows += item.row_count
+                        payload["total_rows"] = total_rows
+                        yield format_sse("rows", payload)
+            except QueryCancelledError:
+                state["execution_error"] = "Query cancelled."
+            except pyodbc.Error as e:
+                if query_registry.is_cancelled(request_id):
+                    state["execution_error"] = "Query cancelled."
+                else:
+                    logger.error(f"Sandbox query exception: {e}")
+                    state["execution_error"] = f"Database Execution Error: {str(e)}"
+            except Exception as e:
+                logger.error(f"Unexpected execution error: {e}")
+                state["execution_error"] = f"Unexpected Error: {str(e)}"
+            result = ColumnarResult.concat(batches)
+            state["query_result"] = result
+            state["result_id"] = result_store.put(result) if result is not None else ""
+            state["execution_time_ms"] = (time.time() - start_time) * 1000
+            await record_sql_outcome(state)
+
+        summary_pack: Dict[str, Any] = {}
+        async with aclosing(result_synthesizer.astream(state)) as events:
+            async for kind, payload in events:
+                if kind == "token":
+                    yield format_sse("token", {"text": payload})
+                else:
+                    summary_pack = payload
+
+        state["explanation"] = summary_pack.get("explanation", "")
+        state["suggested_chart_type"] = summary_pack.get("suggested_chart_type", "none")
+        state["confidence"] = summary_pack.get("confidence", 0.0)
+
+        await run_blocking(chat_memory.add_exchange, state["session_id"], state["user_message"], state["explanation"])
+
+        yield format_sse("done", build_chat_response(state).model_dump())
+
+    except Exception as e:
+        logger.error(f"Chat stream failed: {e}")
+        yield format_sse("error", {
+            "explanation": "The SQL Chat Agent encountered an unexpected error.",
+            "error_message": str(e),
+        })
+    finally:
+        query_registry.finish(request_id)
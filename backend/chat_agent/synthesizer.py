@@ -1,6 +1,20 @@
+import datetime as dt
 import json
+import re
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Tuple
 from models.chat_models import ChatAgentState
 from llm.groq_client import groq_client
+from chat_agent.result_profiler import (
+    format_value,
+    is_number,
+    profile_result,
+    render_profile,
+    render_rows,
+    representative_rows,
+)
+from llm.token_budget import PromptSection, TokenBudget, fit_items
+from config.settings import settings
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -15,8 +29,12 @@ Your goal is to explain WHAT these results mean contextually in concise, natural
 Original User Request: {user_message}
 SQL Executed: {sql_text}
 
---- RESULTS ROW PREVIEW ({row_count} rows total) ---
-{results_json}
+--- RESULT PROFILE ({row_count} rows total; statistics cover every row) ---
+{result_profile}
+
+--- REPRESENTATIVE ROWS (#row_number [values in column order]) ---
+Columns: {columns}
+{sample_rows}
 
 INSTRUCTIONS:
 1. Provide a clear, natural language explanation of the answer. 
@@ -31,12 +49,85 @@ INSTRUCTIONS:
 }}
 """
 
+SYNTHESIZER_SYSTEM_PROMPT = "You are a data interpretation module. Output strict JSON only."
+
+class _JsonStringFieldStreamer:
+    """Incrementally extracts one top-level string field from streamed JSON text.
+
+    The synthesizer answers in JSON; this lets the explanation be forwarded
+    token by token without waiting for the closing brace.
+    """
+
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+    _HEX4 = re.compile(r"[0-9A-Fa-f]{4}")
+
+    def __init__(self, field: str):
+        self._marker = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = 0
+        self._inside = False
+        self._done = False
+
+    def feed(self, chunk: str) -> str:
+        """Add raw model output; return newly decoded characters of the field."""
+        if self._done:
+            return ""
+        self._buffer += chunk
+        if not self._inside:
+            match = self._marker.search(self._buffer)
+            if not match:
+                return ""
+            self._inside = True
+            self._pos = match.end()
+
+        out = []
+        buf = self._buffer
+        while self._pos < len(buf):
+            ch = buf[self._pos]
+            if ch == '"':
+                self._done = True
+                break
+            if ch == "\\":
+                # Wait for the rest of an escape sequence split across chunks
+                if self._pos + 1 >= len(buf):
+                    break
+                nxt = buf[self._pos + 1]
+                if nxt == "u":
+                    if self._pos + 6 > len(buf):
+                        break
+                    digits = buf[self._pos + 2:self._pos + 6]
+                    if not self._HEX4.fullmatch(digits):
+                        # Malformed escape: pass it through as text rather than end the stream
+                        out.append(buf[self._pos:self._pos + 2])
+                        self._pos += 2
+                        continue
+                    out.append(chr(int(digits, 16)))
+                    self._pos += 6
+                else:
+                    out.append(self._ESCAPES.get(nxt, nxt))
+                    self._pos += 2
+                continue
+            out.append(ch)
+            self._pos += 1
+        return "".join(out)
+
+
+# Questions asking for interpretation always go to the LLM, whatever the result shape
+_ANALYSIS_INTENT = re.compile(
+    r"\b(why|explain|analy[sz]\w*|insights?|trends?|compare|comparison|correlat\w*|"
+    r"anomal\w*|recommend\w*|summari[sz]\w*|interpret\w*|pattern\w*)\b",
+    re.IGNORECASE,
+)
+
+def _local_summary(explanation: str, chart_type: str = "none") -> dict:
+    return {
+        "explanation": explanation,
+        "suggested_chart_type": chart_type,
+        "confidence": 0.9
+    }
+
 class ResultSynthesizer:
-    def synthesize(self, state: ChatAgentState) -> dict:
-        logger.info("Synthesizing Query Results into Natural Language...")
-        
-        results = state.get("query_results_preview", [])
-        
+    def _error_result(self, state: ChatAgentState) -> dict | None:
         # If execution failed, summarize the error
         if state.get("execution_error") or not state.get("is_valid_sql"):
             error_msg = state.get("execution_error") or state.get("validation_error")
@@ -45,26 +136,90 @@ class ResultSynthesizer:
                 "suggested_chart_type": "none",
                 "confidence": 0.0
             }
-            
-        # Avoid overflowing LLM if row size is massive, just sample first 50
-        sample_results = results[:50]
-        results_json = json.dumps(sample_results, default=str)
-        
-        prompt = SYNTHESIZER_PROMPT.format(
-            user_message=state["user_message"],
-            sql_text=state["generated_sql"],
-            row_count=len(results),
-            results_json=results_json
+        return None
+
+    def _fast_path(self, state: ChatAgentState) -> dict | None:
+        """Explain trivially shaped results locally; None when the LLM should do it."""
+        if not settings.CHAT_FAST_SYNTHESIS_ENABLED or _ANALYSIS_INTENT.search(state["user_message"]):
+            return None
+        result = state.get("query_result")
+        row_count = self._row_count(state)
+        if row_count == 0:
+            return _local_summary("The query ran successfully but returned no rows; nothing matched the request.")
+        if row_count > settings.CHAT_FAST_SYNTHESIS_MAX_ROWS:
+            return None
+
+        columns = result.columns
+        if row_count == 1:
+            values = result.row_tuples(0, 1)[0]
+            if len(columns) == 1:
+                return _local_summary(f"The result is {format_value(values[0])} ({columns[0]}).")
+            if len(columns) <= 4:
+                pairs = ", ".join(f"{name} = {format_value(value)}" for name, value in zip(columns, values))
+                return _local_summary(f"The query returned one row: {pairs}.")
+            return None
+
+        if len(columns) == 1:
+            listed = ", ".join(format_value(value) for value in result.data[0])
+            return _local_summary(f"The query returned {row_count} {columns[0]} values: {listed}.")
+
+        if len(columns) == 2:
+            # Top-N shape: one label column and one numeric measure
+            labels, measures = result.data
+            label_name, measure_name = columns
+            if not all(is_number(v) for v in measures if v is not None):
+                labels, measures = measures, labels
+                label_name, measure_name = measure_name, label_name
+                if not all(is_number(v) for v in measures if v is not None):
+                    return None
+            if any(is_number(v) for v in labels):
+                return None
+            listed = ", ".join(f"{format_value(label)} ({format_value(value)})" for label, value in zip(labels, measures))
+            chart = "line" if all(isinstance(v, dt.date) for v in labels if v is not None) else "bar"
+            return _local_summary(f"The query returned {measure_name} for {row_count} {label_name} values: {listed}.", chart)
+        return None
+
+    @staticmethod
+    def _row_count(state: ChatAgentState) -> int:
+        result = state.get("query_result")
+        return result.row_count if result is not None else 0
+
+    def _build_prompt(self, state: ChatAgentState) -> str:
+        result = state.get("query_result")
+
+        # Statistics over the full result instead of raw rows, plus a few rows for grounding
+        if result is not None:
+            profile_lines = render_profile(profile_result(result))
+            row_lines = render_rows(result, representative_rows(result))
+            columns = json.dumps(result.columns)
+        else:
+            profile_lines, row_lines, columns = [], [], "[]"
+
+        def keep_whole_lines(text: str, max_tokens: int) -> str:
+            # One column (or row) per line; drop trailing lines rather than cut one in half
+            return "\n".join(fit_items(text.split("\n"), max_tokens))
+
+        budget = TokenBudget(reserved=SYNTHESIZER_PROMPT + SYNTHESIZER_SYSTEM_PROMPT + columns)
+        fitted = budget.allocate([
+            PromptSection("user_message", state["user_message"], priority=4),
+            PromptSection("sql_text", state["generated_sql"], priority=3, min_tokens=200),
+            PromptSection("result_profile", "\n".join(profile_lines), priority=2, compressor=keep_whole_lines),
+            PromptSection("sample_rows", "\n".join(row_lines), priority=1, compressor=keep_whole_lines),
+        ])
+
+        return SYNTHESIZER_PROMPT.format(
+            user_message=fitted["user_message"],
+            sql_text=fitted["sql_text"],
+            row_count=self._row_count(state),
+            result_profile=fitted["result_profile"] or "(no rows)",
+            columns=columns,
+            sample_rows=fitted["sample_rows"],
         )
-        
+
+    def _parse_response(self, response_text: str | None, row_count: int) -> dict:
         try:
-            response_text = groq_client.get_completion(
-                system_prompt="You are a data interpretation module. Output strict JSON only.",
-                user_prompt=prompt,
-                response_format={"type": "json_object"}
-            )
             parsed = json.loads(response_text)
-            
+
             return {
                 "explanation": parsed.get("explanation", "Data retrieval successful."),
                 "suggested_chart_type": parsed.get("suggested_chart_type", "none"),
@@ -73,9 +228,51 @@ class ResultSynthesizer:
         except Exception as e:
             logger.error(f"Synthesizer LLM failed: {e}")
             return {
-                "explanation": f"Retrieved {len(results)} rows. (Failed to generate AI summary)",
+                "explanation": f"Retrieved {row_count} rows. (Failed to generate AI summary)",
                 "suggested_chart_type": "none",
                 "confidence": 0.0
             }
 
+    async def asynthesize(self, state: ChatAgentState) -> dict:
+        logger.info("Synthesizing Query Results into Natural Language...")
+
+        local_result = self._error_result(state) or self._fast_path(state)
+        if local_result:
+            return local_result
+
+        response_text = await groq_client.aget_completion(
+            system_prompt=SYNTHESIZER_SYSTEM_PROMPT,
+            user_prompt=self._build_prompt(state),
+            response_format={"type": "json_object"}
+        )
+        return self._parse_response(response_text, self._row_count(state))
+
+    async def astream(self, state: ChatAgentState) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield ("token", text) for the explanation as it streams, then ("result", dict)."""
+        logger.info("Streaming synthesis of Query Results...")
+
+        local_result = self._error_result(state) or self._fast_path(state)
+        if local_result:
+            yield "token", local_result["explanation"]
+            yield "result", local_result
+            return
+
+        streamer = _JsonStringFieldStreamer("explanation")
+        parts = []
+        # The completion stream holds an LLM concurrency slot; release it as soon as
+        # this generator is closed (client disconnect) rather than when it is collected
+        completion = groq_client.astream_completion(
+            system_prompt=SYNTHESIZER_SYSTEM_PROMPT,
+            user_prompt=self._build_prompt(state),
+            response_format={"type": "json_object"}
+        )
+        async with aclosing(completion):
+            async for chunk in completion:
+                parts.append(chunk)
+                text = streamer.feed(chunk)
+                if text:
+                    yield "token", text
+
+        yield "result", self._parse_response("".join(parts) or None, self._row_count(state))
+
 result_synthesizer = ResultSynthesizer()
@@ -1,57 +1,131 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
 import sqlparse
+from chat_agent.sql_utils import scan_tsql
 from config.settings import settings
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+FORBIDDEN_KEYWORDS = frozenset(['INSERT', 'UPDATE', 'DELETE', 'DROP', 'ALTER', 'TRUNCATE', 'EXEC', 'EXECUTE', 'CREATE'])
+
+# Leading words whose statement type is unambiguous without a parse (same names sqlparse reports)
+_STATEMENT_TYPES = frozenset(['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'DROP', 'ALTER', 'TRUNCATE', 'CREATE'])
+# What a CTE list can lead into
+_CTE_BODY_TYPES = frozenset(['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'MERGE'])
+
 class SqlValidator:
-    def __init__(self):
+    def __init__(self, cache_size: int = settings.SQL_VALIDATION_CACHE_SIZE):
         self.allowed_operations = [op.strip().upper() for op in settings.CHAT_ALLOWED_OPERATIONS.split(',')]
         self.enable_dml = settings.CHAT_ENABLE_DML
+        # Verdicts keyed by a digest of the exact SQL text; recalled and retried SQL repeats verbatim
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, tuple[bool, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "scanned": 0, "parsed": 0}
 
     def validate(self, sql: str) -> tuple[bool, str]:
         if not sql or not sql.strip():
             return False, "SQL query cannot be empty."
 
-        try:
-            # Parse the SQL statement(s)
-            parsed = sqlparse.parse(sql)
-            if not parsed:
-                return False, "Failed to parse SQL."
-
-            # A user might send multiple statements (e.g. SELECT 1; SELECT 2;)
-            # Walk through each parsed statement
-            for statement in parsed:
-                # Filter out pure whitespaces/comments to find the command type
-                stmt_type = statement.get_type().upper()
-                
-                logger.debug(f"Validating parsed SQL statement type: {stmt_type}")
-
-                # 1. Check if statement type is explicitly allowed
-                if stmt_type not in self.allowed_operations:
-                    if stmt_type == "UNKNOWN":
-                        # Sometimes sqlparse struggles with T-SQL CTEs (WITH clause)
-                        tokens = [t for t in statement.tokens if not t.is_whitespace]
-                        if tokens and tokens[0].value.upper() == 'WITH':
-                            # It's a CTE which usually leads to a SELECT
-                            pass
-                        else:
-                            return False, f"Operation type '{stmt_type}' is not recognized or permitted."
+        key = hashlib.blake2b(sql.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with self._lock:
+            verdict = self._cache.get(key)
+            if verdict is not None:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return verdict
+            self._stats["misses"] += 1
+
+        verdict = self._scan_validate(sql)
+        if verdict is not None:
+            stat = "scanned"
+        else:
+            stat = "parsed"
+            try:
+                verdict = self._parse_validate(sql)
+            except Exception as e:
+                # Not cached: an engine failure says nothing about the SQL itself
+                logger.error(f"SQL validation crashed: {e}")
+                return False, f"SQL validation engine failure: {str(e)}"
+
+        with self._lock:
+            self._stats[stat] += 1
+            self._cache[key] = verdict
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return verdict
+
+    def _scan_validate(self, sql: str) -> Optional[tuple[bool, str]]:
+        """Keyword-scanner verdict, or None when the input needs the full parse."""
+        statements = scan_tsql(sql)
+        if not statements:
+            return None
+
+        for words in statements:
+            first = words[0][0]
+            if first == "WITH":
+                # The statement type is the first top-level DML word after the CTE list
+                stmt_type = next((word for word, depth in words if depth == 0 and word in _CTE_BODY_TYPES), None)
+                if stmt_type is None:
+                    return None
+            elif first in _STATEMENT_TYPES:
+                stmt_type = first
+            else:
+                return None
+
+            if stmt_type not in self.allowed_operations:
+                return False, f"Operation '{stmt_type}' is forbidden by security policy."
+
+            if not self.enable_dml:
+                for word, _ in words:
+                    if word in FORBIDDEN_KEYWORDS:
+                        return False, f"Explicit DML/DDL keyword '{word}' detected and blocked by policy."
+
+        return True, "Valid"
+
+    def _parse_validate(self, sql: str) -> tuple[bool, str]:
+        # Parse the SQL statement(s)
+        parsed = sqlparse.parse(sql)
+        if not parsed:
+            return False, "Failed to parse SQL."
+
+        # A user might send multiple statements (e.g. SELECT 1; SELECT 2;)
+        # Walk through each parsed statement
+        for statement in parsed:
+            # Filter out pure whitespaces/comments to find the command type
+            stmt_type = statement.get_type().upper()
+
+            logger.debug(f"Validating parsed SQL statement type: {stmt_type}")
+
+            # 1. Check if statement type is explicitly allowed
+            if stmt_type not in self.allowed_operations:
+                if stmt_type == "UNKNOWN":
+                    # Sometimes sqlparse struggles with T-SQL CTEs (WITH clause)
+                    tokens = [t for t in statement.tokens if not t.is_whitespace]
+                    if tokens and tokens[0].value.upper() == 'WITH':
+                        # It's a CTE which usually leads to a SELECT
+                        pass
                     else:
-                        return False, f"Operation '{stmt_type}' is forbidden by security policy."
-
-                # 2. Walk AST to detect DML/DDL inside subqueries or CTEs just in case
-                if not self.enable_dml:
-                    for token in statement.flatten():
-                        val = token.value.upper()
-                        if token.ttype in sqlparse.tokens.Keyword or token.ttype in sqlparse.tokens.Keyword.DML or token.ttype in sqlparse.tokens.Keyword.DDL:
-                            if val in ['INSERT', 'UPDATE', 'DELETE', 'DROP', 'ALTER', 'TRUNCATE', 'EXEC', 'EXECUTE', 'CREATE']:
-                                return False, f"Explicit DML/DDL keyword '{val}' detected and blocked by policy."
-
-            return True, "Valid"
-            
-        except Exception as e:
-            logger.error(f"SQL validation crashed: {e}")
-            return False, f"SQL validation engine failure: {str(e)}"
+                        return False, f"Operation type '{stmt_type}' is not recognized or permitted."
+                else:
+                    return False, f"Operation '{stmt_type}' is forbidden by security policy."
+
+            # 2. Walk AST to detect DML/DDL inside subqueries or CTEs just in case
+            if not self.enable_dml:
+                for token in statement.flatten():
+                    val = token.value.upper()
+                    if token.ttype in sqlparse.tokens.Keyword or token.ttype in sqlparse.tokens.Keyword.DML or token.ttype in sqlparse.tokens.Keyword.DDL:
+                        if val in FORBIDDEN_KEYWORDS:
+                            return False, f"Explicit DML/DDL keyword '{val}' detected and blocked by policy."
+
+        return True, "Valid"
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._cache)}
 
 sql_validator = SqlValidator()
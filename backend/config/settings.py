@@ -35,23 +35,115 @@ class Settings(BaseSettings):
     PARAM_SNIFFING_MIN_STDDEV: float = 100.0        # μs — low for dev, raise for prod
     PREDICTION_SLOPE_THRESHOLD: float = 5000.0      # μs per sample — triggers alert
     PREDICTION_MIN_HISTORY_POINTS: int = 5
-    
+
+    # Phase 7: Seasonal (hour-of-week) Baselines
+    BASELINE_STORE_PATH: str = "data/baselines.json"
+    BASELINE_MIN_SAMPLES: int = 12                  # samples per hour-of-week bucket before scoring
+    BASELINE_MIN_WEEKS: int = 2                     # completed weeks per bucket before scoring
+    BASELINE_MAX_SERIES: int = 500                  # cap on tracked series (per-query series churn)
+    BASELINE_PERSIST_SECONDS: int = 300
+    SEASONAL_ZSCORE_THRESHOLD: float = 3.0
+
+    # Phase 7: Online Change-Point Detection (CUSUM)
+    CHANGEPOINT_WARMUP_POINTS: int = 8              # samples before a series is armed
+    CHANGEPOINT_DRIFT_SIGMAS: float = 0.5           # CUSUM slack k, in baseline stddevs
+    CHANGEPOINT_THRESHOLD_SIGMAS: float = 5.0       # CUSUM decision threshold h, in baseline stddevs
+    CHANGEPOINT_MAX_SERIES: int = 500
+    CHANGEPOINT_MAX_EVENTS: int = 200
+    CHANGEPOINT_EVENT_WINDOW_SECONDS: int = 300     # how long an event keeps surfacing as an anomaly
+
+    # Phase 7: Cross-Domain Correlation (root-cause ranking)
+    CORRELATION_WINDOW: int = 60                    # fast-tier polls (~5 min at 5s)
+    CORRELATION_MAX_LAG: int = 3                    # polls a contributor may lead the symptom by
+    CORRELATION_MIN_ABS: float = 0.5
+    CORRELATION_TOP_K: int = 5
+    CORRELATION_MAX_SERIES: int = 40                # per family (waits, queries), busiest first
+
+    # Phase 7: Alert De-duplication & Incidents
+    ALERT_COOLDOWN_MINUTES: int = 15                # default per-fingerprint cooldown
+    ALERT_TYPE_COOLDOWNS: str = "BLOCKING=5,MISSING_INDEX=240,INDEX_FRAGMENTATION=1440"  # TYPE=minutes overrides
+    ALERT_DEDUP_MAX_ENTRIES: int = 5000
+    ALERT_INCIDENT_GAP_MINUTES: int = 10            # quiet gap that closes an incident
+    ALERT_MAX_INCIDENTS: int = 100
+
+    # Phase 7: Declarative Rules (hot-reloaded)
+    RULES_FILE_PATH: str = "anomaly_detection/rules.yaml"
+    RULES_RELOAD_CHECK_SECONDS: int = 10
+
     # Phase 4: Chat Agent System
     CHAT_MAX_CONTEXT_LENGTH: int = 16000
-    CHAT_MEMORY_WINDOW: int = 10
+    CHAT_MEMORY_WINDOW: int = 10                    # max messages kept per session
+    CHAT_MEMORY_MAX_TOKENS: int = 2000              # per-session history budget; oldest turns dropped first
+    CHAT_MAX_SESSIONS: int = 1000                   # LRU cap on sessions held in memory
+    CHAT_SESSION_IDLE_SECONDS: int = 3600           # sessions idle longer than this are dropped
+    CHAT_MEMORY_BACKEND: str = "memory"             # "memory", "json" (periodic snapshot) or "sqlite" (write-through)
+    CHAT_MEMORY_JSON_PATH: str = "data/chat_sessions.json"   # snapshot file for the json backend
+    CHAT_MEMORY_SQLITE_PATH: str = "data/chat_sessions.db"   # database file for the sqlite backend
+    CHAT_MEMORY_PERSIST_SECONDS: int = 60
     CHAT_MAX_RESULT_ROWS: int = 1000
     CHAT_ALLOWED_OPERATIONS: str = "SELECT"
     CHAT_ENABLE_DML: bool = False
+    SQL_VALIDATION_CACHE_SIZE: int = 1024           # memoized validator verdicts (exact SQL text)
     QUERY_TIMEOUT_SECONDS: int = 15
+    CHAT_POOL_SIZE: int = 4                         # sandbox connections per database
+    CHAT_POOL_ACQUIRE_TIMEOUT_SECONDS: float = 10.0
+    CHAT_POOL_MAX_IDLE_SECONDS: int = 300           # idle connections older than this are closed
+    CHAT_POOL_HEALTHCHECK_IDLE_SECONDS: int = 30    # ping connections idle longer than this before reuse
+    CHAT_LOCK_TIMEOUT_MS: int = 5000
+    CHAT_ISOLATION_LEVEL: str = "READ COMMITTED"    # or "READ UNCOMMITTED" / "SNAPSHOT" (needs ALLOW_SNAPSHOT_ISOLATION)
+    CHAT_READ_ONLY_INTENT: bool = True              # ApplicationIntent=ReadOnly (routes to AG readable secondaries)
+    CHAT_COST_GUARD_ENABLED: bool = True            # estimate plans (SHOWPLAN_XML) before running chat SQL
+    CHAT_COST_CONFIRM_THRESHOLD: float = 50.0       # estimated subtree cost that needs user confirmation
+    CHAT_COST_REJECT_THRESHOLD: float = 1000.0      # estimated subtree cost that is refused outright
+    CHAT_ROWS_CONFIRM_THRESHOLD: float = 5000000.0  # largest estimated intermediate row count before confirming
+    CHAT_COST_CONFIRM_TTL_SECONDS: int = 600        # how long a confirmation token stays redeemable
+    CHAT_COST_CACHE_MAX_ENTRIES: int = 256
+    CHAT_COST_CACHE_TTL_SECONDS: int = 600
+    CHAT_RESULT_CACHE_ENABLED: bool = True          # serve repeated chat SQL from memory
+    CHAT_RESULT_CACHE_TTL_SECONDS: int = 60
+    CHAT_RESULT_CACHE_MAX_BYTES: int = 67108864     # 64 MB across all cached results
+    CHAT_RESULT_CACHE_MAX_ENTRY_BYTES: int = 8388608  # larger results are not cached
+    CHAT_RESULT_CACHE_WATERMARKS: bool = False      # also drop entries once a referenced table is written (needs VIEW SERVER STATE)
+    CHAT_RESULT_PREVIEW_ROWS: int = 100             # rows inlined in ChatResponse; the rest is paged via /chat/results/{id}
+    CHAT_RESULT_STORE_MAX_ENTRIES: int = 200        # finished results kept for paging
+    CHAT_RESULT_STORE_TTL_SECONDS: int = 900
+    CHAT_PROFILE_TOP_K: int = 5                     # most frequent values listed per categorical column
+    CHAT_PROFILE_SAMPLE_ROWS: int = 6               # representative rows sent alongside the profile
+    CHAT_FAST_SYNTHESIS_ENABLED: bool = True        # explain empty/scalar/small top-N results without the LLM
+    CHAT_FAST_SYNTHESIS_MAX_ROWS: int = 10
+    SCHEMA_REVALIDATE_SECONDS: int = 30             # min gap between modify_date watermark checks
+    CHAT_SCHEMA_PRUNING_ENABLED: bool = True        # send only question-relevant tables to the LLM
+    CHAT_SCHEMA_TOP_TABLES: int = 6                 # best-matching tables before FK expansion
+    CHAT_SCHEMA_TOKEN_BUDGET: int = 3000            # approx. prompt tokens for the schema section
+    SQL_MEMORY_ENABLED: bool = True                 # reuse validated SQL for repeat questions
+    SQL_MEMORY_PATH: str = "data/sql_memory.json"   # relative to the backend root
+    SQL_MEMORY_MAX_ENTRIES: int = 500
+    SQL_MEMORY_PERSIST_SECONDS: int = 60
 
     # LLM (Groq)
     GROQ_API_KEY: str = ""
     GROQ_MODEL: str = "openai/gpt-oss-120b" # A suitable default 
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_CONCURRENCY: int = 4                    # in-flight LLM calls across all requests
+    LLM_MAX_RETRIES: int = 3                        # retries on 429/5xx/timeouts
+    LLM_BACKOFF_BASE_SECONDS: float = 0.5
+    LLM_BACKOFF_MAX_SECONDS: float = 8.0
+    LLM_MAX_CONNECTIONS: int = 10
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 512
+    LLM_CACHE_TTL_SECONDS: int = 3600
+    LLM_CACHE_DISK_PATH: str = ""                   # e.g. "data/llm_cache.sqlite3"; empty = memory only
+    LLM_CACHE_DISK_MAX_ENTRIES: int = 5000
     
     # API & Agent
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
     RECOMMENDATION_HISTORY_LIMIT: int = 50
+    RECOMMENDATION_REUSE_SECONDS: int = 1800        # reuse LLM advice for an unchanged anomaly set this long; 0 disables
+    ANALYSIS_JOB_WORKERS: int = 1                   # concurrent on-demand analyses
+    ANALYSIS_JOB_HISTORY: int = 100                 # finished jobs kept for status lookups
+    ANALYSIS_SNAPSHOT_MAX_AGE_SECONDS: int = 30     # reuse the poller's latest snapshot if younger than this
+    BLOCKING_POOL_MAX_WORKERS: int = 8              # threads for pyodbc/blocking work off the event loop
     ALLOWED_CORS_ORIGINS: str = "http://localhost:3000"
     
     # Logging
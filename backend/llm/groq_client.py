@@ -1,45 +1,213 @@
 import os
-from groq import Groq
+import asyncio
+import random
+import httpx
+from typing import AsyncIterator
+from groq import Groq, AsyncGroq, APIStatusError, APIConnectionError
+from llm.cache import llm_cache
 from config.settings import settings
 from utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
 class GroqLLMClient:
-    def __init__(self):
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
         # Default initialization; relies on GROQ_API_KEY being set in env or settings
         api_key = settings.GROQ_API_KEY or os.environ.get("GROQ_API_KEY")
-        if not api_key:
+        if not api_key and transport is None:
             logger.warning("GROQ_API_KEY is not set. LLM calls will fail.")
-        
-        self.client = Groq(api_key=api_key) if api_key else None
+
+        # A mock transport (httpx.MockTransport) lets the async path run offline
+        self._api_key = api_key or ("offline" if transport is not None else None)
+        self._transport = transport
+
+        self.client = Groq(
+            api_key=api_key,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES,
+        ) if api_key else None
         self.model = settings.GROQ_MODEL
 
+        # Built lazily so the pooled HTTP client binds to the running event loop
+        self._async_client: AsyncGroq | None = None
+        self._semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+
+    def _build_kwargs(self, system_prompt: str, user_prompt: str, response_format=None) -> dict:
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0.1,
+            "max_tokens": 2048
+        }
+        if response_format:
+            # To enforce JSON output on some models, pass {"type": "json_object"}
+            kwargs["response_format"] = response_format
+        return kwargs
+
+    def _cache_key(self, system_prompt: str, user_prompt: str, response_format=None) -> str | None:
+        if not settings.LLM_CACHE_ENABLED:
+            return None
+        return llm_cache.make_key(self.model, system_prompt, user_prompt, response_format)
+
     def get_completion(self, system_prompt: str, user_prompt: str, response_format=None) -> str | None:
+        cache_key = self._cache_key(system_prompt, user_prompt, response_format)
+        if cache_key:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("LLM cache hit.")
+                return cached
+
         if not self.client:
             logger.error("Cannot call Groq: client not initialized (missing API key).")
             return None
-            
-        try:
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-            
-            kwargs = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 0.1,
-                "max_tokens": 2048
-            }
-            if response_format:
-                # To enforce JSON output on some models, pass {"type": "json_object"}
-                kwargs["response_format"] = response_format
 
+        try:
+            kwargs = self._build_kwargs(system_prompt, user_prompt, response_format)
             chat_completion = self.client.chat.completions.create(**kwargs)
-            return chat_completion.choices[0].message.content
+            content = chat_completion.choices[0].message.content
         except Exception as e:
             logger.error(f"Groq API Error: {e}")
             return None
 
+        if cache_key and content:
+            llm_cache.put(cache_key, content)
+        return content
+
+    # ── Async path ──────────────────────────────────────────────
+    def _get_async_client(self) -> AsyncGroq | None:
+        if self._async_client is None and self._api_key:
+            http_client = httpx.AsyncClient(
+                transport=self._transport,
+                timeout=settings.LLM_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                ),
+            )
+            # Retries are handled here so backoff doesn't hold a concurrency slot
+            self._async_client = AsyncGroq(api_key=self._api_key, http_client=http_client, max_retries=0)
+        return self._async_client
+
+    def _backoff_seconds(self, attempt: int, retry_after: str | None = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), settings.LLM_BACKOFF_MAX_SECONDS)
+            except ValueError:
+                pass
+        delay = settings.LLM_BACKOFF_BASE_SECONDS * (2 ** attempt)
+        # Full jitter keeps concurrent retries from stampeding together
+        return random.uniform(0, min(delay, settings.LLM_BACKOFF_MAX_SECONDS))
+
+    async def aget_completion(self, system_prompt: str, user_prompt: str, response_format=None) -> str | None:
+        """Async completion with bounded concurrency, per-call timeout and jittered retries."""
+        cache_key = self._cache_key(system_prompt, user_prompt, response_format)
+        if cache_key:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("LLM cache hit.")
+                return cached
+
+        client = self._get_async_client()
+        if not client:
+            logger.error("Cannot call Groq: client not initialized (missing API key).")
+            return None
+
+        kwargs = self._build_kwargs(system_prompt, user_prompt, response_format)
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    chat_completion = await asyncio.wait_for(
+                        client.chat.completions.create(**kwargs),
+                        timeout=settings.LLM_TIMEOUT_SECONDS,
+                    )
+                content = chat_completion.choices[0].message.content
+                if cache_key and content:
+                    llm_cache.put(cache_key, content)
+                return content
+            except APIStatusError as e:
+                if e.status_code != 429 and e.status_code < 500:
+                    logger.error(f"Groq API Error: {e}")
+                    return None
+                retry_after = e.response.headers.get("retry-after")
+                logger.warning(f"Groq returned {e.status_code} (attempt {attempt + 1})")
+            except (asyncio.TimeoutError, APIConnectionError) as e:
+                logger.warning(f"Groq call timed out or lost connection (attempt {attempt + 1}): {e!r}")
+            except Exception as e:
+                logger.error(f"Groq API Error: {e}")
+                return None
+
+            if attempt < settings.LLM_MAX_RETRIES:
+                await asyncio.sleep(self._backoff_seconds(attempt, retry_after))
+
+        logger.error("Groq call failed after retries.")
+        return None
+
+    async def astream_completion(self, system_prompt: str, user_prompt: str, response_format=None) -> AsyncIterator[str]:
+        """Yield completion text deltas as they arrive.
+
+        Cache hits are replayed as a single chunk. Failures before the first
+        token are retried like aget_completion; a failure mid-stream ends it.
+        """
+        cache_key = self._cache_key(system_prompt, user_prompt, response_format)
+        if cache_key:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        client = self._get_async_client()
+        if not client:
+            logger.error("Cannot call Groq: client not initialized (missing API key).")
+            return
+
+        kwargs = self._build_kwargs(system_prompt, user_prompt, response_format)
+        kwargs["stream"] = True
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            retry_after = None
+            parts: list[str] = []
+            try:
+                async with self._semaphore:
+                    stream = await asyncio.wait_for(
+                        client.chat.completions.create(**kwargs),
+                        timeout=settings.LLM_TIMEOUT_SECONDS,
+                    )
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+                if cache_key and parts:
+                    llm_cache.put(cache_key, "".join(parts))
+                return
+            except APIStatusError as e:
+                if parts or (e.status_code != 429 and e.status_code < 500):
+                    logger.error(f"Groq API Error: {e}")
+                    return
+                retry_after = e.response.headers.get("retry-after")
+                logger.warning(f"Groq returned {e.status_code} (attempt {attempt + 1})")
+            except (asyncio.TimeoutError, APIConnectionError) as e:
+                if parts:
+                    logger.error(f"Groq stream interrupted: {e!r}")
+                    return
+                logger.warning(f"Groq call timed out or lost connection (attempt {attempt + 1}): {e!r}")
+            except Exception as e:
+                logger.error(f"Groq API Error: {e}")
+                return
+
+            if attempt < settings.LLM_MAX_RETRIES:
+                await asyncio.sleep(self._backoff_seconds(attempt, retry_after))
+
+        logger.error("Groq call failed after retries.")
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
 groq_client = GroqLLMClient()
@@ -0,0 +1,124 @@
+"""Prompt token budgeting.
+
+Counts tokens with a local regex tokenizer (close enough to BPE counts for
+budgeting, no network or model download) and fits prompt sections into a
+shared budget. Each section has a priority; higher-priority sections are
+funded first and the rest are compressed or truncated to what is left.
+"""
+import re
+from typing import Callable, Dict, List, Optional
+
+from config.settings import settings
+
+# Words, digit groups (BPE vocabularies split long numbers ~3 digits at a time)
+# and individual punctuation marks. Whitespace is folded into the next token.
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+# Average characters per sub-word token inside long identifiers
+_CHARS_PER_WORD_TOKEN = 5
+
+TRUNCATION_MARKER = "...(truncated)"
+
+# (text, max_tokens) -> text that fits
+Compressor = Callable[[str, int], str]
+
+
+def _word_cost(word: str) -> int:
+    if word[0].isalpha():
+        return max(1, (len(word) + _CHARS_PER_WORD_TOKEN - 1) // _CHARS_PER_WORD_TOKEN)
+    return 1
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return sum(_word_cost(m.group()) for m in _TOKEN_PATTERN.finditer(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = TRUNCATION_MARKER) -> str:
+    """Longest prefix of text within max_tokens (marker included)."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    limit = max_tokens - count_tokens(marker)
+    if limit <= 0:
+        # No room for the marker; cut silently
+        marker, limit = "", max_tokens
+    used = 0
+    end = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        used += _word_cost(match.group())
+        if used > limit:
+            break
+        end = match.end()
+    return text[:end] + marker
+
+
+def fit_items(items: List[str], max_tokens: int, separator: str = "\n") -> List[str]:
+    """Keep whole items from the front of the list while they fit."""
+    kept = []
+    used = 0
+    sep_cost = count_tokens(separator)
+    for item in items:
+        cost = count_tokens(item) + (sep_cost if kept else 0)
+        if used + cost > max_tokens:
+            break
+        kept.append(item)
+        used += cost
+    return kept
+
+
+class PromptSection:
+    """One budgeted part of a prompt.
+
+    priority: higher is funded first. min_tokens: reserved before any
+    priority is considered (capped at the section's real size).
+    compressor: how to shrink the text; defaults to prefix truncation.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        text: str,
+        priority: int = 0,
+        min_tokens: int = 0,
+        compressor: Optional[Compressor] = None,
+    ):
+        self.name = name
+        self.text = text or ""
+        self.priority = priority
+        self.min_tokens = min_tokens
+        self.compressor = compressor or truncate_to_tokens
+        self.tokens = count_tokens(self.text)
+
+
+class TokenBudget:
+    def __init__(self, max_tokens: int = settings.CHAT_MAX_CONTEXT_LENGTH, reserved: str = ""):
+        # `reserved` is the fixed prompt scaffolding the sections are inserted into
+        self.max_tokens = max_tokens
+        self.available = max(0, max_tokens - count_tokens(reserved))
+
+    def allocate(self, sections: List[PromptSection]) -> Dict[str, str]:
+        """Return section name -> text, with the total within the budget."""
+        if sum(s.tokens for s in sections) <= self.available:
+            return {s.name: s.text for s in sections}
+
+        grants = {s.name: min(s.tokens, s.min_tokens) for s in sections}
+        remaining = self.available - sum(grants.values())
+
+        for section in sorted(sections, key=lambda s: s.priority, reverse=True):
+            if remaining <= 0:
+                break
+            extra = min(section.tokens - grants[section.name], remaining)
+            grants[section.name] += extra
+            remaining -= extra
+
+        fitted = {}
+        for section in sections:
+            grant = grants[section.name]
+            if grant >= section.tokens:
+                fitted[section.name] = section.text
+            elif grant <= 0:
+                fitted[section.name] = ""
+            else:
+                fitted[section.name] = section.compressor(section.text, grant)
+        return fitted
@@ -0,0 +1,275 @@
+"""Seasonal (hour-of-week) baselines for fast-tier metrics.
+
+Each tracked series keeps one running mean/variance per hour-of-week
+bucket (Welford), so a nightly ETL burst is compared against previous
+nights instead of against the last few minutes. Samples from the current
+week are accumulated separately and only folded into the bucket once the
+week rolls over, so an ongoing incident can never become its own
+baseline. Profiles are sparse, built incrementally from every fast poll
+and persisted to disk so they survive restarts.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from metrics_engine.delta import compute_query_deltas
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+HOURS_PER_WEEK = 168
+# Cap on the effective sample count so old weeks slowly age out
+MAX_EFFECTIVE_SAMPLES = 2000
+# Monday 1970-01-05 00:00 UTC, so week numbers roll over with hour-of-week bucket 0
+_WEEK_EPOCH = datetime(1970, 1, 5, tzinfo=timezone.utc)
+
+# Bucket layout: settled stats from completed weeks, then the current week's accumulator
+_COUNT, _MEAN, _M2, _WEEKS, _WEEK, _P_COUNT, _P_MEAN, _P_M2 = range(8)
+
+
+def _utc(ts: datetime) -> datetime:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+def hour_of_week(ts: datetime) -> int:
+    """Bucket index 0..167 (Monday 00:00 UTC = 0)."""
+    ts = _utc(ts)
+    return ts.weekday() * 24 + ts.hour
+
+
+def week_number(ts: datetime) -> int:
+    """Weeks since the first Monday of the epoch (UTC)."""
+    return (_utc(ts) - _WEEK_EPOCH).days // 7
+
+
+class SeasonalProfile:
+    """Sparse hour-of-week profile: bucket -> [count, mean, m2, weeks, week, p_count, p_mean, p_m2].
+
+    count/mean/m2 cover completed weeks only (``weeks`` of them); the p_*
+    fields accumulate week number ``week`` until a later week arrives.
+    """
+
+    __slots__ = ("buckets",)
+
+    def __init__(self, buckets: Optional[Dict[int, list]] = None):
+        self.buckets: Dict[int, list] = buckets or {}
+
+    @staticmethod
+    def _roll(stats: list, week: int) -> bool:
+        """Fold the pending week into the settled stats once ``week`` is later. Returns True if folded."""
+        if stats[_WEEK] >= week or stats[_P_COUNT] == 0:
+            return False
+        nb, mb, m2b = stats[_P_COUNT], stats[_P_MEAN], stats[_P_M2]
+        na, ma, m2a = stats[_COUNT], stats[_MEAN], stats[_M2]
+        # Shrink older weeks so the newest one keeps its full weight under the cap
+        keep = max(min(na, MAX_EFFECTIVE_SAMPLES - nb), 0)
+        if keep < na:
+            m2a = m2a * (keep - 1) / (na - 1) if keep > 1 else 0.0
+            na = keep
+        n = na + nb
+        delta = mb - ma
+        stats[_COUNT] = n
+        stats[_MEAN] = ma + delta * nb / n
+        stats[_M2] = m2a + m2b + delta * delta * na * nb / n
+        stats[_WEEKS] += 1
+        stats[_P_COUNT], stats[_P_MEAN], stats[_P_M2] = 0, 0.0, 0.0
+        return True
+
+    def update(self, bucket: int, week: int, value: float) -> None:
+        stats = self.buckets.get(bucket)
+        if stats is None:
+            self.buckets[bucket] = [0, 0.0, 0.0, 0, week, 1, value, 0.0]
+            return
+        if week < stats[_WEEK]:
+            # Out-of-order sample from a week already folded away
+            return
+
+        self._roll(stats, week)
+        stats[_WEEK] = week
+        n = min(stats[_P_COUNT] + 1, MAX_EFFECTIVE_SAMPLES)
+        delta = value - stats[_P_MEAN]
+        mean = stats[_P_MEAN] + delta / n
+        stats[_P_M2] += delta * (value - mean)
+        if stats[_P_COUNT] + 1 > MAX_EFFECTIVE_SAMPLES:
+            # Keep variance consistent with the capped count
+            stats[_P_M2] *= (n - 1) / n
+        stats[_P_COUNT] = n
+        stats[_P_MEAN] = mean
+
+    def stats(self, bucket: int, week: int) -> Optional[tuple]:
+        """Return (count, mean, stddev, weeks) over weeks before ``week``, or None if there are none."""
+        stats = self.buckets.get(bucket)
+        if stats is None:
+            return None
+        self._roll(stats, week)
+        n, mean, m2, weeks = stats[_COUNT], stats[_MEAN], stats[_M2], stats[_WEEKS]
+        if n == 0:
+            return None
+        std = math.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+        return n, mean, std, weeks
+
+    def to_dict(self) -> Dict[str, list]:
+        return {
+            str(b): [s[_COUNT], round(s[_MEAN], 4), round(s[_M2], 4), s[_WEEKS], s[_WEEK],
+                     s[_P_COUNT], round(s[_P_MEAN], 4), round(s[_P_M2], 4)]
+            for b, s in self.buckets.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, list]) -> "SeasonalProfile":
+        return cls({
+            int(b): [int(s[0]), float(s[1]), float(s[2]), int(s[3]), int(s[4]), int(s[5]), float(s[6]), float(s[7])]
+            for b, s in data.items()
+        })
+
+
+class BaselineEngine:
+    """Maintains seasonal profiles per series and scores new observations.
+
+    Series keys are dotted, e.g. ``cpu.sql_cpu_percent``,
+    ``sessions.active_sessions``, ``waits.PAGEIOLATCH_SH`` (ms/sec) and
+    ``queries.<query_hash>`` (worker μs/sec).
+    """
+
+    def __init__(self, store_path: str = settings.BASELINE_STORE_PATH):
+        if not os.path.isabs(store_path):
+            # Relative paths resolve against the backend root, not the CWD
+            store_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), store_path)
+        self._store_path = store_path
+        self._profiles: "OrderedDict[str, SeasonalProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_persist = time.monotonic()
+        self._dirty = False
+
+    # ── Ingestion ───────────────────────────────────────────────
+    def observe(self, key: str, value: float, ts: datetime) -> None:
+        bucket = hour_of_week(ts)
+        week = week_number(ts)
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is None:
+                profile = SeasonalProfile()
+                self._profiles[key] = profile
+                # Evict the least recently updated series (stale query hashes)
+                while len(self._profiles) > settings.BASELINE_MAX_SERIES:
+                    self._profiles.popitem(last=False)
+            else:
+                self._profiles.move_to_end(key)
+            profile.update(bucket, week, float(value))
+            self._dirty = True
+
+    def observe_fast(self, cpu, sessions, waits, queries, previous_queries=None) -> None:
+        """Feed one fast-tier poll into the profiles."""
+        ts = cpu.timestamp
+        self.observe("cpu.sql_cpu_percent", cpu.sql_cpu_percent, ts)
+        self.observe("sessions.active_sessions", sessions.active_sessions, ts)
+        self.observe("sessions.blocked_sessions", sessions.blocked_sessions, ts)
+
+        # The first wait poll has no delta yet
+        if waits.elapsed_seconds > 0:
+            for w in waits.waits:
+                self.observe(f"waits.{w.wait_type}", w.wait_rate_ms_per_sec, waits.timestamp)
+
+        for query_hash, delta in compute_query_deltas(previous_queries, queries).items():
+            self.observe(f"queries.{query_hash}", delta["worker_per_sec"], queries.timestamp)
+
+        self.maybe_persist()
+
+    # ── Scoring ─────────────────────────────────────────────────
+    def score(self, key: str, value: float, ts: datetime) -> Optional[Dict[str, float]]:
+        """Z-score of ``value`` against the series' profile for this hour-of-week.
+
+        Only samples from earlier weeks count. Returns None until the bucket
+        spans BASELINE_MIN_WEEKS weeks and BASELINE_MIN_SAMPLES samples.
+        """
+        bucket = hour_of_week(ts)
+        with self._lock:
+            profile = self._profiles.get(key)
+            stats = profile.stats(bucket, week_number(ts)) if profile else None
+
+        if stats is None or stats[3] < settings.BASELINE_MIN_WEEKS or stats[0] < settings.BASELINE_MIN_SAMPLES:
+            return None
+
+        n, mean, std, weeks = stats
+        # Floor the deviation so near-constant series don't yield huge z-scores
+        std = max(std, 0.1 * abs(mean), 1.0)
+        return {
+            "zscore": round((value - mean) / std, 2),
+            "expected_mean": round(mean, 2),
+            "expected_stddev": round(std, 2),
+            "samples": n,
+            "weeks": weeks,
+            "hour_of_week": bucket,
+        }
+
+    def summary(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "series_count": len(self._profiles),
+                "bucket_count": sum(len(p.buckets) for p in self._profiles.values()),
+                "current_hour_of_week": hour_of_week(datetime.now(timezone.utc)),
+            }
+
+    # ── Persistence ─────────────────────────────────────────────
+    def maybe_persist(self) -> None:
+        if time.monotonic() - self._last_persist >= settings.BASELINE_PERSIST_SECONDS:
+            self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            self._last_persist = time.monotonic()
+            if not self._dirty:
+                return
+            payload = {
+                "version": 2,
+                "series": {k: p.to_dict() for k, p in self._profiles.items()},
+            }
+            self._dirty = False
+
+        try:
+            directory = os.path.dirname(self._store_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self._store_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, separators=(",", ":"))
+            os.replace(tmp_path, self._store_path)
+            logger.debug(f"Persisted {len(payload['series'])} baseline series.")
+        except OSError as e:
+            logger.error(f"Failed to persist baselines: {e}")
+
+    def load(self) -> None:
+        if not os.path.exists(self._store_path):
+            return
+        try:
+            with open(self._store_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            if payload.get("version") != 2:
+                # Version 1 mixed the current week into each bucket; rebuild rather than trust it
+                logger.info("Discarding seasonal baselines saved in an older format.")
+                return
+            profiles = OrderedDict(
+                (k, SeasonalProfile.from_dict(v)) for k, v in payload.get("series", {}).items()
+            )
+            with self._lock:
+                self._profiles = profiles
+            logger.info(f"Loaded {len(profiles)} seasonal baseline series.")
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            logger.error(f"Failed to load baselines, starting fresh: {e}")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+            self._dirty = True
+
+
+# Singleton
+baseline_engine = BaselineEngine()
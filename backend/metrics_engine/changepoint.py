@@ -0,0 +1,199 @@
+"""Online change-point detection (two-sided CUSUM) for fast-tier series.
+
+Each series holds a fixed handful of floats: a self-starting baseline
+(mean/variance learned during warm-up), the two CUSUM accumulators and
+the timestamps where each accumulator last left zero. That timestamp is
+the estimated change time, which is what lets a regression be tied to a
+deploy. After an alarm the baseline re-anchors on the new level.
+"""
+import math
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from models.metrics import ChangePointEvent
+from metrics_engine.delta import compute_query_deltas
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class CusumState:
+    """Bounded per-series CUSUM state."""
+
+    __slots__ = (
+        "n", "mean", "m2", "s_pos", "s_neg",
+        "pos_start", "neg_start", "pos_count", "neg_count",
+        "pos_sum", "neg_sum",
+    )
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._reset_accumulators()
+
+    def _reset_accumulators(self):
+        self.s_pos = 0.0
+        self.s_neg = 0.0
+        self.pos_start: Optional[datetime] = None
+        self.neg_start: Optional[datetime] = None
+        self.pos_count = 0
+        self.neg_count = 0
+        self.pos_sum = 0.0
+        self.neg_sum = 0.0
+
+    @property
+    def std(self) -> float:
+        std = math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+        # Floor so flat series (e.g. a constant wait rate) can still alarm sensibly
+        return max(std, 0.05 * abs(self.mean), 1e-6)
+
+    def _learn(self, value: float):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def update(self, value: float, ts: datetime) -> Optional[Dict[str, float]]:
+        """Feed one sample; return change details when an alarm fires."""
+        if self.n < settings.CHANGEPOINT_WARMUP_POINTS:
+            self._learn(value)
+            return None
+
+        sigma = self.std
+        k = settings.CHANGEPOINT_DRIFT_SIGMAS * sigma
+        h = settings.CHANGEPOINT_THRESHOLD_SIGMAS * sigma
+        z = value - self.mean
+
+        s_pos = max(0.0, self.s_pos + z - k)
+        s_neg = max(0.0, self.s_neg - z - k)
+
+        if s_pos > 0:
+            if self.s_pos == 0:
+                self.pos_start, self.pos_count, self.pos_sum = ts, 0, 0.0
+            self.pos_count += 1
+            self.pos_sum += value
+        if s_neg > 0:
+            if self.s_neg == 0:
+                self.neg_start, self.neg_count, self.neg_sum = ts, 0, 0.0
+            self.neg_count += 1
+            self.neg_sum += value
+
+        self.s_pos, self.s_neg = s_pos, s_neg
+
+        if s_pos > h or s_neg > h:
+            up = s_pos > h
+            count = self.pos_count if up else self.neg_count
+            shifted_mean = (self.pos_sum if up else self.neg_sum) / max(count, 1)
+            result = {
+                "direction": "up" if up else "down",
+                "change_time": self.pos_start if up else self.neg_start,
+                "polls_to_detect": count,
+                "baseline_mean": self.mean,
+                "shifted_mean": shifted_mean,
+                "magnitude_sigmas": (shifted_mean - self.mean) / sigma,
+            }
+            # Re-anchor on the new level so the series can detect the next shift
+            self.n = 1
+            self.mean = shifted_mean
+            self.m2 = 0.0
+            self._reset_accumulators()
+            return result
+
+        # Slowly track the in-control level while no shift is building
+        if s_pos == 0 and s_neg == 0:
+            self._learn(value)
+        return None
+
+
+class ChangePointEngine:
+    """Runs one CUSUM per series and keeps a bounded log of change events."""
+
+    def __init__(self):
+        self._series: "OrderedDict[str, CusumState]" = OrderedDict()
+        self._events: deque = deque(maxlen=settings.CHANGEPOINT_MAX_EVENTS)
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        series: str,
+        value: float,
+        ts: datetime,
+        kind: str,
+        resource: str,
+        sql_text: Optional[str] = None,
+    ) -> Optional[ChangePointEvent]:
+        with self._lock:
+            state = self._series.get(series)
+            if state is None:
+                state = CusumState()
+                self._series[series] = state
+                while len(self._series) > settings.CHANGEPOINT_MAX_SERIES:
+                    self._series.popitem(last=False)
+            else:
+                self._series.move_to_end(series)
+
+            change = state.update(float(value), ts)
+            if change is None:
+                return None
+
+            event = ChangePointEvent(
+                series=series,
+                kind=kind,
+                resource=resource,
+                detected_at=ts,
+                sql_text=sql_text,
+                direction=change["direction"],
+                change_time=change["change_time"] or ts,
+                polls_to_detect=change["polls_to_detect"],
+                baseline_mean=round(change["baseline_mean"], 2),
+                shifted_mean=round(change["shifted_mean"], 2),
+                magnitude_sigmas=round(change["magnitude_sigmas"], 2),
+            )
+            self._events.append(event)
+
+        logger.info(
+            f"Change point on {series}: {event.baseline_mean} -> {event.shifted_mean} "
+            f"(since {event.change_time.isoformat()})"
+        )
+        return event
+
+    def observe_fast(self, waits, queries, previous_queries=None) -> None:
+        """Feed wait rates and per-execution query durations from one fast poll."""
+        if waits.elapsed_seconds > 0:
+            for w in waits.waits:
+                self.observe(
+                    f"waits.{w.wait_type}", w.wait_rate_ms_per_sec, waits.timestamp,
+                    kind="wait_rate", resource=w.wait_type,
+                )
+
+        sql_texts = {q.query_hash: q.sql_text for q in queries.top_by_cpu + queries.top_by_duration}
+        for query_hash, delta in compute_query_deltas(previous_queries, queries).items():
+            # Polls without executions carry no duration information
+            if delta["executions"] <= 0:
+                continue
+            self.observe(
+                f"queries.{query_hash}", delta["elapsed_per_exec"], queries.timestamp,
+                kind="query_duration", resource=query_hash,
+                sql_text=(sql_texts.get(query_hash) or "")[:300],
+            )
+
+    def get_events(self, since_seconds: Optional[int] = None) -> List[ChangePointEvent]:
+        with self._lock:
+            events = list(self._events)
+        if since_seconds is None:
+            return events
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=since_seconds)
+        return [e for e in events if e.detected_at >= cutoff]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self._events.clear()
+
+
+# Singleton
+changepoint_engine = ChangePointEngine()
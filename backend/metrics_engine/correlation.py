@@ -0,0 +1,145 @@
+"""Cross-domain correlation of fast-tier series for root-cause ranking.
+
+The fast tier appends CPU, sessions, blocking, waits and queries in one
+locked step, so their rolling windows are index-aligned. Every series is
+z-normalised once per build; a lagged Pearson correlation is then a
+single dot product over the overlapping slice, which keeps ranking all
+candidates against an anomaly cheap.
+"""
+import math
+import operator
+from typing import Dict, List, Optional
+
+from models.db_models import Anomaly, AnomalyType
+from metrics_engine.delta import compute_query_deltas
+from config.settings import settings
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _normalize(values: List[float]) -> Optional[List[float]]:
+    """Z-normalise a series; None if it is flat (correlation undefined)."""
+    n = len(values)
+    mean = sum(values) / n
+    var = sum((v - mean) ** 2 for v in values) / n
+    if var <= 1e-12:
+        return None
+    inv_std = 1.0 / math.sqrt(var)
+    return [(v - mean) * inv_std for v in values]
+
+
+def lagged_correlation(leader: List[float], follower: List[float], lag: int) -> float:
+    """Correlation of ``leader[t]`` with ``follower[t + lag]`` on normalised series."""
+    n = len(follower) - lag
+    if n < 3:
+        return 0.0
+    return sum(map(operator.mul, leader[:n], follower[lag:])) / n
+
+
+class CorrelationEngine:
+    """Ranks likely contributors for anomalies from the MetricsEngine windows."""
+
+    def build_series(self, metrics_engine, window: int = settings.CORRELATION_WINDOW) -> Dict[str, List[float]]:
+        """Return aligned, z-normalised series keyed like ``waits.<type>``."""
+        # One extra poll so query deltas cover the whole window
+        cpu = metrics_engine.get_history("cpu", window + 1)
+        sessions = metrics_engine.get_history("sessions", window + 1)
+        blocking = metrics_engine.get_history("blocking", window + 1)
+        waits = metrics_engine.get_history("waits", window + 1)
+        queries = metrics_engine.get_history("queries", window + 1)
+
+        length = min(len(cpu), len(sessions), len(blocking), len(waits), len(queries))
+        if length < 4:
+            return {}
+        cpu, sessions, blocking, waits, queries = (
+            d[-length:] for d in (cpu, sessions, blocking, waits, queries)
+        )
+
+        # Index 0 only seeds the query deltas
+        points = range(1, length)
+        raw: Dict[str, List[float]] = {
+            "cpu.sql_cpu_percent": [cpu[i].sql_cpu_percent for i in points],
+            "sessions.active_sessions": [float(sessions[i].active_sessions) for i in points],
+            "sessions.blocked_sessions": [float(sessions[i].blocked_sessions) for i in points],
+            "blocking.chain_count": [float(len(blocking[i].chains)) for i in points],
+        }
+
+        wait_maps = [{w.wait_type: w.wait_time_delta_ms for w in waits[i].waits} for i in points]
+        query_maps = [
+            {h: d["worker_time"] for h, d in compute_query_deltas(queries[i - 1], queries[i]).items()}
+            for i in points
+        ]
+        for family, maps in (("waits", wait_maps), ("queries", query_maps)):
+            totals: Dict[str, float] = {}
+            for m in maps:
+                for key, value in m.items():
+                    totals[key] = totals.get(key, 0.0) + value
+            busiest = sorted(totals, key=totals.get, reverse=True)[:settings.CORRELATION_MAX_SERIES]
+            for key in busiest:
+                raw[f"{family}.{key}"] = [m.get(key, 0.0) for m in maps]
+
+        normalized = {}
+        for key, values in raw.items():
+            z = _normalize(values)
+            if z is not None:
+                normalized[key] = z
+        return normalized
+
+    def rank_contributors(self, target: str, series: Dict[str, List[float]]) -> List[Dict[str, float]]:
+        """Rank other series by their strongest lagged correlation with ``target``."""
+        target_values = series.get(target)
+        if target_values is None:
+            return []
+
+        ranked = []
+        for key, values in series.items():
+            if key == target:
+                continue
+            best_corr, best_lag = 0.0, 0
+            for lag in range(settings.CORRELATION_MAX_LAG + 1):
+                corr = lagged_correlation(values, target_values, lag)
+                if abs(corr) > abs(best_corr):
+                    best_corr, best_lag = corr, lag
+            if abs(best_corr) >= settings.CORRELATION_MIN_ABS:
+                ranked.append({"series": key, "correlation": round(best_corr, 3), "lag_polls": best_lag})
+
+        ranked.sort(key=lambda r: abs(r["correlation"]), reverse=True)
+        return ranked[:settings.CORRELATION_TOP_K]
+
+    def _target_for(self, anomaly: Anomaly) -> Optional[str]:
+        ctx = anomaly.context_data
+        if anomaly.type == AnomalyType.HIGH_WAITS and ctx.get("wait_type"):
+            return f"waits.{ctx['wait_type']}"
+        if anomaly.type in (AnomalyType.HIGH_CPU, AnomalyType.PREDICTED_REGRESSION):
+            if ctx.get("query_hash"):
+                return f"queries.{ctx['query_hash']}"
+            if ctx.get("kind") == "query_duration" and ctx.get("resource"):
+                return f"queries.{ctx['resource']}"
+            return "cpu.sql_cpu_percent"
+        if anomaly.type == AnomalyType.BLOCKING:
+            return "blocking.chain_count"
+        return None
+
+    def attach_contributors(self, anomalies: List[Anomaly]) -> List[Anomaly]:
+        """Add ``likely_contributors`` to each anomaly's context_data in place."""
+        if not anomalies:
+            return anomalies
+        try:
+            from metrics_engine.engine import metrics_engine
+            series = self.build_series(metrics_engine)
+        except Exception as e:
+            logger.error(f"Correlation build failed: {e}")
+            return anomalies
+
+        for anomaly in anomalies:
+            target = self._target_for(anomaly)
+            if target is None:
+                continue
+            contributors = self.rank_contributors(target, series)
+            if contributors:
+                anomaly.context_data["likely_contributors"] = contributors
+        return anomalies
+
+
+correlation_engine = CorrelationEngine()
@@ -48,5 +48,44 @@ class DeltaTracker:
         self._previous_timestamp = None
 
 
+def compute_query_deltas(previous, current) -> Dict[str, Dict[str, float]]:
+    """Per-query deltas between two consecutive QuerySnapshots.
+
+    Only queries present in both snapshots yield a delta. Returns a map of
+    query_hash -> {worker_time, elapsed_time, executions, elapsed_per_exec,
+    worker_per_sec} where times are in μs, matching the DMV counters.
+    """
+    if previous is None or current is None:
+        return {}
+
+    elapsed = (current.timestamp - previous.timestamp).total_seconds()
+    if elapsed <= 0:
+        return {}
+
+    prev_map = {}
+    for q in previous.top_by_cpu + previous.top_by_duration:
+        prev_map[q.query_hash] = q
+
+    deltas: Dict[str, Dict[str, float]] = {}
+    for q in current.top_by_cpu + current.top_by_duration:
+        if q.query_hash in deltas or q.query_hash not in prev_map:
+            continue
+        prev = prev_map[q.query_hash]
+        executions = q.execution_count - prev.execution_count
+        worker = q.total_worker_time - prev.total_worker_time
+        elapsed_time = q.total_elapsed_time - prev.total_elapsed_time
+        # Plan eviction resets the counters; skip rather than report garbage
+        if executions < 0 or worker < 0 or elapsed_time < 0:
+            continue
+        deltas[q.query_hash] = {
+            "worker_time": float(worker),
+            "elapsed_time": float(elapsed_time),
+            "executions": float(executions),
+            "elapsed_per_exec": elapsed_time / executions if executions > 0 else 0.0,
+            "worker_per_sec": worker / elapsed,
+        }
+    return deltas
+
+
 # Singleton used across collectors
 delta_tracker = DeltaTracker()
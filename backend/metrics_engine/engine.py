@@ -14,6 +14,8 @@ from collectors.indexes import collect_indexes
 from collectors.query_store import collect_query_store
 from collectors.databases import collect_databases
 from collectors.configuration import collect_configuration
+from metrics_engine.baseline import baseline_engine
+from metrics_engine.changepoint import changepoint_engine
 from config.settings import settings
 from utils.logger import setup_logger
 
@@ -87,6 +89,7 @@ class MetricsEngine:
                 queries = collect_queries()
 
                 with self._lock:
+                    previous_queries = self._current.get("queries")
                     self._current["cpu"] = cpu
                     self._current["sessions"] = sessions
                     self._current["blocking"] = blocking
@@ -99,6 +102,9 @@ class MetricsEngine:
                     self._history["waits"].append(waits)
                     self._history["queries"].append(queries)
 
+                baseline_engine.observe_fast(cpu, sessions, waits, queries, previous_queries)
+                changepoint_engine.observe_fast(waits, queries, previous_queries)
+
             except Exception as e:
                 logger.error(f"Fast poll error: {e}")
 
@@ -12,11 +12,13 @@ class AgentState(TypedDict):
     # Processing
     detected_anomalies: List[Anomaly]
     historical_anomalies: List[Anomaly]
+    anomaly_signature: str
     
     # Outputs
     llm_prompt: str
     llm_analysis: str
     current_recommendation: Optional[Recommendation]
+    recommendation_reused: bool
     
     # Internal Control
     should_alert: bool
@@ -15,6 +15,10 @@ class Recommendation(BaseModel):
     risk_level: str
     confidence_score: float = 0.0
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    anomaly_signature: Optional[str] = None     # anomaly set this advice was generated for
+    reused: bool = False                        # served from an earlier LLM answer for the same signature
+    first_seen: Optional[datetime] = None       # when the LLM produced the original advice
+    context_summary: Optional[str] = None       # current snapshot context on reuse
 
 class TriggerAnalysisResponse(BaseModel):
     status: str
@@ -22,15 +26,34 @@ class TriggerAnalysisResponse(BaseModel):
     anomalies_detected: int
     recommendations: Optional[Recommendation] = None
 
+class AnalysisJob(BaseModel):
+    job_id: str
+    status: str = "queued"          # queued | running | succeeded | failed
+    submitted_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    coalesced: int = 0              # duplicate submissions folded into this job
+    result: Optional[TriggerAnalysisResponse] = None
+    error: Optional[str] = None
+
 class ChatRequest(BaseModel):
     user_message: str
     session_id: str = "default_session"
+    confirmation_token: Optional[str] = None    # from a requires_confirmation response; runs that exact statement anyway
+    request_id: Optional[str] = None    # client-chosen id usable with DELETE /chat/query/{id}; generated if absent
 
 class ChatResponse(BaseModel):
     generated_sql: Optional[str] = None
     explanation: str
     confidence: float = 0.0
     execution_time_ms: float = 0.0
-    query_results_preview: List[Dict[str, Any]] = []
+    query_results_preview: List[Dict[str, Any]] = []    # first CHAT_RESULT_PREVIEW_ROWS rows
+    result_id: Optional[str] = None                     # page the full result via GET /chat/results/{id}
+    columns: List[str] = []
+    row_count: int = 0
     error_message: Optional[str] = None
     suggested_chart_type: Optional[str] = None
+    requires_confirmation: bool = False
+    estimated_cost: Optional[float] = None
+    confirmation_token: Optional[str] = None    # echo back in ChatRequest to confirm
+    request_id: Optional[str] = None
@@ -1,7 +1,10 @@
 from typing import TypedDict, List, Dict, Any
+from datetime import datetime
+from pydantic import BaseModel, Field
 
 class ChatAgentState(TypedDict):
     session_id: str
+    request_id: str         # tracks the in-flight query for cancellation
     user_message: str
     
     # Introspection Pipeline
@@ -9,13 +12,23 @@ class ChatAgentState(TypedDict):
     
     # LLM Code Gen Pipeline
     generated_sql: str
+    original_sql: str       # generated_sql before the row limiter rewrote it
+    sql_from_memory: bool   # generated_sql was recalled from NL→SQL memory, not the LLM
+    sql_confirmed: bool     # generated_sql is the statement held under confirmation_token
     
     # Validation
     is_valid_sql: bool
     validation_error: str
+
+    # Cost Guard
+    confirmation_token: str         # token from an earlier requires_confirmation response
+    requires_confirmation: bool
+    issued_confirmation_token: str  # token to send back to run this exact statement anyway
+    cost_estimate: Dict[str, Any]
     
     # Execution
-    query_results_preview: List[Dict[str, Any]]
+    query_result: Any       # chat_agent.result_set.ColumnarResult; None until rows come back
+    result_id: str          # result_store handle for paging via /chat/results/{id}
     execution_time_ms: float
     execution_error: str
     
@@ -26,3 +39,49 @@ class ChatAgentState(TypedDict):
     
     # Conversation Context
     chat_history: List[Dict[str, str]]
+
+
+# ──────────────────────────────────────────────
+# Schema Metadata (per-database introspection cache)
+# ──────────────────────────────────────────────
+
+class ColumnMetadata(BaseModel):
+    name: str
+    data_type: str
+    is_nullable: bool = True
+
+class ForeignKeyMetadata(BaseModel):
+    column: str
+    ref_table: str      # schema-qualified, e.g. "Sales.Customer"
+    ref_column: str
+
+class TableMetadata(BaseModel):
+    object_id: int
+    schema_name: str
+    table_name: str
+    modify_date: datetime
+    columns: List[ColumnMetadata] = Field(default_factory=list)
+    foreign_keys: List[ForeignKeyMetadata] = Field(default_factory=list)
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.schema_name}.{self.table_name}"
+
+class DatabaseSchema(BaseModel):
+    database: str
+    tables: Dict[int, TableMetadata] = Field(default_factory=dict)  # keyed by object_id
+    checked_at: float = 0.0     # time.monotonic() of the last watermark check
+    version: int = 0            # bumped whenever any table changes
+    loaded: bool = False        # a watermark check has succeeded at least once
+
+
+# ──────────────────────────────────────────────
+# Cost Guard (estimated plan)
+# ──────────────────────────────────────────────
+
+class PlanEstimate(BaseModel):
+    estimated_cost: float = 0.0         # sum of StatementSubTreeCost
+    estimated_rows: float = 0.0         # rows returned by the statement(s)
+    max_operator_rows: float = 0.0      # largest intermediate (e.g. a Cartesian join)
+    statement_count: int = 0
+    warnings: List[str] = Field(default_factory=list)
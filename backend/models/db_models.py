@@ -27,6 +27,15 @@ class Anomaly(BaseModel):
     context_data: Dict[str, Any]
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class Incident(BaseModel):
+    id: str
+    opened_at: datetime
+    last_seen: datetime
+    anomaly_types: List[str] = []
+    fingerprints: List[str] = []
+    alert_count: int = 0
+    suppressed_count: int = 0
+
 class BlockingSession(BaseModel):
     session_id: int
     blocking_session_id: int
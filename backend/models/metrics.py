@@ -210,3 +210,18 @@ class ConfigSnapshot(BaseModel):
     settings: List[ConfigSetting] = []
     trace_flags: List[int] = []
     tempdb_file_count: int = 0
+
+
+# ── Section 10: Change-Point Events ─────────────────────────────
+class ChangePointEvent(BaseModel):
+    series: str
+    kind: str  # "query_duration" or "wait_rate"
+    resource: str
+    direction: str = "up"
+    detected_at: datetime
+    change_time: datetime
+    polls_to_detect: int = 0
+    baseline_mean: float = 0.0
+    shifted_mean: float = 0.0
+    magnitude_sigmas: float = 0.0
+    sql_text: Optional[str] = None
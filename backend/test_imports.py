@@ -15,7 +15,7 @@ from anomaly_detection.rules import AnomalyRules
 from anomaly_detection.detector import detector
 from llm.groq_client import groq_client
 from agent.persona import DBA_SYSTEM_PROMPT
-from agent.memory import anomaly_memory
+from agent.memory import alert_deduplicator
 from agent.graph import dba_agent
 from api.routes import router
 from api.main import app
@@ -0,0 +1,134 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from chat_agent.cost_guard import ALLOW, CONFIRM, REJECT, CostGuard, decide, estimate_with_cursor, parse_showplan
+from config.settings import settings
+from models.chat_models import PlanEstimate
+
+SHOWPLAN = """<?xml version="1.0" encoding="utf-16"?>
+<ShowPlanXML xmlns="http://schemas.microsoft.com/sqlserver/2004/07/showplan" Version="1.564">
+  <BatchSequence><Batch><Statements>
+    <StmtSimple StatementText="SELECT ..." StatementType="SELECT" StatementSubTreeCost="{cost}" StatementEstRows="{rows}">
+      <QueryPlan>
+        <Warnings NoJoinPredicate="true" />
+        <RelOp NodeId="0" PhysicalOp="Nested Loops" EstimateRows="{rows}">
+          <RelOp NodeId="1" PhysicalOp="Clustered Index Scan" EstimateRows="{inner_rows}" />
+        </RelOp>
+      </QueryPlan>
+    </StmtSimple>
+  </Statements></Batch></BatchSequence>
+</ShowPlanXML>"""
+
+
+def showplan(cost=12.5, rows=100.0, inner_rows=250000.0):
+    return SHOWPLAN.format(cost=cost, rows=rows, inner_rows=inner_rows)
+
+
+class FakeCursor:
+    """Returns one canned ShowPlanXML result set per plan for any statement run while SHOWPLAN is on."""
+
+    def __init__(self, plans, fail=False):
+        self.plans = list(plans)
+        self.fail = fail
+        self.executed = []
+        self._pending = []
+
+    def execute(self, sql):
+        self.executed.append(sql)
+        if sql.startswith("SET SHOWPLAN_XML"):
+            return
+        if self.fail:
+            raise RuntimeError("Invalid object name 'dbo.Missing'.")
+        self._pending = [[(plan,)] for plan in self.plans]
+
+    def fetchall(self):
+        return self._pending.pop(0) if self._pending else []
+
+    def nextset(self):
+        return bool(self._pending)
+
+
+def test_parse_showplan_reads_cost_rows_and_warnings():
+    estimate = parse_showplan(showplan(cost=12.5, rows=100, inner_rows=250000))
+    assert estimate.statement_count == 1
+    assert estimate.estimated_cost == pytest.approx(12.5)
+    assert estimate.estimated_rows == pytest.approx(100)
+    assert estimate.max_operator_rows == pytest.approx(250000)
+    assert estimate.warnings == ["NoJoinPredicate"]
+
+
+def test_estimate_with_cursor_sums_result_sets_and_resets_showplan():
+    cursor = FakeCursor([showplan(cost=10), showplan(cost=5)])
+    estimate = estimate_with_cursor(cursor, "SELECT 1; SELECT 2")
+    assert estimate.statement_count == 2
+    assert estimate.estimated_cost == pytest.approx(15)
+    assert cursor.executed == ["SET SHOWPLAN_XML ON", "SELECT 1; SELECT 2", "SET SHOWPLAN_XML OFF"]
+
+
+def test_estimate_with_cursor_resets_showplan_on_error():
+    cursor = FakeCursor([], fail=True)
+    with pytest.raises(RuntimeError):
+        estimate_with_cursor(cursor, "SELECT * FROM dbo.Missing")
+    assert cursor.executed[-1] == "SET SHOWPLAN_XML OFF"
+
+
+def test_decide_thresholds():
+    cheap = PlanEstimate(estimated_cost=1.0)
+    expensive = PlanEstimate(estimated_cost=settings.CHAT_COST_CONFIRM_THRESHOLD)
+    huge = PlanEstimate(estimated_cost=settings.CHAT_COST_REJECT_THRESHOLD)
+    cartesian = PlanEstimate(estimated_cost=1.0, warnings=["NoJoinPredicate"])
+
+    assert decide(cheap)[0] == ALLOW
+    assert decide(expensive)[0] == CONFIRM
+    assert decide(cartesian)[0] == CONFIRM
+    assert decide(expensive, confirmed=True)[0] == ALLOW
+    assert decide(huge, confirmed=True)[0] == REJECT
+
+
+def test_confirmation_token_is_bound_to_the_statement():
+    guard = CostGuard()
+    estimates = {
+        "SELECT A FROM T": parse_showplan(showplan(cost=settings.CHAT_COST_CONFIRM_THRESHOLD + 1)),
+        "SELECT A, B FROM T CROSS JOIN U": parse_showplan(showplan(cost=settings.CHAT_COST_CONFIRM_THRESHOLD + 1)),
+    }
+    guard.estimate = lambda sql, database=None: estimates[" ".join(sql.upper().split())]
+
+    verdict, _, _, token = guard.check("SELECT a FROM t", database="db")
+    assert verdict == CONFIRM and token
+
+    # A regenerated, different statement can't ride on the token
+    verdict, _, _, other = guard.check("SELECT a, b FROM t CROSS JOIN u", token, database="db")
+    assert verdict == CONFIRM and other != token
+    # Nor can the same statement against another database
+    assert guard.check("select a from t", token, database="other")[0] == CONFIRM
+
+    # The confirmed statement runs once (normalization ignores case/whitespace)
+    assert guard.check("select  a\nfrom t", token, database="db")[0] == ALLOW
+    assert guard.check("SELECT a FROM t", token, database="db")[0] == CONFIRM
+
+
+def test_confirmation_token_rejects_a_costlier_estimate():
+    guard = CostGuard()
+    estimate = parse_showplan(showplan(cost=settings.CHAT_COST_CONFIRM_THRESHOLD + 1))
+    guard.estimate = lambda sql, database=None: estimate
+
+    _, _, _, token = guard.check("SELECT a FROM t", database="db")
+    estimate = parse_showplan(showplan(cost=settings.CHAT_COST_CONFIRM_THRESHOLD * 4))
+    assert guard.check("SELECT a FROM t", token, database="db")[0] == CONFIRM
+
+
+def test_pending_statement_returns_the_sql_held_under_the_token():
+    guard = CostGuard()
+    estimate = parse_showplan(showplan(cost=settings.CHAT_COST_CONFIRM_THRESHOLD + 1))
+    guard.estimate = lambda sql, database=None: estimate
+
+    _, _, _, token = guard.check("SELECT TOP (500) a FROM t", database="db", original_sql="SELECT a FROM t")
+    assert guard.pending_statement(token, "other") is None
+    assert guard.pending_statement("unknown", "db") is None
+    # Peeking doesn't consume the token; running the held statement does
+    assert guard.pending_statement(token, "DB") == "SELECT a FROM t"
+    assert guard.check("SELECT TOP (500) a FROM t", token, database="db")[0] == ALLOW
+    assert guard.pending_statement(token, "db") is None
@@ -0,0 +1,105 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+from contextlib import aclosing
+
+import httpx
+
+import chat_agent.synthesizer as synthesizer
+from api.chat_routes import _ClosingStreamingResponse
+from config.settings import settings
+from llm.groq_client import GroqLLMClient
+
+
+def completion_chunks(deltas):
+    events = []
+    for delta in deltas:
+        chunk = {
+            "id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": "test",
+            "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+        }
+        events.append(f"data: {json.dumps(chunk)}\n\n")
+    events.append("data: [DONE]\n\n")
+    return "".join(events).encode()
+
+
+def offline_client():
+    body = completion_chunks(['{"explanation": "', "Sales ", "rose ", "in ", "May", '"}'])
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body)
+    )
+    return GroqLLMClient(transport=transport)
+
+
+def llm_state():
+    return {"user_message": "why did sales change", "generated_sql": "SELECT 1", "is_valid_sql": True}
+
+
+def test_closing_the_synthesis_stream_releases_the_llm_slot(monkeypatch):
+    client = offline_client()
+    monkeypatch.setattr(synthesizer, "groq_client", client)
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+
+    async def run():
+        client._semaphore = asyncio.Semaphore(1)
+        events = synthesizer.result_synthesizer.astream(llm_state())
+        assert await events.__anext__() == ("token", "Sales ")
+        assert client._semaphore.locked()
+        await events.aclose()
+        assert not client._semaphore.locked()
+
+    asyncio.run(run())
+
+
+def test_cancelled_sse_response_releases_the_llm_slot(monkeypatch):
+    client = offline_client()
+    monkeypatch.setattr(synthesizer, "groq_client", client)
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+
+    async def body():
+        # Same shape as stream_chat_events' synthesis loop
+        async with aclosing(synthesizer.result_synthesizer.astream(llm_state())) as events:
+            async for kind, payload in events:
+                yield f"event: {kind}\n\n"
+
+    async def run():
+        client._semaphore = asyncio.Semaphore(1)
+        first_chunk_sent = asyncio.Event()
+
+        async def send(message):
+            if message.get("body"):
+                first_chunk_sent.set()
+                await asyncio.Event().wait()    # a client that stopped reading
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        response = _ClosingStreamingResponse(body(), media_type="text/event-stream")
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        task = asyncio.create_task(response(scope, receive, send))
+        await first_chunk_sent.wait()
+        assert client._semaphore.locked()
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        assert not client._semaphore.locked()
+
+    asyncio.run(run())
+
+
+def test_field_streamer_decodes_escapes_split_across_chunks():
+    streamer = synthesizer._JsonStringFieldStreamer("explanation")
+    chunks = ['{"explanation": "caf', "\\u00", "e9 \\", 'n\\"ok\\"', '", "confidence": 1}']
+    assert "".join(streamer.feed(chunk) for chunk in chunks) == 'café \n"ok"'
+
+
+def test_field_streamer_passes_malformed_unicode_escapes_through():
+    streamer = synthesizer._JsonStringFieldStreamer("explanation")
+    text = streamer.feed('{"explanation": "bad \\uZZ12 and \\u+041 end"}')
+    assert text == "bad \\uZZ12 and \\u+041 end"
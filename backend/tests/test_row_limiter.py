@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_agent.row_limiter import RowLimiter
+
+limiter = RowLimiter(max_rows=1000)
+
+
+def test_plain_select_gets_top():
+    sql, notes = limiter.limit("SELECT name FROM sys.tables")
+    assert sql == "SELECT TOP (1000) name FROM sys.tables"
+    assert notes
+
+
+def test_compound_with_unnamed_columns_is_capped_without_a_derived_table():
+    sql, _ = limiter.limit(
+        "SELECT 'Customers', COUNT(*) FROM Sales.Customer "
+        "UNION ALL SELECT 'Products', COUNT(*) FROM Production.Product"
+    )
+    assert sql == (
+        "SELECT 'Customers', COUNT(*) FROM Sales.Customer "
+        "UNION ALL SELECT 'Products', COUNT(*) FROM Production.Product "
+        "ORDER BY (SELECT NULL) OFFSET 0 ROWS FETCH NEXT 1000 ROWS ONLY"
+    )
+
+
+def test_compound_cap_goes_before_option_clause():
+    sql, _ = limiter.limit("SELECT a FROM t EXCEPT SELECT a FROM u OPTION (RECOMPILE);")
+    assert sql == (
+        "SELECT a FROM t EXCEPT SELECT a FROM u "
+        "ORDER BY (SELECT NULL) OFFSET 0 ROWS FETCH NEXT 1000 ROWS ONLY OPTION (RECOMPILE);"
+    )
+
+
+def test_compound_with_order_by_keeps_branches_untouched():
+    sql, _ = limiter.limit("SELECT name FROM a UNION SELECT name FROM b ORDER BY name")
+    assert sql == "SELECT name FROM a UNION SELECT name FROM b ORDER BY name OFFSET 0 ROWS FETCH NEXT 1000 ROWS ONLY"
+
+
+def test_parenthesised_branches_are_capped():
+    sql, _ = limiter.limit("(SELECT a FROM t) UNION (SELECT b FROM u)")
+    assert sql == "(SELECT a FROM t) UNION (SELECT b FROM u) ORDER BY (SELECT NULL) OFFSET 0 ROWS FETCH NEXT 1000 ROWS ONLY"
+
+    sql, _ = limiter.limit("(SELECT a FROM t) UNION (SELECT b FROM u) ORDER BY 1")
+    assert sql == "(SELECT a FROM t) UNION (SELECT b FROM u) ORDER BY 1 OFFSET 0 ROWS FETCH NEXT 1000 ROWS ONLY"
+
+
+def test_set_operator_inside_subquery_is_not_a_compound():
+    sql, _ = limiter.limit("SELECT a FROM t WHERE a IN (SELECT a FROM u UNION SELECT a FROM v)")
+    assert sql == "SELECT TOP (1000) a FROM t WHERE a IN (SELECT a FROM u UNION SELECT a FROM v)"
@@ -0,0 +1,16 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_agent.sql_utils import normalize_sql
+
+
+def test_normalize_sql_collapses_whitespace_between_tokens():
+    assert normalize_sql("select  a,\n\tb -- note\nfrom t ;") == normalize_sql("SELECT a, b FROM t")
+
+
+def test_normalize_sql_keeps_whitespace_inside_literals_and_identifiers():
+    assert normalize_sql("SELECT * FROM t WHERE name = 'x  y'") != normalize_sql("SELECT * FROM t WHERE name = 'x y'")
+    assert normalize_sql("SELECT [first  name] FROM t") != normalize_sql("SELECT [first name] FROM t")
+    assert normalize_sql('SELECT "a\tb" FROM t') == 'SELECT "a\tb" FROM t'
+    assert normalize_sql("SELECT N'it''s  here'   FROM t") == "SELECT N'it''s  here' FROM t"
@@ -0,0 +1,33 @@
+"""Bounded worker pool for blocking calls made from async handlers.
+
+pyodbc has no async API, so graph nodes and routes hand their database
+work to this pool instead of running it on uvicorn's event loop. The pool
+is capped so a burst of chat users can't open unbounded connections.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from config.settings import settings
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.BLOCKING_POOL_MAX_WORKERS,
+    thread_name_prefix="blocking",
+)
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run ``func(*args, **kwargs)`` on the bounded pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def get_executor() -> ThreadPoolExecutor:
+    return _executor
+
+
+def shutdown_blocking_pool() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
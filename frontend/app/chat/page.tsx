@@ -12,6 +12,7 @@ export default function ChatPage() {
     const [messages, setMessages] = useState<ChatMessage[]>([]);
     const [input, setInput] = useState("");
     const [isLoading, setIsLoading] = useState(false);
+    const [loadingRowsFor, setLoadingRowsFor] = useState<string | null>(null);
 
     // Auto-scroll anchor
     const messagesEndRef = useRef<HTMLDivElement>(null);
@@ -31,10 +32,14 @@ export default function ChatPage() {
 
         setMessages((prev) => [...prev, userMsg]);
         setInput("");
+        await askAgent(userMsg.content);
+    };
+
+    const askAgent = async (question: string, confirmationToken?: string) => {
         setIsLoading(true);
 
         try {
-            const aiResponse = await chatApi.sendMessage(userMsg.content);
+            const aiResponse = await chatApi.sendMessage(question, undefined, confirmationToken);
 
             const aiMsg: ChatMessage = {
                 id: (Date.now() + 1).toString(),
@@ -43,6 +48,13 @@ export default function ChatPage() {
                 sql_executed: aiResponse.generated_sql,
                 execution_time_ms: aiResponse.execution_time_ms,
                 results_preview: aiResponse.query_results_preview,
+                result_id: aiResponse.result_id,
+                row_count: aiResponse.row_count,
+                columns: aiResponse.columns,
+                question,
+                requires_confirmation: aiResponse.requires_confirmation,
+                estimated_cost: aiResponse.estimated_cost,
+                confirmation_token: aiResponse.confirmation_token,
                 error: aiResponse.error_message, // E.g. DDL block
                 chart_type: aiResponse.suggested_chart_type
             };
@@ -58,6 +70,34 @@ export default function ChatPage() {
         }
     };
 
+    // Tokens are single-use, so the button goes away once the held statement is sent
+    const handleConfirm = async (msg: ChatMessage) => {
+        if (!msg.question || !msg.confirmation_token || isLoading) return;
+        setMessages((prev) => prev.map((m) => (m.id === msg.id ? { ...m, confirmation_token: undefined } : m)));
+        await askAgent(msg.question, msg.confirmation_token);
+    };
+
+    // The response inlines only the first rows; the rest is paged from /chat/results/{id}
+    const handleLoadMoreRows = async (msg: ChatMessage) => {
+        if (!msg.result_id || loadingRowsFor) return;
+        setLoadingRowsFor(msg.id);
+        try {
+            const page = await chatApi.getResultPage(msg.result_id, msg.results_preview?.length ?? 0);
+            const rows = Array.from({ length: page.row_count }, (_, i) =>
+                Object.fromEntries(page.columns.map((col, c) => [col, page.data[c][i]]))
+            );
+            setMessages((prev) => prev.map((m) =>
+                m.id === msg.id ? { ...m, results_preview: [...(m.results_preview ?? []), ...rows], row_count: page.total_rows } : m
+            ));
+        } catch (error: any) {
+            setMessages((prev) => prev.map((m) =>
+                m.id === msg.id ? { ...m, results_error: error.message || "Failed to load more rows." } : m
+            ));
+        } finally {
+            setLoadingRowsFor(null);
+        }
+    };
+
     const handleClear = async () => {
         setMessages([]);
         await chatApi.clearHistory();
@@ -132,6 +172,26 @@ export default function ChatPage() {
                                 </div>
                             )}
 
+                            {/* Expensive query held by the cost guard until the user confirms it */}
+                            {msg.role === "assistant" && msg.requires_confirmation && msg.confirmation_token && (
+                                <div className="mb-4 bg-amber-950/30 border border-amber-900/50 p-4 rounded text-amber-400 flex items-center justify-between gap-3">
+                                    <div className="flex items-start gap-3">
+                                        <AlertTriangle className="w-5 h-5 flex-shrink-0 mt-0.5" />
+                                        <p className="text-sm leading-relaxed">
+                                            This query looks expensive
+                                            {msg.estimated_cost !== undefined && msg.estimated_cost !== null ? ` (estimated cost ${msg.estimated_cost.toFixed(1)})` : ""}.
+                                        </p>
+                                    </div>
+                                    <button
+                                        onClick={() => handleConfirm(msg)}
+                                        disabled={isLoading}
+                                        className="flex-shrink-0 px-3 py-1.5 text-xs font-medium bg-amber-600 hover:bg-amber-500 text-white rounded disabled:opacity-50"
+                                    >
+                                        Run anyway
+                                    </button>
+                                </div>
+                            )}
+
                             {/* Core Text Content */}
                             {msg.content && (
                                 <div className="prose prose-invert max-w-none text-[15px] leading-relaxed">
@@ -145,7 +205,7 @@ export default function ChatPage() {
                                     <table className="w-full text-left text-sm whitespace-nowrap">
                                         <thead className="bg-[#1a1a1a] border-b border-[#333]">
                                             <tr>
-                                                {Object.keys(msg.results_preview[0]).map(key => (
+                                                {(msg.columns?.length ? msg.columns : Object.keys(msg.results_preview[0])).map(key => (
                                                     <th key={key} className="px-4 py-3 font-medium text-zinc-300">
                                                         {key}
                                                     </th>
@@ -164,6 +224,24 @@ export default function ChatPage() {
                                             ))}
                                         </tbody>
                                     </table>
+                                    {msg.row_count !== undefined && msg.row_count > 0 && (
+                                        <div className="flex items-center justify-between px-4 py-2 border-t border-[#222] text-xs text-zinc-500">
+                                            <span>
+                                                Showing {msg.results_preview.length} of {msg.row_count} rows
+                                                {msg.results_error && <span className="ml-2 text-red-400">{msg.results_error}</span>}
+                                            </span>
+                                            {msg.result_id && msg.results_preview.length < msg.row_count && (
+                                                <button
+                                                    onClick={() => handleLoadMoreRows(msg)}
+                                                    disabled={loadingRowsFor !== null}
+                                                    className="flex items-center gap-1 text-emerald-400 hover:text-emerald-300 disabled:opacity-50"
+                                                >
+                                                    {loadingRowsFor === msg.id && <Loader2 className="w-3 h-3 animate-spin" />}
+                                                    Load more rows
+                                                </button>
+                                            )}
+                                        </div>
+                                    )}
                                 </div>
                             )}
 
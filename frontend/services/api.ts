@@ -1,4 +1,4 @@
-import { MetricSnapshot, Anomaly, Recommendation, TriggerAnalysisResponse, HealthCheck } from "../types";
+import { MetricSnapshot, Anomaly, Recommendation, AnalysisJob, HealthCheck } from "../types";
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
 
@@ -30,6 +30,7 @@ export const dbaApi = {
     getAnomalies: (): Promise<Anomaly[]> => fetchWithHandler("/anomalies"),
     getLatestRecommendation: (): Promise<Recommendation | null> => fetchWithHandler("/recommendations"),
     getRecommendationHistory: (limit: number = 10): Promise<Recommendation[]> => fetchWithHandler(`/recommendations/history?limit=${limit}`),
-    triggerAnalysis: (): Promise<TriggerAnalysisResponse> => fetchWithHandler("/trigger-analysis", { method: "POST" }),
+    triggerAnalysis: (waitSeconds: number = 60): Promise<AnalysisJob> => fetchWithHandler(`/trigger-analysis?wait_seconds=${waitSeconds}`, { method: "POST" }),
+    getAnalysisJob: (jobId: string): Promise<AnalysisJob> => fetchWithHandler(`/analysis-jobs/${jobId}`),
     getHealth: (): Promise<HealthCheck> => fetchWithHandler("/health"),
 };
@@ -1,8 +1,8 @@
-import { ChatResponsePayload } from "@/types/chat";
+import { ChatResponsePayload, ChatResultPage } from "@/types/chat";
 import { dbaApi } from "./api"; // Resusing the core configured Axios instance
 
 export const chatApi = {
-    async sendMessage(userMessage: string, sessionId: string = "default_session"): Promise<ChatResponsePayload> {
+    async sendMessage(userMessage: string, sessionId: string = "default_session", confirmationToken?: string): Promise<ChatResponsePayload> {
         // dbaApi already maps standard responses and throws on interceptor failures
         const response = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL}/chat/message`, {
             method: "POST",
@@ -11,7 +11,9 @@ export const chatApi = {
             },
             body: JSON.stringify({
                 user_message: userMessage,
-                session_id: sessionId
+                session_id: sessionId,
+                // Set only when confirming an expensive query; the backend runs the statement it held
+                confirmation_token: confirmationToken
             })
         });
 
@@ -22,6 +24,16 @@ export const chatApi = {
         return response.json();
     },
 
+    async getResultPage(resultId: string, offset: number, limit: number = 500): Promise<ChatResultPage> {
+        const response = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL}/chat/results/${resultId}?offset=${offset}&limit=${limit}`);
+
+        if (!response.ok) {
+            throw new Error(response.status === 404 ? "Result expired; ask again to re-run the query." : `Chat API failed: ${response.statusText}`);
+        }
+
+        return response.json();
+    },
+
     async clearHistory(sessionId: string = "default_session") {
         const response = await fetch(`${process.env.NEXT_PUBLIC_API_BASE_URL}/chat/history?session_id=${sessionId}`, {
             method: "DELETE"
@@ -5,6 +5,14 @@ export interface ChatMessage {
     sql_executed?: string;
     execution_time_ms?: number;
     results_preview?: Record<string, any>[];
+    result_id?: string;
+    row_count?: number;
+    columns?: string[];
+    results_error?: string;
+    question?: string;
+    requires_confirmation?: boolean;
+    estimated_cost?: number;
+    confirmation_token?: string;
     chart_type?: "bar" | "line" | "pie" | "none";
     error?: string;
 }
@@ -15,6 +23,21 @@ export interface ChatResponsePayload {
     confidence: number;
     execution_time_ms: number;
     query_results_preview: Record<string, any>[];
+    result_id?: string;
+    columns: string[];
+    row_count: number;
     error_message?: string;
+    requires_confirmation?: boolean;
+    estimated_cost?: number;
+    confirmation_token?: string;
     suggested_chart_type?: "bar" | "line" | "pie" | "none";
 }
+
+export interface ChatResultPage {
+    columns: string[];
+    types: string[];
+    data: any[][];
+    offset: number;
+    row_count: number;
+    total_rows: number;
+}
@@ -106,6 +106,17 @@ export interface TriggerAnalysisResponse {
     recommendations?: Recommendation;
 }
 
+export interface AnalysisJob {
+    job_id: string;
+    status: "queued" | "running" | "succeeded" | "failed";
+    submitted_at: string;
+    started_at?: string;
+    finished_at?: string;
+    coalesced: number;
+    result?: TriggerAnalysisResponse;
+    error?: string;
+}
+
 export interface HealthCheck {
     status: string;
     poller_running: boolean;